@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Query, HTTPException
+from fastapi.responses import StreamingResponse
+from app.services import columnar_service, export_service
+from typing import Optional
+from datetime import date
+
+router = APIRouter()
+
+def _stream(table: str, format: str, filters: dict) -> StreamingResponse:
+    if format not in columnar_service.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Неизвестный формат: {format}")
+    if not export_service.parquet_available():
+        raise HTTPException(status_code=501, detail="Для столбцовой выдачи установите pyarrow")
+    
+    media_type, extension = columnar_service.FORMATS[format]
+    return StreamingResponse(
+        columnar_service.stream_table(table, format, filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{table}.{extension}"'}
+    )
+
+@router.get("/objects")
+def get_objects_table(
+    format: str = Query("arrow", description="arrow (IPC stream) или parquet"),
+    object_type: Optional[str] = None,
+    pipeline_id: Optional[str] = None
+):
+    """Объекты таблицей Arrow/Parquet: pyarrow.ipc.open_stream(...).read_pandas()"""
+    return _stream("objects", format, dict(object_type=object_type, pipeline_id=pipeline_id))
+
+@router.get("/diagnostics")
+def get_diagnostics_table(
+    format: str = Query("arrow", description="arrow (IPC stream) или parquet"),
+    object_id: Optional[int] = None,
+    method: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    defect_found: Optional[bool] = None
+):
+    """Диагностики таблицей Arrow/Parquet с фильтрами списка; enum - категории"""
+    filters = dict(
+        object_id=object_id,
+        method=method,
+        start_date=start_date,
+        end_date=end_date,
+        defect_found=defect_found
+    )
+    return _stream("diagnostics", format, filters)
@@ -4,100 +4,72 @@ from sqlalchemy import func, extract, case
 from typing import Dict, Any, List
 from app.db.database import SessionLocal
 from app.db import models, crud
+from app.services import summary_service
 from datetime import date, datetime, timedelta
 
 router = APIRouter()
 
+def _counts(summary: Dict[str, Dict[str, int]], metric: str) -> List[tuple]:
+    """Ненулевые счетчики метрики, отсортированные по ключу"""
+    return sorted((key, value) for key, value in summary.get(metric, {}).items() if value)
+
 @router.get("/")
 def get_dashboard_summary():
     """Основная статистика для дашборда"""
     db = SessionLocal()
     try:
+        # Все агрегаты читаются из материализованных счетчиков одним запросом
+        summary = summary_service.read_summary(db)
+        
         # Общая статистика
-        total_objects = db.query(func.count(models.Object.object_id)).scalar()
-        total_inspections = db.query(func.count(models.Diagnostic.diag_id)).scalar()
-        total_defects = db.query(func.count(models.Diagnostic.diag_id)).filter(
-            models.Diagnostic.defect_found == True
-        ).scalar()
+        total_objects = summary.get("objects", {}).get("", 0)
+        total_inspections = summary.get("diagnostics", {}).get("", 0)
+        total_defects = summary.get("defects", {}).get("", 0)
         
         # Распределение по методам диагностики
-        methods_query = db.query(
-            models.Diagnostic.method,
-            func.count(models.Diagnostic.diag_id).label('count')
-        ).group_by(models.Diagnostic.method).all()
-        
         methods_distribution = [
-            {"method": method.value, "count": count}
-            for method, count in methods_query
+            {"method": models.MethodType[method].value, "count": count}
+            for method, count in _counts(summary, "method")
         ]
         
         # Распределение по критичности
-        criticality_query = db.query(
-            models.Diagnostic.ml_label,
-            func.count(models.Diagnostic.diag_id).label('count')
-        ).filter(models.Diagnostic.ml_label.isnot(None)).group_by(
-            models.Diagnostic.ml_label
-        ).all()
-        
         criticality_distribution = [
-            {"label": label.value if label else "unknown", "count": count}
-            for label, count in criticality_query
+            {"label": models.MLLabel[label].value, "count": count}
+            for label, count in _counts(summary, "label")
         ]
         
         # Динамика диагностик по месяцам (последние 6 месяцев)
-        six_months_ago = datetime.now() - timedelta(days=180)
-        
-        monthly_stats = db.query(
-            func.strftime('%Y-%m', models.Diagnostic.date).label('month'),
-            func.count(models.Diagnostic.diag_id).label('total'),
-            func.count(case((models.Diagnostic.defect_found == True, 1))).label('defects')
-        ).filter(
-            models.Diagnostic.date >= six_months_ago
-        ).group_by(
-            'month'
-        ).order_by('month').all()
+        six_months_ago = (datetime.now() - timedelta(days=180)).strftime('%Y-%m')
+        month_defects = summary.get("month_defects", {})
         
         monthly_data = [
             {
                 "month": month,
                 "total_inspections": total,
-                "defects_found": defects
+                "defects_found": month_defects.get(month, 0)
             }
-            for month, total, defects in monthly_stats
+            for month, total in _counts(summary, "month")
+            if month >= six_months_ago
         ]
         
         # Топ объектов по риску (через CRUD)
         top_risks = crud.DiagnosticCRUD.get_top_risks(db, limit=5)
         
         # Распределение по типам объектов
-        object_types_query = db.query(
-            models.Object.object_type,
-            func.count(models.Object.object_id).label('count')
-        ).group_by(models.Object.object_type).all()
-        
         object_types_distribution = [
-            {"type": obj_type.value, "count": count}
-            for obj_type, count in object_types_query
+            {"type": models.ObjectType[obj_type].value, "count": count}
+            for obj_type, count in _counts(summary, "object_type")
         ]
         
         # Статистика по трубопроводам
-        pipelines_stats = db.query(
-            models.Object.pipeline_id,
-            func.count(models.Object.object_id).label('objects_count'),
-            func.count(case((models.Diagnostic.defect_found == True, 1))).label('defects_count')
-        ).join(
-            models.Diagnostic, 
-            models.Object.object_id == models.Diagnostic.object_id,
-            isouter=True
-        ).group_by(models.Object.pipeline_id).all()
-        
+        pipeline_defects = summary.get("pipeline_defects", {})
         pipelines_data = [
             {
                 "pipeline_id": pipeline_id,
                 "objects_count": objects_count,
-                "defects_count": defects_count or 0
+                "defects_count": pipeline_defects.get(pipeline_id, 0)
             }
-            for pipeline_id, objects_count, defects_count in pipelines_stats
+            for pipeline_id, objects_count in _counts(summary, "pipeline_objects")
         ]
         
         return {
@@ -122,25 +94,33 @@ def get_dashboard_summary():
     finally:
         db.close()
 
+@router.post("/rebuild")
+def rebuild_dashboard_summary():
+    """Полная пересборка материализованных счетчиков дашборда"""
+    db = SessionLocal()
+    try:
+        summary_service.rebuild(db)
+        db.commit()
+        return {"status": "success", "timestamp": datetime.now().isoformat()}
+    finally:
+        db.close()
+
 @router.get("/defects-by-method")
 def get_defects_by_method():
     """Дефекты по методам диагностики"""
     db = SessionLocal()
     try:
-        results = db.query(
-            models.Diagnostic.method,
-            func.count(models.Diagnostic.diag_id).label('total'),
-            func.count(case((models.Diagnostic.defect_found == True, 1))).label('defects')
-        ).group_by(models.Diagnostic.method).all()
+        summary = summary_service.read_summary(db)
+        method_defects = summary.get("method_defects", {})
         
         return [
             {
-                "method": method.value,
+                "method": models.MethodType[method].value,
                 "total_inspections": total,
-                "defects_count": defects,
-                "defect_rate": round((defects / total * 100) if total > 0 else 0, 1)
+                "defects_count": method_defects.get(method, 0),
+                "defect_rate": round((method_defects.get(method, 0) / total * 100) if total > 0 else 0, 1)
             }
-            for method, total, defects in results
+            for method, total in _counts(summary, "method")
         ]
     finally:
         db.close()
@@ -178,17 +158,14 @@ def get_quality_stats():
     """Статистика по качественным оценкам"""
     db = SessionLocal()
     try:
-        results = db.query(
-            models.Diagnostic.quality_grade,
-            func.count(models.Diagnostic.diag_id).label('count')
-        ).group_by(models.Diagnostic.quality_grade).all()
+        results = _counts(summary_service.read_summary(db), "grade")
         
         total = sum(count for _, count in results)
         
         return {
             "distribution": [
                 {
-                    "grade": grade.value,
+                    "grade": models.QualityGrade[grade].value,
                     "count": count,
                     "percentage": round((count / total * 100) if total > 0 else 0, 1)
                 }
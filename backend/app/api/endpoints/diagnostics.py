@@ -1,70 +1,121 @@
-from fastapi import APIRouter, Query, HTTPException
-from app.db.database import SessionLocal
+from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
 from app.db import crud
+from app.services import export_service
+from app.utils.fast_json import FastJSONResponse
+from app.utils.pagination import MAX_PAGE, encode_cursor, decode_cursor
 from typing import Optional
 from datetime import date
 
 router = APIRouter()
 
 @router.get("/")
-def get_diagnostics(
+async def get_diagnostics(
     object_id: Optional[int] = None,
     method: Optional[str] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     defect_found: Optional[bool] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = Query(
+        None, description="Токен продолжения (пустой - первая страница); ответ - {items, next_cursor}"
+    ),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db = SessionLocal()
-    try:
-        diagnostics = crud.DiagnosticCRUD.get_diagnostics(
-            db,
-            skip=skip,
-            limit=limit,
-            object_id=object_id,
-            method=method,
-            start_date=start_date,
-            end_date=end_date,
-            defect_found=defect_found
-        )
-        
-        return [
-            {
-                "diag_id": diag.diag_id,
-                "object_id": diag.object_id,
-                "method": diag.method.value,
-                "date": diag.date.isoformat(),
-                "temperature": diag.temperature,
-                "humidity": diag.humidity,
-                "illumination": diag.illumination,
-                "defect_found": diag.defect_found,
-                "defect_description": diag.defect_description,
-                "quality_grade": diag.quality_grade.value,
-                "param1": diag.param1,
-                "param2": diag.param2,
-                "param3": diag.param3,
-                "ml_label": diag.ml_label.value if diag.ml_label else None
-            }
-            for diag in diagnostics
-        ]
-    finally:
-        db.close()
+    filters = dict(
+        object_id=object_id,
+        method=method,
+        start_date=start_date,
+        end_date=end_date,
+        defect_found=defect_found
+    )
+    
+    if cursor is None:
+        # Режим смещения (совместимость): просто список
+        # Строки сразу в байты JSON, без ORM-объектов и jsonable_encoder
+        diagnostics = await crud.AsyncDiagnosticCRUD.get_diagnostic_rows(db, skip=skip, limit=limit, **filters)
+        return FastJSONResponse(diagnostics)
+    
+    if not 1 <= limit <= MAX_PAGE:
+        # Пустая страница не дает курсора продолжения
+        raise HTTPException(status_code=422, detail=f"limit в режиме курсора - от 1 до {MAX_PAGE}")
+    
+    after = None
+    if cursor:
+        try:
+            position = decode_cursor(cursor, "diagnostics")
+            after = (date.fromisoformat(position["date"]), int(position["diag_id"]))
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Некорректный курсор")
+    
+    # Лишняя строка показывает, есть ли следующая страница
+    diagnostics = await crud.AsyncDiagnosticCRUD.get_diagnostic_rows(db, limit=limit + 1, after=after, **filters)
+    page = diagnostics[:limit]
+    next_cursor = None
+    if len(diagnostics) > limit:
+        last = page[-1]
+        # date - строка ISO (SQLite) или date (PostgreSQL), курсор приводит к строке
+        next_cursor = encode_cursor("diagnostics", date=last["date"], diag_id=last["diag_id"])
+    
+    return FastJSONResponse({
+        "items": page,
+        "next_cursor": next_cursor
+    })
+
+@router.get("/export")
+def export_diagnostics(
+    format: str = Query("ndjson", description="ndjson, csv или parquet"),
+    object_id: Optional[int] = None,
+    method: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    defect_found: Optional[bool] = None
+):
+    """Потоковая выгрузка диагностик с теми же фильтрами, что и у списка"""
+    if format not in export_service.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Неизвестный формат: {format}")
+    if format == "parquet" and not export_service.parquet_available():
+        raise HTTPException(status_code=501, detail="Для выгрузки в Parquet установите pyarrow")
+    
+    media_type, extension = export_service.FORMATS[format]
+    filters = dict(
+        object_id=object_id,
+        method=method,
+        start_date=start_date,
+        end_date=end_date,
+        defect_found=defect_found
+    )
+    return StreamingResponse(
+        export_service.export_diagnostics(format, filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="diagnostics.{extension}"'}
+    )
 
 @router.get("/stats")
-def get_diagnostics_stats():
-    db = SessionLocal()
-    try:
-        stats = crud.DiagnosticCRUD.get_diagnostics_stats(db)
-        return stats
-    finally:
-        db.close()
+async def get_diagnostics_stats(db: AsyncSession = Depends(get_async_db)):
+    return await crud.AsyncDiagnosticCRUD.get_diagnostics_stats(db)
+
+@router.get("/flags")
+async def get_diagnostic_flags(
+    object_id: Optional[int] = None,
+    kind: Optional[str] = Query(None, description="label_mismatch или outlier; пусто - все отметки"),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=10000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Замечания проверки загрузок: метка из файла расходится с моделью или строка - выброс"""
+    if kind not in (None, "label_mismatch", "outlier"):
+        raise HTTPException(status_code=400, detail=f"Неизвестный тип отметки: {kind}")
+    flags = await crud.AsyncDiagnosticCRUD.get_flags(db, skip=skip, limit=limit, object_id=object_id, kind=kind)
+    return FastJSONResponse(flags)
 
 @router.get("/top-risks")
-def get_top_risks(limit: int = 5):
-    db = SessionLocal()
-    try:
-        risks = crud.DiagnosticCRUD.get_top_risks(db, limit=limit)
-        return risks
-    finally:
-        db.close()
\ No newline at end of file
+async def get_top_risks(
+    limit: int = Query(5, ge=1, le=1000),
+    pipeline_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await crud.AsyncDiagnosticCRUD.get_top_risks(db, limit=limit, pipeline_id=pipeline_id)
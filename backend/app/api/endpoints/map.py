@@ -1,12 +1,33 @@
 # backend/app/api/endpoints/map.py
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, HTTPException, Response
+from pydantic import BaseModel
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.db.database import SessionLocal
+from app.db import crud, rows
+from app.services.spatial_index import spatial_index
+from app.services import tile_service
+from app.utils.fast_json import FastJSONResponse
 from app.db.models import Object, Diagnostic, MLLabel  # Изменено Inspection на Diagnostic
 from typing import Optional, List
 
 router = APIRouter()
 
+# Поля точек /data в порядке распаковки строк
+MAP_OBJECT_FIELDS = ["object_id", "object_name", "object_type", "pipeline_id", "lat", "lon"]
+MAP_DIAGNOSTIC_FIELDS = ["date", "method", "defect_found", "ml_label", "quality_grade"]
+
+# Цвет маркера по критичности
+CRITICALITY_COLORS = {
+    "normal": "#4CAF50",  # green - нормальный
+    "medium": "#FF9800",  # orange - средний риск
+    "high": "#F44336"  # red - высокий риск
+}
+
+class PipelineGeometryRequest(BaseModel):
+    name: str
+    coordinates: List[List[float]]  # [[lon, lat], ...]
+
 @router.get("/data")
 def get_map_data(
     pipeline_id: Optional[str] = None,
@@ -17,152 +38,177 @@ def get_map_data(
 ):
     db = SessionLocal()
     try:
-        # Базовый запрос объектов
-        query = db.query(Object)
-        
-        if pipeline_id:
-            query = query.filter(Object.pipeline_id == pipeline_id)
-        
-        objects = query.all()
+        # Объекты вместе с последней диагностикой - один запрос вместо N+1,
+        # столбцами без ORM-объектов
+        columns = crud.DiagnosticCRUD.get_latest_diagnostic_rows(
+            db,
+            MAP_OBJECT_FIELDS,
+            MAP_DIAGNOSTIC_FIELDS,
+            pipeline_id=pipeline_id,
+            method=method,
+            date_from=date_from,
+            date_to=date_to,
+            criticality=criticality
+        )
         
-        # Для каждого объекта получаем последнюю диагностику
-        map_features = []
-        for obj in objects:
-            # Запрос диагностик для объекта
-            diag_query = db.query(Diagnostic).filter(Diagnostic.object_id == obj.object_id)
-            
-            if method:
-                diag_query = diag_query.filter(Diagnostic.method == method)
-            if date_from:
-                diag_query = diag_query.filter(Diagnostic.date >= date_from)
-            if date_to:
-                diag_query = diag_query.filter(Diagnostic.date <= date_to)
-            if criticality:
-                diag_query = diag_query.filter(Diagnostic.ml_label == MLLabel(criticality))
-            
-            latest_diag = diag_query.order_by(Diagnostic.date.desc()).first()
-            
-            if latest_diag:
-                feature = {
-                    "type": "Feature",
-                    "geometry": {
-                        "type": "Point",
-                        "coordinates": [obj.lon, obj.lat]
-                    },
-                    "properties": {
-                        "object_id": obj.object_id,  # Исправлено с id на object_id
-                        "name": obj.object_name,  # Исправлено с name на object_name
-                        "type": obj.object_type.value,  # Исправлено с type на object_type
-                        "pipeline_id": obj.pipeline_id,
-                        "latest_inspection": {
-                            "date": latest_diag.date.isoformat() if latest_diag.date else None,
-                            "method": latest_diag.method.value,
-                            "defect_found": latest_diag.defect_found,
-                            "criticality": latest_diag.ml_label.value if latest_diag.ml_label else None,
-                            "quality": latest_diag.quality_grade.value if latest_diag.quality_grade else None
-                        }
+        map_features = [
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [lon, lat]
+                },
+                "properties": {
+                    "object_id": object_id,
+                    "name": name,
+                    "type": object_type,
+                    "pipeline_id": pipeline,
+                    "latest_inspection": {
+                        "date": diag_date,
+                        "method": diag_method,
+                        "defect_found": defect_found,
+                        "criticality": label,
+                        "quality": quality
                     }
                 }
-                map_features.append(feature)
+            }
+            for object_id, name, object_type, pipeline, lat, lon, diag_date, diag_method, defect_found, label, quality
+            in zip(*columns.values())
+        ]
         
-        return {
+        return FastJSONResponse({
             "type": "FeatureCollection",
             "features": map_features
-        }
+        })
         
     finally:
         db.close()
 
+@router.get("/viewport")
+def get_map_viewport(
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+    zoom: float = Query(..., ge=0, le=24)
+):
+    """Кластеры объектов в окне карты из пространственного индекса"""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox: min_lon,min_lat,max_lon,max_lat")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="bbox: минимум больше максимума")
+    
+    index = spatial_index.get()
+    result = index.query((min_lon, min_lat, max_lon, max_lat), zoom)
+    return FastJSONResponse({
+        "zoom": zoom,
+        "level": result["level"],
+        "data_version": index.data_version,
+        "total_objects": index.n_objects,
+        "objects_in_view": result["objects_in_view"],
+        "clusters": result["clusters"]
+    })
+
 @router.get("/pipelines")
 def get_pipelines_geojson():
-    """Возвращает линии трубопроводов (упрощенно)"""
-    # Координаты для демонстрации (можно загружать из файла)
-    pipelines = {
-        "MT-01": [
-            [71.0, 51.0],
-            [71.5, 51.2],
-            [72.0, 51.3],
-            [72.5, 51.5]
-        ],
-        "MT-02": [
-            [63.0, 52.0],
-            [63.5, 52.2],
-            [64.0, 52.4],
-            [64.5, 52.6]
-        ],
-        "MT-03": [
-            [69.0, 50.0],
-            [69.5, 50.3],
-            [70.0, 50.5],
-            [70.5, 50.8]
-        ]
-    }
-    
-    features = []
-    for pipeline_id, coords in pipelines.items():
-        feature = {
-            "type": "Feature",
-            "properties": {
-                "id": pipeline_id,
-                "name": f"Магистраль {pipeline_id.split('-')[1]}"
-            },
-            "geometry": {
-                "type": "LineString",
-                "coordinates": coords
+    """Возвращает линии трубопроводов из сохраненных трасс"""
+    db = SessionLocal()
+    try:
+        features = []
+        for pipeline in crud.PipelineCRUD.get_pipelines(db):
+            feature = {
+                "type": "Feature",
+                "properties": {
+                    "id": pipeline.pipeline_id,
+                    "name": pipeline.name
+                },
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": pipeline.coordinates
+                }
             }
+            features.append(feature)
+        
+        return {
+            "type": "FeatureCollection",
+            "features": features
         }
-        features.append(feature)
+        
+    finally:
+        db.close()
+
+@router.put("/pipelines/{pipeline_id}")
+def put_pipeline(pipeline_id: str, request: PipelineGeometryRequest):
+    """Сохранить трассу трубопровода"""
+    if len(request.coordinates) < 2 or any(len(point) != 2 for point in request.coordinates):
+        raise HTTPException(status_code=400, detail="coordinates: не меньше двух точек [lon, lat]")
+    if any(not (-180 <= lon <= 180 and -90 <= lat <= 90) for lon, lat in request.coordinates):
+        raise HTTPException(status_code=400, detail="coordinates: вне диапазона широты/долготы")
+    
+    db = SessionLocal()
+    try:
+        pipeline = crud.PipelineCRUD.upsert_pipeline(db, pipeline_id, request.name, request.coordinates)
+        return {"id": pipeline.pipeline_id, "name": pipeline.name, "points": len(pipeline.coordinates)}
+    finally:
+        db.close()
+
+@router.get("/tiles/stats")
+def get_tile_cache_stats():
+    """Состояние кэша векторных тайлов"""
+    return tile_service.tiles.stats()
+
+@router.get("/tiles/{z}/{x}/{y}")
+def get_map_tile(z: int, x: int, y: int):
+    """Векторный тайл (MVT): слои objects и pipelines"""
+    if not 0 <= z <= tile_service.MAX_TILE_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail="Тайл вне сетки")
     
-    return {
-        "type": "FeatureCollection",
-        "features": features
-    }
+    data, version, cached = tile_service.tiles.get(z, x, y)
+    return Response(
+        content=data,
+        media_type=tile_service.MEDIA_TYPE,
+        headers={"X-Data-Version": str(version), "X-Tile-Cache": "hit" if cached else "miss"}
+    )
 
 @router.get("/clusters")
 def get_map_clusters():
     """Возвращает данные для кластеризации на карте"""
     db = SessionLocal()
     try:
-        # Получаем все объекты с их последней диагностикой
-        objects_with_diagnostics = db.query(
-            Object.object_id,
-            Object.object_name,
-            Object.object_type,
-            Object.pipeline_id,
-            Object.lat,
-            Object.lon,
-            Diagnostic.ml_label,
+        # Получаем все объекты с их последней диагностикой (столбцами, без ORM-объектов)
+        fields = ["object_id", "object_name", "object_type", "pipeline_id", "lat", "lon"]
+        query = select(
+            *rows.plain_columns(Object, fields),
+            rows.plain(Diagnostic.ml_label),
             Diagnostic.defect_found
         ).join(
             Diagnostic,
             Object.object_id == Diagnostic.object_id
-        ).distinct(Object.object_id).all()
+        ).distinct(Object.object_id)
+        columns = rows.to_columns(
+            fields + ["ml_label", "defect_found"],
+            db.execute(query).all(),
+            {**rows.value_maps(Object, fields), **rows.value_maps(Diagnostic, ["ml_label"])}
+        )
         
-        clusters = []
-        for obj in objects_with_diagnostics:
-            # Определяем цвет маркера на основе критичности
-            color = "#4CAF50"  # green - нормальный
-            if obj.ml_label:
-                if obj.ml_label == MLLabel.HIGH:
-                    color = "#F44336"  # red - высокий риск
-                elif obj.ml_label == MLLabel.MEDIUM:
-                    color = "#FF9800"  # orange - средний риск
-            
-            clusters.append({
-                "id": obj.object_id,
-                "name": obj.object_name,
-                "type": obj.object_type.value,
-                "pipeline_id": obj.pipeline_id,
-                "coordinates": [obj.lon, obj.lat],
-                "criticality": obj.ml_label.value if obj.ml_label else "normal",
-                "color": color,
-                "has_defect": obj.defect_found or False
-            })
+        clusters = [
+            {
+                "id": object_id,
+                "name": name,
+                "type": object_type,
+                "pipeline_id": pipeline,
+                "coordinates": [lon, lat],
+                "criticality": label or "normal",
+                # Цвет маркера на основе критичности
+                "color": CRITICALITY_COLORS.get(label, CRITICALITY_COLORS["normal"]),
+                "has_defect": defect_found or False
+            }
+            for object_id, name, object_type, pipeline, lat, lon, label, defect_found in zip(*columns.values())
+        ]
         
-        return {
+        return FastJSONResponse({
             "clusters": clusters,
             "total": len(clusters)
-        }
+        })
         
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -1,74 +1,98 @@
-from fastapi import APIRouter, Query, HTTPException
-from app.db.database import SessionLocal
+from fastapi import APIRouter, Depends, Query, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
 from app.db import crud
+from app.utils.fast_json import FastJSONResponse
+from app.utils.pagination import MAX_PAGE, encode_cursor, decode_cursor
 from typing import Optional
 
 router = APIRouter()
 
 @router.get("/")
-def get_objects(
+async def get_objects(
     object_type: Optional[str] = None,
     pipeline_id: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = Query(
+        None, description="Токен продолжения (пустой - первая страница); ответ - {items, next_cursor}"
+    ),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db = SessionLocal()
-    try:
-        objects = crud.ObjectCRUD.get_objects(
+    if cursor is None:
+        # Режим смещения (совместимость): просто список
+        # Строки сразу в байты JSON, без ORM-объектов и jsonable_encoder
+        objects = await crud.AsyncObjectCRUD.get_object_rows(
             db, 
             skip=skip, 
             limit=limit,
             object_type=object_type,
             pipeline_id=pipeline_id
         )
-        return [
+        return FastJSONResponse(objects)
+    
+    if not 1 <= limit <= MAX_PAGE:
+        # Пустая страница не дает курсора продолжения
+        raise HTTPException(status_code=422, detail=f"limit в режиме курсора - от 1 до {MAX_PAGE}")
+    
+    after = None
+    if cursor:
+        try:
+            after = int(decode_cursor(cursor, "objects")["object_id"])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Некорректный курсор")
+    
+    # Лишняя строка показывает, есть ли следующая страница
+    objects = await crud.AsyncObjectCRUD.get_object_rows(
+        db,
+        limit=limit + 1,
+        object_type=object_type,
+        pipeline_id=pipeline_id,
+        after=after
+    )
+    page = objects[:limit]
+    next_cursor = encode_cursor("objects", object_id=page[-1]["object_id"]) if len(objects) > limit else None
+    
+    return FastJSONResponse({
+        "items": page,
+        "next_cursor": next_cursor
+    })
+
+@router.get("/{object_id}/risk")
+async def get_object_risk(object_id: int, db: AsyncSession = Depends(get_async_db)):
+    risk = await crud.AsyncObjectCRUD.get_object_risk(db, object_id)
+    if risk is None:
+        raise HTTPException(status_code=404, detail="Object not found")
+    return risk
+
+@router.get("/{object_id}")
+async def get_object(object_id: int, db: AsyncSession = Depends(get_async_db)):
+    obj = await crud.AsyncObjectCRUD.get_object(db, object_id)
+    if not obj:
+        raise HTTPException(status_code=404, detail="Object not found")
+    
+    # Получаем диагностики для этого объекта
+    diagnostics = await crud.AsyncDiagnosticCRUD.get_diagnostics(
+        db, object_id=object_id, limit=10
+    )
+    
+    return {
+        "object_id": obj.object_id,
+        "object_name": obj.object_name,
+        "object_type": obj.object_type.value,
+        "pipeline_id": obj.pipeline_id,
+        "coordinates": {"lat": obj.lat, "lon": obj.lon},
+        "year": obj.year,
+        "material": obj.material,
+        "diagnostics": [
             {
-                "object_id": obj.object_id,
-                "object_name": obj.object_name,
-                "object_type": obj.object_type.value,
-                "pipeline_id": obj.pipeline_id,
-                "lat": obj.lat,
-                "lon": obj.lon,
-                "year": obj.year,
-                "material": obj.material
+                "diag_id": diag.diag_id,
+                "date": diag.date.isoformat(),
+                "method": diag.method.value,
+                "defect_found": diag.defect_found,
+                "quality_grade": diag.quality_grade.value,
+                "ml_label": diag.ml_label.value if diag.ml_label else None
             }
-            for obj in objects
+            for diag in diagnostics
         ]
-    finally:
-        db.close()
-
-@router.get("/{object_id}")
-def get_object(object_id: int):
-    db = SessionLocal()
-    try:
-        obj = crud.ObjectCRUD.get_object(db, object_id)
-        if not obj:
-            raise HTTPException(status_code=404, detail="Object not found")
-        
-        # Получаем диагностики для этого объекта
-        diagnostics = crud.DiagnosticCRUD.get_diagnostics(
-            db, object_id=object_id, limit=10
-        )
-        
-        return {
-            "object_id": obj.object_id,
-            "object_name": obj.object_name,
-            "object_type": obj.object_type.value,
-            "pipeline_id": obj.pipeline_id,
-            "coordinates": {"lat": obj.lat, "lon": obj.lon},
-            "year": obj.year,
-            "material": obj.material,
-            "diagnostics": [
-                {
-                    "diag_id": diag.diag_id,
-                    "date": diag.date.isoformat(),
-                    "method": diag.method.value,
-                    "defect_found": diag.defect_found,
-                    "quality_grade": diag.quality_grade.value,
-                    "ml_label": diag.ml_label.value if diag.ml_label else None
-                }
-                for diag in diagnostics
-            ]
-        }
-    finally:
-        db.close()
\ No newline at end of file
+    }
\ No newline at end of file
@@ -1,32 +1,44 @@
 # backend/app/api/endpoints/predictions.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-from app.ml.model import DefectPredictor  # Импортируем класс
-from app.db.database import SessionLocal
-from app.db import models
-import pandas as pd
-import os
+from app.ml.model import DefectPredictor, FEATURES, LABELS  # Импортируем класс
+from app.ml.forecast import forecaster
+from app.services import scoring_service, training_service
+from app.services.job_service import jobs
+import numpy as np
+import logging
+import threading
 from datetime import datetime
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # Создаем экземпляр предсказателя
 predictor = DefectPredictor()
+# Загружаемые CSV проверяются той же моделью
+scoring_service.scorer.use_predictor(predictor)
 
-# Инициализируем модель
-def init_predictor():
-    """Инициализировать предсказатель при запуске"""
-    try:
-        predictor.load_model()
-        print("ML модель успешно загружена")
-    except Exception as e:
-        print(f"Ошибка загрузки модели: {e}. Создаем новую модель...")
-        predictor.create_default_model()
-        print("Создана новая ML модель по умолчанию")
+_warmup_thread: Optional[threading.Thread] = None
 
-# Вызываем инициализацию
-init_predictor()
+def start_warmup() -> threading.Thread:
+    """Загрузить модель в фоне: импорт модуля и старт сервера ее не ждут
+
+    До окончания загрузки предсказания работают, но первый запрос дождется
+    модели; готовность видна в /health (ml_ready).
+    """
+    global _warmup_thread
+    if _warmup_thread is None:
+        def warm_up():
+            try:
+                predictor.warm_up()
+                logger.info(f"ML модель загружена: версия {predictor.version}")
+            except Exception:
+                logger.exception("Ошибка фоновой загрузки ML модели")
+        
+        _warmup_thread = threading.Thread(target=warm_up, name="ml-warmup", daemon=True)
+        _warmup_thread.start()
+    return _warmup_thread
 
 # Модели данных для запросов
 class PredictionRequest(BaseModel):
@@ -75,27 +87,30 @@ def predict_single(request: PredictionRequest):
 def predict_batch(request: BatchPredictionRequest):
     """Предсказать для нескольких наборов параметров"""
     try:
-        results = []
-        for i, item in enumerate(request.items):
-            features = {
-                'param1': item.param1,
-                'param2': item.param2,
-                'param3': item.param3,
-                'temperature': item.temperature,
-                'humidity': item.humidity
+        # Весь запрос - одна матрица, одно масштабирование и один predict_proba
+        X = np.array(
+            [[item.param1, item.param2, item.param3, item.temperature, item.humidity]
+             for item in request.items],
+            dtype=float
+        ).reshape(-1, len(FEATURES))
+        labels, probabilities = predictor.predict_batch(X)
+        
+        results = [
+            {
+                'prediction': label,
+                'probabilities': dict(zip(LABELS, proba)),
+                'features_used': dict(zip(FEATURES, features)),
+                'item_id': i,
+                'method': item.method
             }
-            
-            prediction = predictor.predict(features)
-            prediction['item_id'] = i
-            prediction['method'] = item.method
-            
-            results.append(prediction)
+            for i, (item, label, proba, features) in enumerate(
+                zip(request.items, labels.tolist(), probabilities.tolist(), X.tolist())
+            )
+        ]
         
         # Статистика по батчу
         predictions_count = {
-            'normal': sum(1 for r in results if r['prediction'] == 'normal'),
-            'medium': sum(1 for r in results if r['prediction'] == 'medium'),
-            'high': sum(1 for r in results if r['prediction'] == 'high')
+            label: int(np.count_nonzero(labels == label)) for label in LABELS
         }
         
         return {
@@ -110,71 +125,87 @@ def predict_batch(request: BatchPredictionRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка batch предсказания: {str(e)}")
 
-@router.post("/train")
+@router.post("/train", status_code=202)
 def train_model():
-    """Переобучить модель на текущих данных"""
-    db = SessionLocal()
-    try:
-        # Получаем все диагностики с метками
-        diagnostics = db.query(models.Diagnostic).filter(
-            models.Diagnostic.ml_label.isnot(None)
-        ).all()
-        
-        if len(diagnostics) < 10:
-            # Используем синтетические данные если недостаточно реальных
-            predictor.create_default_model()
-            return {
-                'status': 'info',
-                'message': 'Создана модель по умолчанию на синтетических данных (недостаточно реальных данных)',
-                'timestamp': datetime.now().isoformat()
-            }
-        
-        # Конвертируем в DataFrame
-        data = []
-        for diag in diagnostics:
-            data.append({
-                'param1': diag.param1 or 0,
-                'param2': diag.param2 or 0,
-                'param3': diag.param3 or 0,
-                'temperature': diag.temperature or 20,
-                'humidity': diag.humidity or 60,
-                'ml_label': diag.ml_label.value if diag.ml_label else 'normal'
-            })
-        
-        df = pd.DataFrame(data)
-        
-        # Обучаем модель
-        accuracy = predictor.train_from_dataframe(df)
-        
-        return {
-            'status': 'success',
-            'accuracy': round(accuracy, 3),
-            'training_samples': len(df),
-            'timestamp': datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка обучения модели: {str(e)}")
-    finally:
-        db.close()
+    """Запустить переобучение модели на текущих данных в фоне"""
+    job = jobs.submit("train", training_service.train, predictor)
+    return job.to_dict()
+
+@router.get("/train")
+def list_train_jobs():
+    """Задачи обучения (последние сверху)"""
+    return [job.to_dict() for job in reversed(jobs.list("train"))]
+
+@router.get("/train/{job_id}")
+def get_train_job(job_id: str):
+    """Статус и прогресс задачи обучения"""
+    job = jobs.get(job_id)
+    if job is None or job.kind != "train":
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job.to_dict()
+
+@router.delete("/train/{job_id}")
+def cancel_train_job(job_id: str):
+    """Отменить задачу обучения; текущая версия модели не меняется"""
+    job = jobs.get(job_id)
+    if job is None or job.kind != "train":
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return jobs.cancel(job_id).to_dict()
+
+@router.get("/forecast")
+def get_forecast_schedule(
+    threshold: Optional[float] = Query(None, gt=0),
+    horizon_years: float = Query(5.0, gt=0),
+    pipeline_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=10000)
+):
+    """План обследований: объекты, у которых param1 дойдет до порога в пределах горизонта"""
+    return forecaster.schedule(threshold, horizon_years, limit, pipeline_id)
+
+@router.get("/forecast/{object_id}")
+def get_object_forecast(object_id: int, threshold: Optional[float] = Query(None, gt=0)):
+    """Тренд потери металла объекта (MFL/UTWM) и прогноз срока достижения порога"""
+    result = forecaster.forecast(object_id, threshold)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Нет измерений MFL/UTWM для объекта")
+    return result
 
 @router.get("/model-info")
 def get_model_info():
     """Информация о текущей модели"""
     try:
-        model_info = {
-            'model_type': predictor.model.__class__.__name__ if hasattr(predictor, 'model') and predictor.model else 'Not loaded',
-            'features_used': ['param1', 'param2', 'param3', 'temperature', 'humidity'],
-            'target_labels': ['normal', 'medium', 'high'],
-            'model_exists': os.path.exists(predictor.model_path) if hasattr(predictor, 'model_path') else False,
-            'scaler_exists': os.path.exists(predictor.scaler_path) if hasattr(predictor, 'scaler_path') else False
+        info = predictor.model_info()
+        return {
+            'model_type': info.get('model_type', 'Not loaded'),
+            'version': info['version'],
+            'features_used': FEATURES,
+            'target_labels': LABELS,
+            'last_trained': info.get('created_at'),
+            'accuracy': info.get('accuracy'),
+            'training_samples': info.get('training_samples'),
+            'n_trees': info.get('n_trees'),
+            'n_nodes': info.get('n_nodes'),
+            'benchmark': info.get('benchmark'),
+            'runtime': info['runtime']
         }
-        
-        if hasattr(predictor, 'model_path') and os.path.exists(predictor.model_path):
-            model_info['last_trained'] = datetime.fromtimestamp(
-                os.path.getmtime(predictor.model_path)
-            ).isoformat()
-        
-        return model_info
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка получения информации: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Ошибка получения информации: {str(e)}")
+
+@router.get("/models")
+def list_models():
+    """Версии модели в реестре: метаданные, замеры при публикации и задержки этого процесса"""
+    return {
+        'current': predictor.registry.current_version(),
+        'loaded': predictor.version,
+        'versions': predictor.registry.describe()
+    }
+
+@router.post("/models/{version}/activate")
+def activate_model(version: str):
+    """Сделать версию текущей (откат/переключение без перезапуска воркеров)"""
+    try:
+        predictor.registry.activate(version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    predictor.reload_if_changed(force=True)
+    return {'status': 'success', 'version': predictor.version}
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Query, HTTPException
+from app.db.database import SessionLocal
+from app.services import timeseries_service
+from typing import Optional
+from datetime import date, datetime
+
+router = APIRouter()
+
+@router.get("/")
+def get_timeseries(
+    scope: str = Query("fleet", description="fleet - весь парк, pipeline - трубопровод, object - объект"),
+    key: Optional[str] = Query(None, description="pipeline_id или object_id для scope=pipeline/object"),
+    granularity: str = Query("month", description="day, month или year"),
+    start: Optional[date] = Query(None, description="Начало окна (включительно), пусто - вся история"),
+    end: Optional[date] = Query(None, description="Конец окна (включительно)")
+):
+    """Диагностики, дефекты и параметры по периодам из материализованных агрегатов"""
+    db = SessionLocal()
+    try:
+        points = timeseries_service.query_range(db, scope, key, granularity, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        db.close()
+    
+    return {
+        "scope": scope,
+        "key": key if scope != "fleet" else None,
+        "granularity": granularity,
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "points": points
+    }
+
+@router.post("/rebuild")
+def rebuild_timeseries():
+    """Полная пересборка агрегатов временных рядов"""
+    db = SessionLocal()
+    try:
+        timeseries_service.rebuild(db)
+        db.commit()
+        return {"status": "success", "timestamp": datetime.now().isoformat()}
+    finally:
+        db.close()
@@ -1,131 +1,170 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-import pandas as pd
-import io
-from sqlalchemy.orm import Session
+import shutil
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
 from app.db.database import SessionLocal
-from app.db.models import Object, Diagnostic, ObjectType, MethodType, QualityGrade, MLLabel
-from datetime import datetime
+from app.db.models import Upload
+from app.services import bulk_import_service, import_service, upload_service
+from app.services.job_service import jobs
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-def map_object_type(obj_type: str) -> ObjectType:
-    mapping = {
-        "crane": ObjectType.CRANE,
-        "compressor": ObjectType.COMPRESSOR,
-        "pipeline_section": ObjectType.PIPELINE_SECTION
-    }
-    return mapping.get(obj_type.lower(), ObjectType.PIPELINE_SECTION)
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: int  # байт
+    sha256: str  # хэш всего файла, hex
 
-def map_method(method: str) -> MethodType:
+def ingest_file(source) -> dict:
+    """Загрузить CSV в отдельной сессии (блокирующий вызов)"""
+    db = SessionLocal()
     try:
-        return MethodType(method)
-    except:
-        return MethodType.VIK
-
-def map_quality_grade(grade: str) -> QualityGrade:
-    mapping = {
-        "удовлетворительно": QualityGrade.SATISFACTORY,
-        "допустимо": QualityGrade.ACCEPTABLE,
-        "требует_мер": QualityGrade.REQUIRES_ACTION,
-        "недопустимо": QualityGrade.UNACCEPTABLE
-    }
-    return mapping.get(grade, QualityGrade.SATISFACTORY)
-
-def map_ml_label(label: str) -> MLLabel:
-    mapping = {
-        "normal": MLLabel.NORMAL,
-        "medium": MLLabel.MEDIUM,
-        "high": MLLabel.HIGH
-    }
-    return mapping.get(label.lower(), MLLabel.NORMAL)
+        # Файл читается чанками прямо из временного файла загрузки
+        stats = import_service.ingest_csv(db, source)
+        db.commit()
+        return stats
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
 @router.post("/")
 async def upload_csv(file: UploadFile = File(...)):
-    db = SessionLocal()
+    if file.size is not None and file.size > settings.max_upload_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Файл больше {settings.max_upload_size} байт: используйте загрузку частями /upload/sessions"
+        )
     try:
-        # Читаем файл
-        contents = await file.read()
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-        
-        records_processed = 0
+        # Разбор CSV и запись в БД блокируют - выполняем их в пуле потоков, а не на event loop
+        stats = await run_in_threadpool(ingest_file, file.file)
         
-        if "object_id" in df.columns and "object_name" in df.columns:
-            # Это файл объектов
-            for _, row in df.iterrows():
-                obj = Object(
-                    object_id=int(row['object_id']),
-                    object_name=row['object_name'],
-                    object_type=map_object_type(row['object_type']),
-                    pipeline_id=row['pipeline_id'],
-                    lat=float(row['lat']),
-                    lon=float(row['lon']),
-                    year=int(row['year']),
-                    material=row['material']
-                )
-                db.merge(obj)  # merge вместо add для обновления существующих
-                records_processed += 1
-                
-        elif "diag_id" in df.columns and "object_id" in df.columns:
-            # Это файл диагностик
-            for _, row in df.iterrows():
-                # Преобразуем дату
-                date_obj = None
-                if pd.notna(row.get('date')):
-                    try:
-                        date_obj = datetime.strptime(str(row['date']), '%Y-%m-%d').date()
-                    except:
-                        date_obj = datetime.now().date()
-                
-                diagnostic = Diagnostic(
-                    diag_id=int(row['diag_id']),
-                    object_id=int(row['object_id']),
-                    method=map_method(row['method']),
-                    date=date_obj,
-                    temperature=float(row.get('temperature', 0)),
-                    humidity=float(row.get('humidity', 0)),
-                    illumination=float(row.get('illumination', 0)),
-                    defect_found=bool(row.get('defect_found', False)),
-                    defect_description=str(row.get('defect_description', '')),
-                    quality_grade=map_quality_grade(row.get('quality_grade', 'удовлетворительно')),
-                    param1=float(row.get('param1', 0)),
-                    param2=float(row.get('param2', 0)),
-                    param3=float(row.get('param3', 0)),
-                    ml_label=map_ml_label(row.get('ml_label', 'normal'))
-                )
-                db.merge(diagnostic)
-                records_processed += 1
-        
-        db.commit()
         return {
             "filename": file.filename,
-            "rows_processed": records_processed,
+            "rows_processed": stats["rows_processed"],
+            "rows_rejected": stats["rows_rejected"],
+            "kind": stats["kind"],
+            "chunks": stats["chunks"],
+            "flags": stats["flags"],
+            "elapsed_seconds": stats["elapsed_seconds"],
+            "rows_per_second": stats["rows_per_second"],
             "message": "Данные успешно загружены"
         }
         
     except Exception as e:
-        db.rollback()
         logger.error(f"Ошибка загрузки CSV: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Ошибка обработки файла: {str(e)}")
+
+def ingest_bulk(paths, workdir) -> dict:
+    try:
+        return bulk_import_service.ingest_files(paths)
     finally:
-        db.close()
+        shutil.rmtree(workdir, ignore_errors=True)
 
 @router.post("/bulk")
-async def upload_bulk(files: list[UploadFile] = File(...)):
-    results = []
-    for file in files:
+async def upload_bulk(files: list[UploadFile] = File(...), wait: bool = True):
+    """Загрузить несколько CSV: разбор параллельно, каждый файл - своя транзакция
+    
+    Некорректные строки отбрасываются и перечисляются в отчете файла.
+    wait=false - вернуть фоновую задачу, прогресс по файлам в GET /bulk/{job_id}.
+    """
+    workdir, paths = await run_in_threadpool(
+        bulk_import_service.save_uploads, [(file.filename, file.file) for file in files]
+    )
+    if wait:
+        return await run_in_threadpool(ingest_bulk, paths, workdir)
+    job = jobs.submit("bulk_upload", bulk_import_service.run_job, paths, workdir)
+    return job.to_dict()
+
+@router.get("/bulk/{job_id}")
+async def get_bulk_upload(job_id: str):
+    job = jobs.get(job_id)
+    if job is None or job.kind != "bulk_upload":
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job.to_dict()
+
+def _get_upload(db, upload_id: str) -> Upload:
+    upload = db.get(Upload, upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Загрузка не найдена")
+    return upload
+
+def _conflict(e: upload_service.UploadConflict):
+    return HTTPException(status_code=409, detail={"message": str(e), "received": e.expected})
+
+@router.post("/sessions")
+def open_upload_session(request: UploadSessionRequest):
+    """Открыть загрузку частями; тот же файл (по sha256) повторно не загружается
+    
+    Ответ created=false: загрузка с этим хэшем уже есть - завершенная (ничего
+    делать не нужно) или незавершенная (продолжить со смещения received).
+    """
+    db = SessionLocal()
+    try:
+        try:
+            upload, created = upload_service.open_upload(db, request.filename, request.size, request.sha256)
+        except ValueError as e:
+            status = 413 if request.size > settings.chunked_upload_max_size else 400
+            raise HTTPException(status_code=status, detail=str(e))
+        return {**upload_service.describe(upload), "created": created}
+    finally:
+        db.close()
+
+@router.get("/sessions/{upload_id}")
+def get_upload_session(upload_id: str):
+    """Состояние загрузки: принятый объем, задача загрузки в БД и ее итог"""
+    db = SessionLocal()
+    try:
+        return upload_service.describe(_get_upload(db, upload_id))
+    finally:
+        db.close()
+
+def append_upload_chunk(upload_id: str, offset: int, data: bytes) -> dict:
+    db = SessionLocal()
+    try:
+        upload = _get_upload(db, upload_id)
         try:
-            result = await upload_csv(file)
-            results.append({
-                "filename": file.filename,
-                "success": True,
-                "message": result["message"]
-            })
-        except Exception as e:
-            results.append({
-                "filename": file.filename,
-                "success": False,
-                "error": str(e)
-            })
-    return {"results": results}
\ No newline at end of file
+            received = upload_service.append_chunk(upload, offset, data)
+        except upload_service.UploadConflict as e:
+            raise _conflict(e)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"upload_id": upload_id, "received": received, "size": upload.size}
+    finally:
+        db.close()
+
+@router.put("/sessions/{upload_id}/chunks")
+async def put_upload_chunk(upload_id: str, offset: int, request: Request):
+    """Часть файла телом запроса со смещения offset; 409 - ожидается другое смещение"""
+    data = bytearray()
+    async for piece in request.stream():
+        data += piece
+        if len(data) > settings.upload_chunk_max_size:
+            raise HTTPException(status_code=413, detail=f"Часть больше {settings.upload_chunk_max_size} байт")
+    return await run_in_threadpool(append_upload_chunk, upload_id, offset, bytes(data))
+
+@router.post("/sessions/{upload_id}/complete")
+def complete_upload_session(upload_id: str):
+    """Файл принят целиком: проверка хэша и загрузка в БД фоновой задачей"""
+    db = SessionLocal()
+    try:
+        try:
+            upload = upload_service.complete(db, _get_upload(db, upload_id))
+        except upload_service.UploadConflict as e:
+            raise _conflict(e)
+        return upload_service.describe(upload)
+    finally:
+        db.close()
+
+@router.delete("/sessions/{upload_id}")
+def delete_upload_session(upload_id: str):
+    """Прервать загрузку и удалить принятые части"""
+    db = SessionLocal()
+    try:
+        deleted = upload_service.cancel(db, _get_upload(db, upload_id))
+        return {"upload_id": upload_id, "deleted": deleted}
+    finally:
+        db.close()
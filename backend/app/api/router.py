@@ -5,7 +5,9 @@ from app.api.endpoints import (
     upload,
     dashboard,
     predictions,
-    map
+    map,
+    analytics,
+    timeseries
 )
 
 api_router = APIRouter()
@@ -15,4 +17,6 @@ api_router.include_router(objects.router, prefix="/objects", tags=["objects"])
 api_router.include_router(diagnostics.router, prefix="/diagnostics", tags=["diagnostics"])
 api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
 api_router.include_router(predictions.router, prefix="/predict", tags=["predictions"])
-api_router.include_router(map.router, prefix="/map", tags=["map"])
\ No newline at end of file
+api_router.include_router(map.router, prefix="/map", tags=["map"])
+api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+api_router.include_router(timeseries.router, prefix="/timeseries", tags=["timeseries"])
\ No newline at end of file
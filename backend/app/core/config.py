@@ -9,6 +9,20 @@ class Settings(BaseSettings):
     
     # Настройки базы данных
     database_url: str = "sqlite:///./integrity.db"
+    db_echo: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800  # секунды, -1 - без пересоздания соединений
+    db_pool_pre_ping: bool = True
+    db_auto_migrate: bool = True  # создавать таблицы и индексы при старте
+    seed_sample_data: bool = False  # заполнить пустую БД тестовыми данными при старте
+    
+    # Прагмы SQLite (применяются к каждому новому соединению)
+    sqlite_wal: bool = True
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kb: int = 65536
     
     # Настройки CORS
     cors_origins: list = [
@@ -19,10 +33,38 @@ class Settings(BaseSettings):
     
     # Настройки файлов
     upload_dir: str = "./uploads"
-    max_upload_size: int = 50 * 1024 * 1024  # 50 MB
+    max_upload_size: int = 50 * 1024 * 1024  # 50 MB: загрузка одним запросом
+    chunked_upload_max_size: int = 50 * 1024 * 1024 * 1024  # 50 GB: загрузка частями
+    upload_chunk_max_size: int = 16 * 1024 * 1024  # 16 MB на одну часть
+    ingest_workers: int = 0  # процессы разбора CSV при пакетной загрузке, 0 - по числу ядер
+    ingest_scoring: bool = True  # проверять загружаемые диагностики моделью и детектором выбросов
     
     # Настройки ML
     ml_model_path: str = "./ml_models/model.pkl"
+    ml_registry_dir: str = "./ml_models"
+    ml_reload_interval: float = 2.0  # секунды между проверками новой версии модели
+    ml_train_n_jobs: int = -1  # потоки обучения леса, -1 - все ядра
+    ml_train_step: int = 10  # деревьев между отчетами о прогрессе и проверками отмены
+    ml_preload: bool = True  # загрузить модель в фоне при старте, иначе - при первом предсказании
+    ml_mmap: bool = False  # отображать массивы модели в память (serve.py включает для воркеров)
+    forecast_threshold: float = 10.0  # предельное значение param1 (потеря металла) для прогноза
+    
+    # Кэш ответов читающих эндпоинтов (сбрасывается при изменении данных)
+    response_cache_max_entries: int = 1024
+    response_cache_max_bytes: int = 64 * 1024 * 1024
+    response_cache_ttl: float = 300.0  # секунды
+    
+    # Векторные тайлы карты
+    tile_cache_size: int = 4096  # тайлов в LRU-кэше
+    
+    # Фоновые задачи
+    job_workers: int = 1
+    job_heartbeat_interval: float = 2.0  # секунды между отметками живости и сохранением прогресса
+    job_lease_seconds: float = 30.0  # без отметки дольше - задача считается прерванной
+    
+    # Несколько воркеров (serve.py): общий журнал событий об изменении данных
+    events_file: str = ""  # пусто - события только внутри процесса
+    events_poll_interval: float = 0.05  # секунды между проверками журнала
     
     # JWT (опционально)
     secret_key: str = "your-secret-key-here-change-in-production"
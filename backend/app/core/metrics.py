@@ -0,0 +1,245 @@
+# backend/app/core/metrics.py
+"""Метрики в формате Prometheus: задержка маршрутов, SQL-запросы и время БД на запрос
+
+MetricsMiddleware кладет в contextvar счетчик текущего запроса, а хуки
+before/after_cursor_execute на всех движках добавляют в него каждое SQL-
+выражение и его длительность (контекст переходит и в пул потоков, и в
+async-движок). Гистограммы снабжены метками method и route - шаблоном пути
+маршрута, а не самим путем, чтобы число рядов не росло с идентификаторами.
+
+Собственная реализация текстового формата 0.0.4 без prometheus_client;
+кэши и фоновые сервисы добавляют свои показатели через register_gauge.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # charset добавляет Response
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Путь без маршрута (404 и т.п.) сводится к одной метке
+UNMATCHED_ROUTE = "<unmatched>"
+
+GaugeValue = Union[float, Dict[Tuple[str, ...], float]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: Tuple[str, ...] = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Метки -> [счетчики по корзинам (последняя - +Inf), сумма]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def count(self, labels: Tuple[str, ...] = ()) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Union[Counter, Histogram]] = []
+        self._gauges: List[Tuple[str, str, Tuple[str, ...], Callable[[], GaugeValue]]] = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_gauge(self, name: str, help: str, func: Callable[[], GaugeValue], labelnames: Sequence[str] = ()):
+        """Показатель, вычисляемый при каждом опросе: число или {метки: число}"""
+        self._gauges.append((name, help, tuple(labelnames), func))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for name, help, labelnames, func in self._gauges:
+            try:
+                value = func()
+            except Exception:
+                logger.exception(f"Ошибка вычисления метрики {name}")
+                continue
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            values = value if isinstance(value, dict) else {(): value}
+            lines += [f"{name}{_labels(labelnames, labels)} {_number(float(v))}" for labels, v in sorted(values.items())]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+ROUTE_LABELS = ("method", "route")
+request_duration = registry.add(Histogram(
+    "http_request_duration_seconds", "Время обработки запроса", ("method", "route", "status")
+))
+request_queries = registry.add(Histogram(
+    "http_request_db_queries", "SQL-выражений за запрос", ROUTE_LABELS, QUERY_BUCKETS
+))
+request_db_time = registry.add(Histogram(
+    "http_request_db_seconds", "Время SQL-выражений за запрос", ROUTE_LABELS
+))
+requests_in_progress = {"value": 0}
+db_queries_total = registry.add(Counter("db_queries_total", "SQL-выражений всего, включая фоновые задачи"))
+db_seconds_total = registry.add(Counter("db_query_seconds_total", "Время SQL-выражений всего"))
+registry.register_gauge("http_requests_in_progress", "Запросов в обработке", lambda: requests_in_progress["value"])
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_db_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    """Счетчик SQL текущего запроса (None вне запроса)"""
+    return _current.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    db_queries_total.inc()
+    db_seconds_total.inc(amount=elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_failed(exception_context):
+    # Упавшее выражение не дойдет до after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def route_label(scope, served_from_cache: bool = False) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Ответ из кэша не доходит до маршрутизации; кэшируемых путей немного
+    return scope["path"] if served_from_cache else UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """ASGI-мидлварь: задержка, число SQL и время БД по маршрутам + заголовок Server-Timing"""
+
+    def __init__(self, app, skip_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = tuple(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = {"code": 500, "cached": False}
+        requests_in_progress["value"] += 1
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                status["cached"] = any(name == b"x-cache" and value == b"HIT" for name, value in message.get("headers", []))
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                timing = (
+                    f'app;dur={elapsed_ms:.1f}, '
+                    f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"'
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timing.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            requests_in_progress["value"] -= 1
+            _current.reset(token)
+            labels = (scope["method"], route_label(scope, status["cached"]))
+            request_duration.observe(time.perf_counter() - started, (*labels, str(status["code"])))
+            request_queries.observe(stats.queries, labels)
+            request_db_time.observe(stats.db_seconds, labels)
@@ -0,0 +1,195 @@
+# backend/app/core/response_cache.py
+"""Кэш ответов GET для читающих эндпоинтов с ETag/304
+
+Ключ - путь и отсортированные параметры запроса. Запись действительна, пока
+не изменилась версия данных (data_events.data_version) и не истек TTL.
+Размер ограничен числом записей и суммой байтов (LRU). ETag - хэш тела,
+поэтому клиент с If-None-Match получает 304 и после пересчета, если данные
+не изменились по существу.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from app.core.config import settings
+from app.services import data_events
+
+# Кэшируемые пути (по префиксу) и исключения из них
+CACHED_PREFIXES = ("/api/dashboard", "/api/diagnostics/stats", "/api/map/", "/api/timeseries")
+EXCLUDED_PREFIXES = ("/api/map/tiles",)  # у тайлов свой кэш и живая статистика
+
+
+class CachedResponse:
+    __slots__ = ("version", "created_at", "status", "headers", "body", "etag")
+
+    def __init__(self, version: int, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.version = version
+        self.created_at = time.monotonic()
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(name) + len(value) for name, value in self.headers)
+
+
+class ResponseCache:
+    """LRU по числу записей и байтам, устаревание по версии данных и TTL"""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, key: str, version: int) -> Optional[CachedResponse]:
+        with self._lock:
+            if version != self._version:
+                # Данные изменились - все записи устарели, освобождаем память сразу
+                self._entries.clear()
+                self._bytes = 0
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None and (entry.version != version or time.monotonic() - entry.created_at > self.ttl):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CachedResponse):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            # Ответ посчитан по версии, которую уже сменила запись данных
+            if entry.version != self._version:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        self._bytes -= self._entries.pop(key).size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "data_version": data_events.data_version()
+            }
+
+
+response_cache = ResponseCache(
+    settings.response_cache_max_entries, settings.response_cache_max_bytes, settings.response_cache_ttl
+)
+
+
+def is_cached_path(path: str) -> bool:
+    return path.startswith(CACHED_PREFIXES) and not path.startswith(EXCLUDED_PREFIXES)
+
+
+def cache_key(path: str, query_string: bytes) -> str:
+    query = sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True))
+    return f"{path}?{urlencode(query)}" if query else path
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # Слабое сравнение: W/"x" совпадает с "x"
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+class ResponseCacheMiddleware:
+    """ASGI-мидлварь: отдает записи кэша, кэширует ответы 200 и отвечает 304"""
+
+    def __init__(self, app, cache: ResponseCache = None):
+        self.app = app
+        self.cache = cache or response_cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not is_cached_path(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if_none_match = headers.get(b"if-none-match", b"").decode("latin-1")
+        key = cache_key(scope["path"], scope["query_string"])
+        # Версия читается до вычисления ответа: запись не окажется новее своего ключа
+        version = data_events.data_version()
+
+        entry = self.cache.get(key, version)
+        if entry is not None:
+            await self._send(send, entry, if_none_match, b"HIT")
+            return
+
+        response = {"status": 200, "headers": [], "body": []}
+
+        async def buffer(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        await self.app(scope, receive, buffer)
+        entry = CachedResponse(
+            version, response["status"],
+            [(name, value) for name, value in response["headers"] if name.lower() != b"content-length"],
+            b"".join(response["body"])
+        )
+        if entry.status == 200:
+            self.cache.put(key, entry)
+        await self._send(send, entry, if_none_match, b"MISS")
+
+    async def _send(self, send, entry: CachedResponse, if_none_match: str, cache_status: bytes):
+        extra = [
+            (b"etag", entry.etag.encode()),
+            (b"cache-control", b"no-cache"),
+            (b"x-cache", cache_status),
+        ]
+        if entry.status == 200 and _etag_matches(if_none_match, entry.etag):
+            self.cache.not_modified += 1
+            await send({"type": "http.response.start", "status": 304, "headers": extra})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers = entry.headers + [(b"content-length", str(len(entry.body)).encode())]
+        if entry.status == 200:
+            headers += extra
+        await send({"type": "http.response.start", "status": entry.status, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
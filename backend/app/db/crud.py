@@ -1,8 +1,11 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, select, tuple_
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from datetime import date, datetime
-from app.db import models
+from app.db import models, rows
+from app.services import risk_service, summary_service, timeseries_service
 
 # CRUD для объектов
 class ObjectCRUD:
@@ -11,24 +14,65 @@ class ObjectCRUD:
         return db.query(models.Object).filter(models.Object.object_id == object_id).first()
     
     @staticmethod
-    def get_objects(
-        db: Session, 
-        skip: int = 0, 
+    def objects_query(
+        skip: int = 0,
         limit: int = 100,
         object_type: Optional[str] = None,
-        pipeline_id: Optional[str] = None
+        pipeline_id: Optional[str] = None,
+        after: Optional[int] = None
     ):
-        query = db.query(models.Object)
+        """SELECT объектов с фильтрами (общий для sync и async CRUD)
+        
+        Порядок - object_id и в режиме смещения (раньше порядок не задавался).
+        after - object_id последней строки предыдущей страницы (keyset):
+        страница начинается сразу за ним, skip при этом не используется.
+        """
+        query = select(models.Object)
         
         if object_type:
-            query = query.filter(models.Object.object_type == object_type)
+            query = query.where(models.Object.object_type == object_type)
         if pipeline_id:
-            query = query.filter(models.Object.pipeline_id == pipeline_id)
-            
-        return query.offset(skip).limit(limit).all()
+            query = query.where(models.Object.pipeline_id == pipeline_id)
+        
+        query = query.order_by(models.Object.object_id)
+        if after is not None:
+            return query.where(models.Object.object_id > after).limit(limit)
+        return query.offset(skip).limit(limit)
+    
+    @staticmethod
+    def get_objects(
+        db: Session, 
+        skip: int = 0, 
+        limit: int = 100,
+        object_type: Optional[str] = None,
+        pipeline_id: Optional[str] = None,
+        after: Optional[int] = None
+    ):
+        query = ObjectCRUD.objects_query(skip, limit, object_type, pipeline_id, after)
+        return db.execute(query).scalars().all()
+    
+    @staticmethod
+    def object_rows_query(**filters):
+        """objects_query без ORM-объектов: только столбцы rows.OBJECT_FIELDS"""
+        return ObjectCRUD.objects_query(**filters).with_only_columns(
+            *rows.plain_columns(models.Object, rows.OBJECT_FIELDS)
+        )
+    
+    @staticmethod
+    def get_object_rows(db: Session, **filters) -> List[Dict[str, Any]]:
+        """Объекты словарями готовых к JSON значений"""
+        result = db.execute(ObjectCRUD.object_rows_query(**filters)).all()
+        return rows.to_dicts(rows.OBJECT_FIELDS, result, rows.value_maps(models.Object, rows.OBJECT_FIELDS))
+    
+    @staticmethod
+    def get_object_risk(db: Session, object_id: int) -> Optional[Dict[str, Any]]:
+        """Балл риска объекта, его факторы и место в рейтинге"""
+        return risk_service.risk_engine.describe(object_id, db=db)
     
     @staticmethod
     def create_object(db: Session, obj_data: dict):
+        summary_service.record_objects(db, {key: [value] for key, value in obj_data.items()})
+        timeseries_service.record_objects(db, {key: [value] for key, value in obj_data.items()})
         db_obj = models.Object(**obj_data)
         db.add(db_obj)
         db.commit()
@@ -39,6 +83,10 @@ class ObjectCRUD:
     def update_object(db: Session, object_id: int, obj_data: dict):
         db_obj = db.query(models.Object).filter(models.Object.object_id == object_id).first()
         if db_obj:
+            current = {column.name: getattr(db_obj, column.name) for column in models.Object.__table__.columns}
+            columns = {key: [value] for key, value in {**current, **obj_data}.items()}
+            summary_service.record_objects(db, columns)
+            timeseries_service.record_objects(db, columns)
             for key, value in obj_data.items():
                 setattr(db_obj, key, value)
             db.commit()
@@ -49,6 +97,8 @@ class ObjectCRUD:
     def delete_object(db: Session, object_id: int):
         db_obj = db.query(models.Object).filter(models.Object.object_id == object_id).first()
         if db_obj:
+            summary_service.forget_object(db, object_id)
+            timeseries_service.forget_object(db, object_id)
             db.delete(db_obj)
             db.commit()
         return db_obj
@@ -60,33 +110,160 @@ class DiagnosticCRUD:
         return db.query(models.Diagnostic).filter(models.Diagnostic.diag_id == diag_id).first()
     
     @staticmethod
-    def get_diagnostics(
-        db: Session,
-        skip: int = 0,
-        limit: int = 100,
+    def filter_diagnostics(
+        query,
         object_id: Optional[int] = None,
         method: Optional[str] = None,
         start_date: Optional[date] = None,
         end_date: Optional[date] = None,
         defect_found: Optional[bool] = None
     ):
-        query = db.query(models.Diagnostic)
-        
+        """Фильтры списка диагностик (общие для страниц и экспорта)"""
         if object_id:
-            query = query.filter(models.Diagnostic.object_id == object_id)
+            query = query.where(models.Diagnostic.object_id == object_id)
         if method:
-            query = query.filter(models.Diagnostic.method == method)
+            query = query.where(models.Diagnostic.method == method)
         if start_date:
-            query = query.filter(models.Diagnostic.date >= start_date)
+            query = query.where(models.Diagnostic.date >= start_date)
         if end_date:
-            query = query.filter(models.Diagnostic.date <= end_date)
+            query = query.where(models.Diagnostic.date <= end_date)
         if defect_found is not None:
-            query = query.filter(models.Diagnostic.defect_found == defect_found)
-            
-        return query.order_by(desc(models.Diagnostic.date)).offset(skip).limit(limit).all()
+            query = query.where(models.Diagnostic.defect_found == defect_found)
+        return query
+    
+    @staticmethod
+    def diagnostics_query(
+        skip: int = 0,
+        limit: int = 100,
+        object_id: Optional[int] = None,
+        method: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        defect_found: Optional[bool] = None,
+        after: Optional[tuple] = None
+    ):
+        """SELECT диагностик с фильтрами (общий для sync и async CRUD)
+        
+        Порядок - (date, diag_id) по убыванию: раньше сортировка шла только по
+        date, diag_id лишь фиксирует порядок строк с одной датой. after - (date, diag_id) последней
+        строки предыдущей страницы (keyset): skip при этом не используется.
+        """
+        query = DiagnosticCRUD.filter_diagnostics(
+            select(models.Diagnostic), object_id, method, start_date, end_date, defect_found
+        )
+        query = query.order_by(desc(models.Diagnostic.date), desc(models.Diagnostic.diag_id))
+        if after is not None:
+            # Сравнение строк (row value) индекс использует как диапазон, OR - нет
+            position = tuple_(models.Diagnostic.date, models.Diagnostic.diag_id)
+            return query.where(position < tuple_(*after)).limit(limit)
+        return query.offset(skip).limit(limit)
+    
+    @staticmethod
+    def get_diagnostics(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        object_id: Optional[int] = None,
+        method: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        defect_found: Optional[bool] = None,
+        after: Optional[tuple] = None
+    ):
+        query = DiagnosticCRUD.diagnostics_query(
+            skip, limit, object_id, method, start_date, end_date, defect_found, after
+        )
+        return db.execute(query).scalars().all()
+    
+    @staticmethod
+    def diagnostic_rows_query(**filters):
+        """diagnostics_query без ORM-объектов: только столбцы rows.DIAGNOSTIC_FIELDS"""
+        return DiagnosticCRUD.diagnostics_query(**filters).with_only_columns(
+            *rows.plain_columns(models.Diagnostic, rows.DIAGNOSTIC_FIELDS)
+        )
+    
+    @staticmethod
+    def get_diagnostic_rows(db: Session, **filters) -> List[Dict[str, Any]]:
+        """Диагностики словарями готовых к JSON значений"""
+        result = db.execute(DiagnosticCRUD.diagnostic_rows_query(**filters)).all()
+        return rows.to_dicts(
+            rows.DIAGNOSTIC_FIELDS, result, rows.value_maps(models.Diagnostic, rows.DIAGNOSTIC_FIELDS)
+        )
+    
+    @staticmethod
+    def latest_diagnostics_query(
+        pipeline_id: Optional[str] = None,
+        method: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        criticality: Optional[str] = None
+    ):
+        """SELECT (объект, его последняя диагностика) и псевдоним последней диагностики"""
+        ranked = select(
+            models.Diagnostic,
+            func.row_number().over(
+                partition_by=models.Diagnostic.object_id,
+                order_by=(desc(models.Diagnostic.date), desc(models.Diagnostic.diag_id))
+            ).label("rn")
+        )
+        
+        # Фильтры диагностик применяются до выбора последней записи
+        if method:
+            ranked = ranked.where(models.Diagnostic.method == method)
+        if date_from:
+            ranked = ranked.where(models.Diagnostic.date >= date_from)
+        if date_to:
+            ranked = ranked.where(models.Diagnostic.date <= date_to)
+        if criticality:
+            ranked = ranked.where(models.Diagnostic.ml_label == models.MLLabel(criticality))
+        
+        ranked = ranked.subquery()
+        latest = aliased(models.Diagnostic, ranked)
+        
+        query = select(models.Object, latest).join(
+            latest, models.Object.object_id == latest.object_id
+        ).where(ranked.c.rn == 1)
+        
+        if pipeline_id:
+            query = query.where(models.Object.pipeline_id == pipeline_id)
+        
+        return query.order_by(models.Object.object_id), latest
+    
+    @staticmethod
+    def get_latest_diagnostics(db: Session, **filters):
+        """Последняя диагностика каждого объекта одним запросом (без N+1)"""
+        query, _ = DiagnosticCRUD.latest_diagnostics_query(**filters)
+        return db.execute(query).all()
+    
+    @staticmethod
+    def get_latest_diagnostic_rows(
+        db: Session, object_fields: List[str], diagnostic_fields: List[str], **filters
+    ) -> Dict[str, List[Any]]:
+        """Объекты с последней диагностикой по столбцам, без ORM-объектов
+        
+        Ключи результата - object_fields и diagnostic_fields (поля диагностики
+        с префиксом "latest_").
+        """
+        query, latest = DiagnosticCRUD.latest_diagnostics_query(**filters)
+        latest_fields = [f"latest_{field}" for field in diagnostic_fields]
+        query = query.with_only_columns(
+            *rows.plain_columns(models.Object, object_fields),
+            *(rows.plain(getattr(latest, field), name) for field, name in zip(diagnostic_fields, latest_fields))
+        )
+        maps = {
+            **rows.value_maps(models.Object, object_fields),
+            **rows.value_maps(latest, diagnostic_fields, latest_fields)
+        }
+        return rows.to_columns(object_fields + latest_fields, db.execute(query).all(), maps)
     
     @staticmethod
     def create_diagnostic(db: Session, diag_data: dict):
+        summary_service.record_diagnostics(db, {
+            field: [diag_data.get(field)] for field in summary_service.DIAGNOSTIC_FIELDS
+        })
+        timeseries_service.record_diagnostics(db, {
+            field: [diag_data.get(field)] for field in timeseries_service.ROW_FIELDS
+        })
         db_diag = models.Diagnostic(**diag_data)
         db.add(db_diag)
         db.commit()
@@ -123,38 +300,108 @@ class DiagnosticCRUD:
         }
     
     @staticmethod
-    def get_top_risks(db: Session, limit: int = 5) -> List[Dict[str, Any]]:
-        """Получить топ объектов по риску"""
-        # Здесь можно реализовать сложную логику расчета рисков
-        # Для MVP используем простую логику на основе ml_label
-        query = db.query(
-            models.Object.object_id,
-            models.Object.object_name,
-            models.Diagnostic.ml_label,
-            models.Diagnostic.date
-        ).join(
-            models.Diagnostic, 
-            models.Object.object_id == models.Diagnostic.object_id
-        ).filter(
-            models.Diagnostic.ml_label.isnot(None)
-        ).order_by(
-            desc(models.Diagnostic.date)
-        ).limit(limit)
-        
-        results = []
-        for row in query.all():
-            # Простой расчет риска на основе ml_label
-            risk_score = {
-                "normal": 30,
-                "medium": 65,
-                "high": 85
-            }.get(row.ml_label.value if row.ml_label else "normal", 50)
-            
-            results.append({
-                "object_id": row.object_id,
-                "object_name": row.object_name,
-                "risk_score": risk_score,
-                "last_defect": row.date.isoformat() if row.date else None
-            })
-        
-        return results
\ No newline at end of file
+    def get_top_risks(db: Session, limit: int = 5, pipeline_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Получить топ объектов по риску (по всему парку или по трубопроводу)"""
+        return risk_service.risk_engine.top(limit, pipeline_id=pipeline_id, db=db)
+    
+    @staticmethod
+    def flags_query(skip: int = 0, limit: int = 100, object_id: Optional[int] = None, kind: Optional[str] = None):
+        """Отметки проверки загрузок с методом и датой диагностики, новые строки сверху"""
+        query = select(
+            *rows.plain_columns(models.DiagnosticFlag, rows.FLAG_FIELDS),
+            rows.plain(models.Diagnostic.method), rows.plain(models.Diagnostic.date)
+        ).outerjoin(models.Diagnostic, models.Diagnostic.diag_id == models.DiagnosticFlag.diag_id)
+        if object_id:
+            query = query.where(models.DiagnosticFlag.object_id == object_id)
+        if kind == "label_mismatch":
+            query = query.where(models.DiagnosticFlag.label_mismatch == True)
+        elif kind == "outlier":
+            query = query.where(models.DiagnosticFlag.outlier == True)
+        return query.order_by(desc(models.DiagnosticFlag.diag_id)).offset(skip).limit(limit)
+
+# CRUD для трасс трубопроводов
+class PipelineCRUD:
+    @staticmethod
+    def get_pipelines(db: Session):
+        return db.query(models.Pipeline).order_by(models.Pipeline.pipeline_id).all()
+
+    @staticmethod
+    def upsert_pipeline(db: Session, pipeline_id: str, name: str, coordinates: List[List[float]]):
+        db_pipeline = db.get(models.Pipeline, pipeline_id)
+        if db_pipeline is None:
+            db_pipeline = models.Pipeline(pipeline_id=pipeline_id)
+            db.add(db_pipeline)
+        db_pipeline.name = name
+        db_pipeline.coordinates = coordinates
+        db.commit()
+        db.refresh(db_pipeline)
+        return db_pipeline
+
+# Асинхронный CRUD: чтение через общие SELECT, запись и агрегаты - через
+# синхронные методы в run_sync, чтобы не дублировать обновление счетчиков
+class AsyncObjectCRUD:
+    @staticmethod
+    async def get_object(db: AsyncSession, object_id: int):
+        return await db.get(models.Object, object_id)
+    
+    @staticmethod
+    async def get_objects(db: AsyncSession, **filters):
+        result = await db.execute(ObjectCRUD.objects_query(**filters))
+        return result.scalars().all()
+    
+    @staticmethod
+    async def get_object_rows(db: AsyncSession, **filters) -> List[Dict[str, Any]]:
+        result = await db.execute(ObjectCRUD.object_rows_query(**filters))
+        return rows.to_dicts(rows.OBJECT_FIELDS, result.all(), rows.value_maps(models.Object, rows.OBJECT_FIELDS))
+    
+    @staticmethod
+    async def get_object_risk(db: AsyncSession, object_id: int) -> Optional[Dict[str, Any]]:
+        return await db.run_sync(ObjectCRUD.get_object_risk, object_id)
+    
+    @staticmethod
+    async def create_object(db: AsyncSession, obj_data: dict):
+        return await db.run_sync(ObjectCRUD.create_object, obj_data)
+    
+    @staticmethod
+    async def update_object(db: AsyncSession, object_id: int, obj_data: dict):
+        return await db.run_sync(ObjectCRUD.update_object, object_id, obj_data)
+    
+    @staticmethod
+    async def delete_object(db: AsyncSession, object_id: int):
+        return await db.run_sync(ObjectCRUD.delete_object, object_id)
+
+class AsyncDiagnosticCRUD:
+    @staticmethod
+    async def get_diagnostic(db: AsyncSession, diag_id: int):
+        return await db.get(models.Diagnostic, diag_id)
+    
+    @staticmethod
+    async def get_diagnostics(db: AsyncSession, **filters):
+        result = await db.execute(DiagnosticCRUD.diagnostics_query(**filters))
+        return result.scalars().all()
+    
+    @staticmethod
+    async def get_diagnostic_rows(db: AsyncSession, **filters) -> List[Dict[str, Any]]:
+        result = await db.execute(DiagnosticCRUD.diagnostic_rows_query(**filters))
+        return rows.to_dicts(
+            rows.DIAGNOSTIC_FIELDS, result.all(), rows.value_maps(models.Diagnostic, rows.DIAGNOSTIC_FIELDS)
+        )
+    
+    @staticmethod
+    async def create_diagnostic(db: AsyncSession, diag_data: dict):
+        return await db.run_sync(DiagnosticCRUD.create_diagnostic, diag_data)
+    
+    @staticmethod
+    async def get_diagnostics_stats(db: AsyncSession) -> Dict[str, Any]:
+        return await db.run_sync(DiagnosticCRUD.get_diagnostics_stats)
+    
+    @staticmethod
+    async def get_top_risks(db: AsyncSession, limit: int = 5, pipeline_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return await db.run_sync(DiagnosticCRUD.get_top_risks, limit, pipeline_id)
+    
+    @staticmethod
+    async def get_flags(db: AsyncSession, **filters) -> List[Dict[str, Any]]:
+        result = await db.execute(DiagnosticCRUD.flags_query(**filters))
+        fields = rows.FLAG_FIELDS + ["method", "date"]
+        maps = {**rows.value_maps(models.DiagnosticFlag, rows.FLAG_FIELDS), "method": rows.ENUM_VALUES[models.MethodType]}
+        return rows.to_dicts(fields, result.all(), maps)
@@ -1,14 +1,84 @@
-from sqlalchemy import create_engine
+from typing import AsyncIterator
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from app.db.models import Base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+from app.core.config import settings
+from app.db.migrations import upgrade
 
-# SQLite для разработки (можно заменить на PostgreSQL)
-SQLALCHEMY_DATABASE_URL = "sqlite:///./integrity.db"
+# URL берется из настроек (DATABASE_URL): SQLite для разработки, PostgreSQL для продакшена
+SQLALCHEMY_DATABASE_URL = settings.database_url
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Асинхронные драйверы для тех же баз
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def async_url(url: str) -> str:
+    """URL синхронного драйвера -> URL асинхронного драйвера той же БД"""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]).render_as_string(hide_password=False)
+
+def engine_options(url: str) -> dict:
+    """Параметры create_engine для URL с учетом диалекта"""
+    url = make_url(url)
+    options = {"echo": settings.db_echo, "pool_pre_ping": settings.db_pool_pre_ping}
+    
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            # Одна общая БД в памяти на все потоки
+            options["poolclass"] = StaticPool
+            return options
+    
+    options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle
+    )
+    return options
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        if settings.sqlite_wal:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kb)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+def build_engine(url: str = SQLALCHEMY_DATABASE_URL) -> Engine:
+    """Создать движок с пулом соединений из настроек"""
+    db_engine = create_engine(url, **engine_options(url))
+    if db_engine.dialect.name == "sqlite":
+        event.listen(db_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+def build_async_engine(url: str = SQLALCHEMY_DATABASE_URL) -> AsyncEngine:
+    """Асинхронный движок с теми же настройками пула и прагмами"""
+    options = engine_options(url)
+    options.pop("connect_args", None)
+    if "pool_size" in options:
+        # aiosqlite по умолчанию работает без пула - задаем его явно
+        options["poolclass"] = AsyncAdaptedQueuePool
+    db_engine = create_async_engine(async_url(url), **options)
+    if db_engine.dialect.name == "sqlite":
+        event.listen(db_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+engine = build_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = build_async_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Зависимость FastAPI: асинхронная сессия на время запроса"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    upgrade(engine)
@@ -0,0 +1,101 @@
+# backend/app/db/dialects.py
+"""Диалектно-зависимые конструкции SQL (SQLite / PostgreSQL)"""
+from sqlalchemy import String
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+
+def insert(bind):
+    """INSERT с поддержкой ON CONFLICT для диалекта подключения"""
+    name = bind.dialect.name
+    if name == "postgresql":
+        return postgresql.insert
+    if name == "sqlite":
+        return sqlite.insert
+    raise ValueError(f"Upsert не поддерживается для диалекта {name}")
+
+
+class month_bucket(FunctionElement):
+    """Месяц даты в виде строки 'YYYY-MM'"""
+    type = String()
+    name = "month_bucket"
+    inherit_cache = True
+
+
+@compiles(month_bucket, "sqlite")
+def _month_bucket_sqlite(element, compiler, **kw):
+    return "strftime('%%Y-%%m', %s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(month_bucket, "postgresql")
+def _month_bucket_postgresql(element, compiler, **kw):
+    return "to_char(%s, 'YYYY-MM')" % compiler.process(element.clauses, **kw)
+
+
+class day_bucket(FunctionElement):
+    """День даты в виде строки 'YYYY-MM-DD'"""
+    type = String()
+    name = "day_bucket"
+    inherit_cache = True
+
+
+@compiles(day_bucket, "sqlite")
+def _day_bucket_sqlite(element, compiler, **kw):
+    return "strftime('%%Y-%%m-%%d', %s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(day_bucket, "postgresql")
+def _day_bucket_postgresql(element, compiler, **kw):
+    return "to_char(%s, 'YYYY-MM-DD')" % compiler.process(element.clauses, **kw)
+
+
+class year_bucket(FunctionElement):
+    """Год даты в виде строки 'YYYY'"""
+    type = String()
+    name = "year_bucket"
+    inherit_cache = True
+
+
+@compiles(year_bucket, "sqlite")
+def _year_bucket_sqlite(element, compiler, **kw):
+    return "strftime('%%Y', %s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(year_bucket, "postgresql")
+def _year_bucket_postgresql(element, compiler, **kw):
+    return "to_char(%s, 'YYYY')" % compiler.process(element.clauses, **kw)
+
+
+class least(FunctionElement):
+    """Меньшее из двух значений; NULL игнорируется, как LEAST в PostgreSQL"""
+    name = "least"
+    inherit_cache = True
+
+
+class greatest(FunctionElement):
+    """Большее из двух значений; NULL игнорируется, как GREATEST в PostgreSQL"""
+    name = "greatest"
+    inherit_cache = True
+
+
+def _pair_sqlite(function: str):
+    # min/max в SQLite возвращают NULL, если любой аргумент NULL
+    def compile_pair(element, compiler, **kw):
+        a, b = (compiler.process(clause, **kw) for clause in element.clauses)
+        return f"{function}(coalesce({a}, {b}), coalesce({b}, {a}))"
+    return compile_pair
+
+
+compiles(least, "sqlite")(_pair_sqlite("min"))
+compiles(greatest, "sqlite")(_pair_sqlite("max"))
+
+
+@compiles(least, "postgresql")
+def _least_postgresql(element, compiler, **kw):
+    return "LEAST(%s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(greatest, "postgresql")
+def _greatest_postgresql(element, compiler, **kw):
+    return "GREATEST(%s)" % compiler.process(element.clauses, **kw)
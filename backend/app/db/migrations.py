@@ -0,0 +1,66 @@
+# backend/app/db/migrations.py
+"""Приведение существующей БД к текущей схеме: новые таблицы, недостающие и устаревшие индексы
+
+Запуск вручную из каталога backend:
+    python -m app.db.migrations
+"""
+import logging
+from typing import List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app.db.models import Base
+
+logger = logging.getLogger(__name__)
+
+# Индексы, замененные более полными: удаляются при миграции
+OBSOLETE_INDEXES = {
+    "diagnostics": ["ix_diagnostics_date"],  # -> ix_diagnostics_date_id
+}
+
+
+def ensure_indexes(bind: Engine) -> List[str]:
+    """Создать индексы из моделей, которых еще нет в БД"""
+    inspector = inspect(bind)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=bind)
+                created.append(index.name)
+                logger.info(f"Создан индекс {index.name}")
+    return created
+
+
+def drop_obsolete_indexes(bind: Engine) -> List[str]:
+    """Удалить индексы из OBSOLETE_INDEXES, если они остались в БД"""
+    inspector = inspect(bind)
+    dropped = []
+    with bind.begin() as conn:
+        for table, names in OBSOLETE_INDEXES.items():
+            existing = {index["name"] for index in inspector.get_indexes(table)}
+            for name in names:
+                if name in existing:
+                    conn.execute(text(f"DROP INDEX {name}"))
+                    dropped.append(name)
+                    logger.info(f"Удален индекс {name}")
+    return dropped
+
+
+def upgrade(bind: Engine) -> List[str]:
+    """Создать недостающие таблицы и индексы, удалить устаревшие индексы"""
+    Base.metadata.create_all(bind=bind)
+    created = ensure_indexes(bind)
+    drop_obsolete_indexes(bind)
+    return created
+
+
+if __name__ == "__main__":
+    from app.db.database import engine
+
+    created = upgrade(engine)
+    print(f"Миграция завершена. Создано индексов: {len(created)}")
+    for name in created:
+        print(f"  - {name}")
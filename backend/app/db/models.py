@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Date, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, Date, DateTime, Enum, Index, JSON
 from sqlalchemy.ext.declarative import declarative_base
 import enum
 
@@ -33,6 +33,12 @@ class MLLabel(enum.Enum):
     MEDIUM = "medium"
     HIGH = "high"
 
+class UploadStatus(enum.Enum):
+    UPLOADING = "uploading"
+    INGESTING = "ingesting"
+    DONE = "done"
+    FAILED = "failed"
+
 class Object(Base):
     __tablename__ = "objects"
     
@@ -44,6 +50,12 @@ class Object(Base):
     lon = Column(Float, nullable=False)
     year = Column(Integer, nullable=False)
     material = Column(String, nullable=False)
+    
+    # Индексы под фильтры в crud.py, map.py и dashboard.py
+    __table_args__ = (
+        Index("ix_objects_pipeline_id", "pipeline_id"),
+        Index("ix_objects_object_type", "object_type"),
+    )
 
 class Diagnostic(Base):
     __tablename__ = "diagnostics"
@@ -61,4 +73,134 @@ class Diagnostic(Base):
     param1 = Column(Float)
     param2 = Column(Float)
     param3 = Column(Float)
-    ml_label = Column(Enum(MLLabel))
\ No newline at end of file
+    ml_label = Column(Enum(MLLabel))
+    
+    # Индексы под фильтры, соединения и сортировки в crud.py, map.py и dashboard.py
+    __table_args__ = (
+        # История объекта и последняя диагностика на объект
+        Index("ix_diagnostics_object_date", object_id, date.desc(), diag_id.desc()),
+        # Сортировка по дате, фильтры по периоду и keyset-пагинация по (date, diag_id)
+        Index("ix_diagnostics_date_id", date.desc(), diag_id.desc()),
+        # Распределения и дефекты по методам
+        Index("ix_diagnostics_method_defect", method, defect_found),
+        # Распределение по критичности
+        Index("ix_diagnostics_ml_label", ml_label),
+    )
+
+class Pipeline(Base):
+    """Трасса магистрали: coordinates - список [lon, lat] вдоль линии"""
+    __tablename__ = "pipelines"
+    
+    pipeline_id = Column(String, primary_key=True)
+    name = Column(String, nullable=False)
+    coordinates = Column(JSON, nullable=False)
+
+class SummaryCounter(Base):
+    """Материализованные счетчики дашборда, обновляются инкрементально при записи"""
+    __tablename__ = "summary_counters"
+    
+    metric = Column(String, primary_key=True)
+    key = Column(String, primary_key=True, default="")
+    value = Column(Integer, nullable=False, default=0)
+
+class DiagnosticRollup(Base):
+    """Агрегаты диагностик за период: трубопровод/весь парк x день/месяц/год
+    
+    Обновляются при записи диагностик; stale - min/max могли устареть после
+    замены строк, период пересчитывается по таблице diagnostics при чтении.
+    """
+    __tablename__ = "diagnostic_rollups"
+    
+    scope = Column(String, primary_key=True)  # pipeline | fleet
+    key = Column(String, primary_key=True, default="")  # pipeline_id или ""
+    granularity = Column(String, primary_key=True)  # day | month | year
+    period = Column(String, primary_key=True)  # YYYY-MM-DD | YYYY-MM | YYYY
+    inspections = Column(Integer, nullable=False, default=0)
+    defects = Column(Integer, nullable=False, default=0)
+    param1_count = Column(Integer, nullable=False, default=0)
+    param1_sum = Column(Float, nullable=False, default=0.0)
+    param1_min = Column(Float)
+    param1_max = Column(Float)
+    param2_count = Column(Integer, nullable=False, default=0)
+    param2_sum = Column(Float, nullable=False, default=0.0)
+    param2_min = Column(Float)
+    param2_max = Column(Float)
+    param3_count = Column(Integer, nullable=False, default=0)
+    param3_sum = Column(Float, nullable=False, default=0.0)
+    param3_min = Column(Float)
+    param3_max = Column(Float)
+    stale = Column(Boolean, nullable=False, default=False)
+    
+    __table_args__ = (
+        Index("ix_diagnostic_rollups_stale", "stale"),
+    )
+
+class Upload(Base):
+    """Загрузка CSV частями: файл собирается в upload_dir, затем загружается фоновой задачей"""
+    __tablename__ = "uploads"
+    
+    upload_id = Column(String, primary_key=True)
+    filename = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    sha256 = Column(String, nullable=False)
+    status = Column(Enum(UploadStatus), nullable=False, default=UploadStatus.UPLOADING)
+    job_id = Column(String)
+    result = Column(JSON)
+    error = Column(String)
+    created_at = Column(DateTime, nullable=False)
+    completed_at = Column(DateTime)
+    
+    # Повторная отправка того же файла находит прежнюю загрузку по хэшу
+    __table_args__ = (
+        Index("ix_uploads_sha256", "sha256"),
+    )
+
+class DiagnosticFlag(Base):
+    """Замечание к загруженной диагностике: модель не согласна с меткой из файла или строка - выброс
+    
+    Пишется при загрузке CSV только для отмеченных строк; повторная загрузка
+    строки заменяет или снимает замечание.
+    """
+    __tablename__ = "diagnostic_flags"
+    
+    diag_id = Column(Integer, primary_key=True)
+    object_id = Column(Integer, nullable=False)
+    stated_label = Column(Enum(MLLabel))  # метка из файла
+    predicted_label = Column(Enum(MLLabel), nullable=False)
+    confidence = Column(Float, nullable=False)  # вероятность предсказанной метки
+    anomaly_score = Column(Float, nullable=False)  # наибольший робастный z по признакам
+    label_mismatch = Column(Boolean, nullable=False, default=False)
+    outlier = Column(Boolean, nullable=False, default=False)
+    model_version = Column(String)
+    scored_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_diagnostic_flags_object", "object_id"),
+    )
+
+class JobRecord(Base):
+    """Фоновая задача, видимая всем воркерам
+    
+    Выполняет задачу воркер owner; heartbeat_at он обновляет, пока задача
+    идет. Незавершенная задача с устаревшим heartbeat_at считается прерванной.
+    Отмену из другого воркера передает cancel_requested.
+    """
+    __tablename__ = "jobs"
+    
+    job_id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    progress = Column(Float, nullable=False, default=0.0)
+    message = Column(String)
+    result = Column(JSON)
+    error = Column(String)
+    owner = Column(String, nullable=False)  # host:pid выполняющего процесса
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    heartbeat_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_jobs_kind_created", "kind", "created_at"),
+    )
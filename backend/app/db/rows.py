@@ -0,0 +1,64 @@
+# backend/app/db/rows.py
+"""Чтение строк без ORM-объектов: SELECT столбцов -> словари готовых значений
+
+Enum и даты выбираются без обработчиков типов SQLAlchemy (type_coerce в
+String): enum приходит хранимым именем и переводится в значение словарем,
+дата SQLite - строкой ISO (PostgreSQL отдает date, его кодирует JSON-кодировщик).
+"""
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import Date, Enum, String, type_coerce
+
+from app.db.models import ObjectType, MethodType, QualityGrade, MLLabel
+
+OBJECT_FIELDS = ["object_id", "object_name", "object_type", "pipeline_id", "lat", "lon", "year", "material"]
+DIAGNOSTIC_FIELDS = [
+    "diag_id", "object_id", "method", "date", "temperature", "humidity", "illumination",
+    "defect_found", "defect_description", "quality_grade", "param1", "param2", "param3", "ml_label"
+]
+FLAG_FIELDS = [
+    "diag_id", "object_id", "stated_label", "predicted_label", "confidence", "anomaly_score",
+    "label_mismatch", "outlier", "model_version", "scored_at"
+]
+
+# Хранимое имя -> значение для каждого enum
+ENUM_VALUES = {
+    enum_class: {member.name: member.value for member in enum_class}
+    for enum_class in (ObjectType, MethodType, QualityGrade, MLLabel)
+}
+
+
+def plain(column, name: str = None):
+    """Столбец без обработчика типа для enum и дат"""
+    name = name or column.key
+    if isinstance(column.type, (Enum, Date)):
+        return type_coerce(column, String).label(name)
+    return column.label(name)
+
+
+def plain_columns(entity, fields: Sequence[str]) -> List:
+    """Столбцы fields модели (или ее псевдонима) для SELECT"""
+    return [plain(getattr(entity, field), field) for field in fields]
+
+
+def value_maps(entity, fields: Sequence[str], names: Sequence[str] = None) -> Dict[str, Dict[str, str]]:
+    """Словари имя -> значение для enum-полей из fields (ключи - names, если заданы)"""
+    maps = {}
+    for field, name in zip(fields, names or fields):
+        column_type = getattr(entity, field).type
+        if isinstance(column_type, Enum):
+            maps[name] = ENUM_VALUES[column_type.enum_class]
+    return maps
+
+
+def to_columns(fields: Sequence[str], rows, maps: Dict[str, Dict[str, str]]) -> Dict[str, List[Any]]:
+    """Строки -> столбцы с переведенными enum (перевод одним проходом по столбцу)"""
+    columns = dict(zip(fields, map(list, zip(*rows)))) if rows else {field: [] for field in fields}
+    for field, values in maps.items():
+        columns[field] = [values.get(value, value) for value in columns[field]]
+    return columns
+
+
+def to_dicts(fields: Sequence[str], rows, maps: Dict[str, Dict[str, str]]) -> List[Dict[str, Any]]:
+    columns = to_columns(fields, rows, maps)
+    return [dict(zip(fields, row)) for row in zip(*(columns[field] for field in fields))]
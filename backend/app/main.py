@@ -1,24 +1,74 @@
 # backend/app/main.py
-from fastapi import FastAPI
+import logging
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.router import api_router
-from app.db.models import Base
-from app.db.database import engine  # Изменено с app.db.database
-from init_db import seed_sample_data
+from app.api.endpoints import predictions
+from app.core import metrics
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware
+from app.core.response_cache import ResponseCacheMiddleware, response_cache
+from app.db.database import SessionLocal, engine, async_engine  # Изменено с app.db.database
+from app.db.migrations import upgrade
+from app.ml import forecast
+from app.services import bulk_import_service, data_events, risk_service, scoring_service, tile_service, timeseries_service
+from app.services.job_service import jobs
+from init_db import seed_sample_data, seed_pipelines
 
-# Создаем таблицы
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-# Заполняем тестовыми данными
-seed_sample_data()
+def startup():
+    """Подготовка БД при старте процесса (не при импорте модуля)"""
+    started = time.perf_counter()
+    if settings.db_auto_migrate:
+        # Создаем таблицы и недостающие индексы
+        upgrade(engine)
+    if settings.seed_sample_data:
+        # Тестовые данные - только по явному запросу (SEED_SAMPLE_DATA=true)
+        seed_sample_data()
+        seed_pipelines()
+    if settings.db_auto_migrate:
+        # Первичная сборка агрегатов временных рядов - здесь, а не в первом запросе
+        db = SessionLocal()
+        try:
+            timeseries_service.initialize(db)
+        finally:
+            db.close()
+    logger.info(f"Подготовка БД при старте: {time.perf_counter() - started:.2f} с")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(startup)
+    if settings.events_file:
+        # Изменения данных в других воркерах сбрасывают кэши этого процесса
+        data_events.share(settings.events_file, settings.events_poll_interval)
+    if settings.ml_preload:
+        # Модель грузится в фоне: воркер отвечает на запросы, не дожидаясь ее
+        predictions.start_warmup()
+    yield
+    # Запросить отмену фоновых задач и не ждать их завершения
+    jobs.shutdown()
+    bulk_import_service.shutdown()
+    scoring_service.shutdown()
+    data_events.unshare()
+    # Закрыть соединения асинхронного пула (потоки aiosqlite не дают процессу завершиться)
+    await async_engine.dispose()
 
 app = FastAPI(
     title="IntegrityOS API",
     description="API для системы мониторинга трубопроводов",
     version="1.0.0",
-    redirect_slashes=False  # Добавляем для предотвращения 307 редиректов
+    redirect_slashes=False,  # Добавляем для предотвращения 307 редиректов
+    lifespan=lifespan
 )
 
+# Кэш ответов дашборда и карты; добавлен до CORS, чтобы CORS-заголовки не кэшировались
+app.add_middleware(ResponseCacheMiddleware)
+
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +78,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Метрики добавлены последними: внешний слой измеряет и ответы из кэша
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(api_router, prefix="/api")
 
 @app.get("/")
@@ -53,9 +106,60 @@ def health_check():
     return {
         "status": "healthy",
         "service": "IntegrityOS API",
+        "ml_ready": predictions.predictor.ready,
         "timestamp": __import__("datetime").datetime.now().isoformat()
     }
 
+@app.get("/cache/stats")
+def cache_stats():
+    """Попадания, промахи и занятая память кэша ответов"""
+    return response_cache.stats()
+
+# Показатели кэшей и фоновых сервисов, вычисляемые при опросе /metrics
+metrics.registry.register_gauge("data_version", "Версия данных (растет при каждом изменении)", data_events.data_version)
+metrics.registry.register_gauge(
+    "response_cache", "Кэш ответов: записи, байты, попадания, промахи, 304, вытеснения",
+    lambda: {
+        (name,): response_cache.stats()[name]
+        for name in ("entries", "bytes", "hits", "misses", "not_modified", "evictions")
+    },
+    ("stat",)
+)
+metrics.registry.register_gauge(
+    "tile_cache", "Кэш векторных тайлов: тайлы, байты, попадания, промахи",
+    lambda: {(name,): tile_service.tiles.stats()[name] for name in ("tiles", "bytes", "hits", "misses")},
+    ("stat",)
+)
+metrics.registry.register_gauge(
+    "risk_engine", "Рейтинг риска: пересборки, инкрементальные обновления, длительность последнего обновления",
+    lambda: {(name,): value for name, value in risk_service.risk_engine.stats.items()},
+    ("stat",)
+)
+metrics.registry.register_gauge(
+    "forecast_engine", "Тренды деградации: пересборки, инкрементальные обновления, длительность последнего обновления",
+    lambda: {(name,): value for name, value in forecast.forecaster.stats.items()},
+    ("stat",)
+)
+metrics.registry.register_gauge(
+    "ingest_scoring", "Проверка загрузок: строк проверено, расхождений с меткой, выбросов, обновлений эталона",
+    lambda: {(name,): value for name, value in scoring_service.scorer.stats.items()},
+    ("stat",)
+)
+metrics.registry.register_gauge(
+    "jobs", "Фоновые задачи этого процесса по типу и статусу",
+    lambda: Counter((job.kind, job.status) for job in jobs.list(local=True)),
+    ("kind", "status")
+)
+# У StaticPool (SQLite в памяти) счетчика выданных соединений нет
+metrics.registry.register_gauge(
+    "db_pool_checked_out", "Соединений пула выдано", lambda: getattr(engine.pool, "checkedout", lambda: 0)()
+)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,79 @@
+# backend/app/ml/anomaly.py
+"""Детектор выбросов без учителя: робастный z по параметрам и условиям контроля
+
+Для каждого метода контроля по эталонной выборке запоминаются медиана и
+MAD признаков. Оценка строки - наибольший по признакам модуль
+z = (x - медиана) / (1.4826 * MAD); пустые значения не учитываются.
+Группы с малой выборкой используют общие для всех методов статистики.
+"""
+import warnings
+from typing import Dict, Optional
+
+import numpy as np
+
+ANOMALY_FEATURES = ["param1", "param2", "param3", "temperature", "humidity", "illumination"]
+# Порог робастного z (Iglewicz, Hoaglin): выше - выброс
+Z_THRESHOLD = 3.5
+# Меньше строк метода в эталоне - используются общие статистики
+MIN_GROUP_ROWS = 30
+MAD_SCALE = 1.4826
+
+
+def _robust_stats(X: np.ndarray):
+    median = np.nanmedian(X, axis=0)
+    scale = MAD_SCALE * np.nanmedian(np.abs(X - median), axis=0)
+    # MAD = 0 (больше половины значений совпадает): масштаб по стандартному отклонению
+    std = np.nanstd(X, axis=0)
+    scale = np.where(scale > 0, scale, np.where(std > 0, std, np.nan))
+    return median, scale
+
+
+class OutlierDetector:
+    """Робастные статистики признаков по группам (методам контроля)"""
+
+    def __init__(self):
+        self.groups: Dict[str, int] = {}
+        self.median: Optional[np.ndarray] = None  # (группы + общая) x признаки
+        self.scale: Optional[np.ndarray] = None
+        self.reference_rows = 0
+
+    @property
+    def fitted(self) -> bool:
+        return self.median is not None
+
+    def fit(self, X: np.ndarray, groups: np.ndarray) -> "OutlierDetector":
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(ANOMALY_FEATURES))
+        groups = np.asarray(groups, dtype=object)
+        names, index = np.unique(groups, return_inverse=True)
+        medians, scales = [], []
+        self.groups = {}
+        with warnings.catch_warnings():
+            # Признак без значений в группе -> NaN, строки по нему не оцениваются
+            warnings.simplefilter("ignore", RuntimeWarning)
+            overall = _robust_stats(X)
+            # Цикл по методам (их около десятка), не по строкам
+            for i, name in enumerate(names.tolist()):
+                rows = index == i
+                if rows.sum() >= MIN_GROUP_ROWS:
+                    self.groups[name] = len(medians)
+                    median, scale = _robust_stats(X[rows])
+                    medians.append(median)
+                    scales.append(scale)
+        # Последняя строка - общие статистики для малых и незнакомых групп
+        self.median = np.vstack(medians + [overall[0]])
+        self.scale = np.vstack(scales + [overall[1]])
+        self.reference_rows = len(X)
+        return self
+
+    def score(self, X: np.ndarray, groups: np.ndarray) -> np.ndarray:
+        """Наибольший |z| по признакам для каждой строки (0 - нечего оценивать)"""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(ANOMALY_FEATURES))
+        fallback = len(self.median) - 1
+        names, index = np.unique(np.asarray(groups, dtype=object), return_inverse=True)
+        rows = np.asarray([self.groups.get(name, fallback) for name in names.tolist()], dtype=np.intp)[index]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = np.abs(X - self.median[rows]) / self.scale[rows]
+        return np.nan_to_num(z, nan=0.0).max(axis=1, initial=0.0)
+
+    def is_outlier(self, scores: np.ndarray) -> np.ndarray:
+        return scores > Z_THRESHOLD
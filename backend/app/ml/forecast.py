@@ -0,0 +1,282 @@
+# backend/app/ml/forecast.py
+"""Прогноз деградации объектов: тренд param1 и время до предельного значения
+
+По каждому объекту строится прямая МНК param1(t) по диагностикам методов,
+измеряющих потерю металла (MFL, UTWM). Все объекты считаются одним проходом
+без цикла по объектам: суммы по группам собираются np.bincount по индексу
+объекта, из них - рост в год, уровень и разброс остатков. Время до порога
+считается векторно при запросе, поэтому порог можно менять без пересчета.
+
+Тренды хранятся в массивах, упорядоченных по object_id. После коммита
+data_events сообщает, какие объекты изменились: при следующем чтении
+пересчитываются только они (выборка по индексу object_id), при неизвестном
+или слишком большом наборе - полная пересборка.
+"""
+import logging
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, Optional, Set
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import Object, Diagnostic, MethodType
+from app.services import data_events
+
+logger = logging.getLogger(__name__)
+
+# Методы, у которых param1 - измеренная потеря металла
+TREND_METHODS = (MethodType.MFL, MethodType.UTWM)
+EPOCH = np.datetime64("2000-01-01", "D")
+DAYS_PER_YEAR = 365.25
+# Доля парка в очереди изменений, начиная с которой выгоднее полная пересборка
+REBUILD_FRACTION = 0.2
+IN_BATCH = 5000
+
+TREND_FIELDS = [
+    "object_id", "object_name", "pipeline_id", "n", "mean_t", "mean_y", "slope",
+    "residual_std", "first_t", "last_t", "last_value"
+]
+
+
+def to_years(dates) -> np.ndarray:
+    """Даты -> годы от EPOCH (float)"""
+    return (np.asarray(dates, dtype="datetime64[D]") - EPOCH).astype(np.float64) / DAYS_PER_YEAR
+
+
+def to_date(years: float) -> date:
+    return (EPOCH + np.timedelta64(int(round(years * DAYS_PER_YEAR)), "D")).astype(date)
+
+
+def load_measurements(db: Session, object_ids: Optional[Set[int]] = None) -> Dict[str, Any]:
+    """Измерения param1 по столбцам; object_ids - только эти объекты (по индексу object_id)"""
+    columns = (Diagnostic.object_id, Object.object_name, Object.pipeline_id, Diagnostic.date, Diagnostic.param1)
+    join = Object.object_id == Diagnostic.object_id
+    if object_ids is None:
+        query = select(*columns).join(Object, join).where(
+            Diagnostic.method.in_(TREND_METHODS), Diagnostic.param1.isnot(None)
+        )
+        result = db.execute(query).all()
+    else:
+        # Метод фильтруется после выборки: иначе SQLite выбирает индекс по методу вместо object_id
+        query = select(*columns, Diagnostic.method).join(Object, join).where(Diagnostic.param1.isnot(None))
+        ids = sorted(object_ids)
+        result = [
+            row[:len(columns)]
+            for start in range(0, len(ids), IN_BATCH)
+            for row in db.execute(query.where(Diagnostic.object_id.in_(ids[start:start + IN_BATCH])))
+            if row.method in TREND_METHODS
+        ]
+
+    values = list(zip(*result)) or [()] * len(columns)
+    return {
+        "object_id": np.asarray(values[0], dtype=np.int64),
+        "object_name": np.asarray(values[1], dtype=object),
+        "pipeline_id": np.asarray(values[2], dtype=object),
+        "t": to_years(values[3]) if result else np.zeros(0),
+        "value": np.asarray(values[4], dtype=np.float64),
+    }
+
+
+def fit_trends(measurements: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Прямая МНК value(t) для каждого объекта сразу по всем строкам
+
+    slope - рост в год (NaN, если точек меньше двух или все в один день),
+    уровень на момент t: mean_y + slope * (t - mean_t).
+    """
+    object_ids, index = np.unique(measurements["object_id"], return_inverse=True)
+    t, y = measurements["t"], measurements["value"]
+    groups = len(object_ids)
+
+    n = np.bincount(index, minlength=groups).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_t = np.bincount(index, t, groups) / n
+        mean_y = np.bincount(index, y, groups) / n
+        # Суммы по отклонениям от средних объекта: без потери точности на больших t
+        dt, dy = t - mean_t[index], y - mean_y[index]
+        sxx = np.bincount(index, dt * dt, groups)
+        sxy = np.bincount(index, dt * dy, groups)
+        syy = np.bincount(index, dy * dy, groups)
+        valid = (n >= 2) & (sxx > 1e-12)
+        slope = np.where(valid, sxy / np.where(valid, sxx, 1.0), np.nan)
+        sse = np.maximum(syy - np.nan_to_num(slope) * sxy, 0.0)
+        residual_std = np.where(valid & (n > 2), np.sqrt(sse / np.maximum(n - 2, 1)), np.nan)
+
+    # Первая и последняя точка объекта: сортировка по (объект, t)
+    order = np.lexsort((t, index))
+    starts = np.flatnonzero(np.diff(index[order], prepend=-1))
+    first = order[starts]
+    last = order[np.append(starts[1:], len(order))[:len(starts)] - 1]
+    return {
+        "object_id": object_ids,
+        "object_name": measurements["object_name"][first],
+        "pipeline_id": measurements["pipeline_id"][first],
+        "n": n.astype(np.int64),
+        "mean_t": mean_t,
+        "mean_y": mean_y,
+        "slope": slope,
+        "residual_std": residual_std,
+        "first_t": t[first],
+        "last_t": t[last],
+        "last_value": y[last],
+    }
+
+
+def time_to_threshold(trends: Dict[str, np.ndarray], threshold: float, now: float) -> Dict[str, np.ndarray]:
+    """Уровень сейчас и лет до порога для всех объектов (inf - роста нет, NaN - мало данных)"""
+    slope = trends["slope"]
+    fitted = trends["mean_y"] + np.nan_to_num(slope) * (now - trends["mean_t"])
+    # Потеря металла не убывает: уровень не ниже последнего измерения
+    level = np.where(np.isnan(slope), trends["last_value"], np.maximum(fitted, trends["last_value"]))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        years = np.where(
+            level >= threshold, 0.0,
+            np.where(np.isnan(slope), np.nan, np.where(slope > 0, (threshold - level) / slope, np.inf))
+        )
+    return {"level": level, "years": years}
+
+
+def _status(years: float, slope: float) -> str:
+    if years == 0.0:
+        return "exceeded"
+    if np.isnan(slope):
+        return "insufficient_data"
+    return "growing" if slope > 0 else "stable"
+
+
+def _empty() -> Dict[str, np.ndarray]:
+    return fit_trends({
+        "object_id": np.zeros(0, dtype=np.int64), "object_name": np.zeros(0, dtype=object),
+        "pipeline_id": np.zeros(0, dtype=object), "t": np.zeros(0), "value": np.zeros(0),
+    })
+
+
+class ForecastEngine:
+    """Тренды деградации всего парка, поддерживаемые инкрементально по событиям data_events"""
+
+    def __init__(self):
+        self.trends = _empty()
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending: Set[int] = set()
+        self._rebuild = True
+        self.stats = {"full_rebuilds": 0, "incremental_updates": 0, "last_refresh_seconds": 0.0}
+        data_events.subscribe_objects(self.mark_changed)
+
+    def mark_changed(self, object_ids: Optional[Set[int]] = None):
+        with self._pending_lock:
+            if object_ids is None:
+                self._rebuild = True
+            else:
+                self._pending |= set(object_ids)
+
+    def _update(self, db: Session, object_ids: Set[int]):
+        fresh = fit_trends(load_measurements(db, object_ids))
+        # Строки измененных объектов заменяются пересчитанными, порядок по object_id сохраняется
+        keep = ~np.isin(self.trends["object_id"], np.fromiter(object_ids, dtype=np.int64))
+        merged = {name: np.concatenate([self.trends[name][keep], fresh[name]]) for name in TREND_FIELDS}
+        order = np.argsort(merged["object_id"], kind="stable")
+        self.trends = {name: values[order] for name, values in merged.items()}
+        self.stats["incremental_updates"] += 1
+
+    def refresh(self, db: Optional[Session] = None):
+        """Применить накопленные изменения (или пересобрать тренды)"""
+        with self._lock:
+            with self._pending_lock:
+                rebuild, pending = self._rebuild, self._pending
+                self._rebuild, self._pending = False, set()
+            if not rebuild and not pending:
+                return
+            if len(pending) > REBUILD_FRACTION * max(len(self.trends["object_id"]), 1):
+                rebuild = True
+
+            started = time.perf_counter()
+            own_session = db is None
+            db = db or SessionLocal()
+            try:
+                if rebuild:
+                    self.trends = fit_trends(load_measurements(db))
+                    self.stats["full_rebuilds"] += 1
+                else:
+                    self._update(db, pending)
+            except Exception:
+                # Изменения не потеряны: следующая попытка пересоберет тренды целиком
+                self.mark_changed(None)
+                raise
+            finally:
+                if own_session:
+                    db.close()
+            self.stats["last_refresh_seconds"] = time.perf_counter() - started
+            logger.info(
+                f"Тренды деградации: {'пересборка' if rebuild else f'обновлено {len(pending)} объектов'} "
+                f"за {self.stats['last_refresh_seconds']:.3f} с"
+            )
+
+    def _describe(self, i: int, threshold: float, level: float, years: float, now: float) -> Dict[str, Any]:
+        trends = self.trends
+        slope = float(trends["slope"][i])
+        finite = np.isfinite(years)
+        return {
+            "object_id": int(trends["object_id"][i]),
+            "object_name": trends["object_name"][i],
+            "pipeline_id": trends["pipeline_id"][i],
+            "measurements": int(trends["n"][i]),
+            "first_inspection": to_date(trends["first_t"][i]).isoformat(),
+            "last_inspection": to_date(trends["last_t"][i]).isoformat(),
+            "last_value": float(trends["last_value"][i]),
+            "growth_per_year": None if np.isnan(slope) else round(slope, 4),
+            "residual_std": None if np.isnan(trends["residual_std"][i]) else round(float(trends["residual_std"][i]), 4),
+            "current_level": round(float(level), 4),
+            "threshold": threshold,
+            "status": _status(float(years), slope),
+            "years_to_threshold": round(float(years), 2) if finite else None,
+            "threshold_date": to_date(now + years).isoformat() if finite else None,
+        }
+
+    def forecast(self, object_id: int, threshold: Optional[float] = None, today: Optional[date] = None,
+                 db: Optional[Session] = None) -> Optional[Dict[str, Any]]:
+        """Тренд и срок достижения порога для одного объекта (None - нет измерений)"""
+        self.refresh(db)
+        threshold = settings.forecast_threshold if threshold is None else threshold
+        trends = self.trends
+        i = int(np.searchsorted(trends["object_id"], object_id))
+        if i == len(trends["object_id"]) or trends["object_id"][i] != object_id:
+            return None
+        now = float(to_years([today or date.today()])[0])
+        one = {name: values[i:i + 1] for name, values in trends.items()}
+        result = time_to_threshold(one, threshold, now)
+        return self._describe(i, threshold, result["level"][0], result["years"][0], now)
+
+    def schedule(self, threshold: Optional[float] = None, horizon_years: float = 5.0, limit: int = 100,
+                 pipeline_id: Optional[str] = None, today: Optional[date] = None,
+                 db: Optional[Session] = None) -> Dict[str, Any]:
+        """Объекты, которые достигнут порога в пределах горизонта, от ближайшего срока"""
+        self.refresh(db)
+        threshold = settings.forecast_threshold if threshold is None else threshold
+        now = float(to_years([today or date.today()])[0])
+        trends = self.trends
+        result = time_to_threshold(trends, threshold, now)
+        years = result["years"]
+        due = np.isfinite(years) & (years <= horizon_years)
+        if pipeline_id is not None:
+            due &= trends["pipeline_id"] == pipeline_id
+        candidates = np.flatnonzero(due)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(years[candidates], limit - 1)[:limit]]
+        # Порядок: срок, затем object_id - стабильный при равных сроках
+        candidates = candidates[np.lexsort((trends["object_id"][candidates], years[candidates]))]
+        return {
+            "threshold": threshold,
+            "horizon_years": horizon_years,
+            "as_of": (today or date.today()).isoformat(),
+            "total_due": int(due.sum()),
+            "objects_with_trend": int(np.isfinite(trends["slope"]).sum()),
+            "items": [self._describe(i, threshold, result["level"][i], years[i], now) for i in candidates.tolist()],
+        }
+
+
+forecaster = ForecastEngine()
@@ -1,106 +1,198 @@
 # backend/app/ml/model.py
-import pandas as pd
+"""Предсказатель критичности: инференс по скомпилированному лесу из реестра
+
+Для предсказаний нужен только NumPy. pandas и scikit-learn импортируются
+лишь при обучении (и переносе pickle-модели), поэтому процесс, который
+только отвечает на запросы, их не загружает.
+"""
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
 import pickle
 import os
+import threading
+import time
 from datetime import datetime
 import logging
 
+from app.core.config import settings
+from app.ml.registry import CompiledForest, ModelRegistry
+
 logger = logging.getLogger(__name__)
 
+# Порядок признаков во входной матрице и значения по умолчанию
+FEATURES = ['param1', 'param2', 'param3', 'temperature', 'humidity']
+FEATURE_DEFAULTS = {'param1': 0, 'param2': 0, 'param3': 0, 'temperature': 20, 'humidity': 60}
+LABELS = ['normal', 'medium', 'high']
+
 class DefectPredictor:
-    def __init__(self):
+    def __init__(self, registry_dir: str = None):
         self.model = None
-        self.scaler = StandardScaler()
+        self.scaler = None
+        # Pickle-файлы прежнего формата: используются только для миграции в реестр
         self.model_path = os.path.join(os.path.dirname(__file__), "defect_model.pkl")
         self.scaler_path = os.path.join(os.path.dirname(__file__), "scaler.pkl")
         
-        # Создаем директорию если не существует
-        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
+        # Инференс идет по скомпилированному лесу текущей версии из реестра
+        self.registry = ModelRegistry(registry_dir or settings.ml_registry_dir)
+        self.forest = None
+        self.version = None
+        self.training_info = {}
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+    
+    @property
+    def ready(self) -> bool:
+        """Модель загружена и готова к предсказаниям"""
+        return self.forest is not None
         
-    def train_from_dataframe(self, df: pd.DataFrame):
+    def train_from_dataframe(self, df: "pd.DataFrame"):
         """Обучить модель на DataFrame"""
+        # Проверяем наличие всех признаков
+        for feature in FEATURES:
+            if feature not in df.columns:
+                df[feature] = 0
+        
+        X = df[FEATURES].fillna(0).values
+        
+        # Целевая переменная (ml_label)
+        label_map = {label: i for i, label in enumerate(LABELS)}
+        if 'ml_label' not in df.columns:
+            raise ValueError("DataFrame должен содержать столбец 'ml_label'")
+        
+        y = df['ml_label'].map(label_map).fillna(0).astype(int).values
         try:
-            # Подготовка признаков
-            features = ['param1', 'param2', 'param3', 'temperature', 'humidity']
-            
-            # Проверяем наличие всех признаков
-            for feature in features:
-                if feature not in df.columns:
-                    df[feature] = 0
-            
-            X = df[features].fillna(0).values
-            
-            # Целевая переменная (ml_label)
-            label_map = {'normal': 0, 'medium': 1, 'high': 2}
-            if 'ml_label' not in df.columns:
-                raise ValueError("DataFrame должен содержать столбец 'ml_label'")
-            
-            y = df['ml_label'].map(label_map).fillna(0).astype(int).values
-            
-            # Масштабирование
-            X_scaled = self.scaler.fit_transform(X)
-            
-            # Обучение модели
-            self.model = RandomForestClassifier(
-                n_estimators=100,
-                max_depth=10,
-                random_state=42,
-                min_samples_split=5,
-                min_samples_leaf=2
-            )
-            self.model.fit(X_scaled, y)
-            
-            # Сохранение модели и скейлера
-            self.save_model()
-            
-            accuracy = self.model.score(X_scaled, y)
-            logger.info(f"Модель обучена. Точность: {accuracy:.3f}, Образцов: {len(df)}")
-            
-            return accuracy
-            
+            return self.train_from_arrays(X, y)
         except Exception as e:
             logger.error(f"Ошибка обучения модели: {e}")
             raise
     
+    def train_from_arrays(self, X: np.ndarray, y: np.ndarray, on_progress=None, n_jobs: int = None):
+        """Обучить модель на матрице признаков (n x 5) и индексах LABELS
+        
+        Лес наращивается порциями по ml_train_step деревьев (warm_start);
+        после каждой порции вызывается on_progress(готово, всего) - он же
+        может прервать обучение исключением.
+        """
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import StandardScaler
+        
+        # Масштабирование
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+        
+        # Обучение модели
+        n_estimators = 100
+        step = max(settings.ml_train_step, 1)
+        model = RandomForestClassifier(
+            n_estimators=step,
+            max_depth=10,
+            random_state=42,
+            min_samples_split=5,
+            min_samples_leaf=2,
+            warm_start=True,
+            n_jobs=settings.ml_train_n_jobs if n_jobs is None else n_jobs
+        )
+        # С warm_start деревья получают те же зерна, что и при обучении за один вызов
+        for fitted in range(step, n_estimators + step, step):
+            model.n_estimators = min(fitted, n_estimators)
+            model.fit(X_scaled, y)
+            if on_progress is not None:
+                on_progress(model.n_estimators, n_estimators)
+        
+        accuracy = model.score(X_scaled, y)
+        # Подменяем модель только после полного обучения
+        self.model, self.scaler = model, scaler
+        self.training_info = {'accuracy': round(float(accuracy), 4), 'training_samples': int(len(X))}
+        
+        # Публикация новой версии в реестре
+        self.save_model()
+        
+        logger.info(f"Модель обучена. Точность: {accuracy:.3f}, Образцов: {len(X)}")
+        
+        return accuracy
+    
+    def _ensure_model(self):
+        if self.forest is None:
+            # Первая загрузка (или обучение по умолчанию) - один раз на процесс
+            with self._load_lock:
+                if self.forest is None:
+                    self.load_model()
+                if self.forest is None:
+                    # Если модель все еще не загружена, создаем по умолчанию
+                    self.create_default_model()
+        else:
+            self.reload_if_changed()
+    
+    def warm_up(self):
+        """Загрузить модель заранее, чтобы первый запрос не ждал"""
+        self._ensure_model()
+    
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """Подхватить новую текущую версию из реестра (не чаще ml_reload_interval)"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < settings.ml_reload_interval:
+            return False
+        self._checked_at = now
+        
+        version = self.registry.current_version()
+        if version is None or version == self.version:
+            return False
+        with self._reload_lock:
+            if version == self.version:
+                return False
+            # mmap: воркеры одного сервера делят страницы модели через кэш ОС
+            forest = self.registry.load(version, mmap=settings.ml_mmap)
+            # Подмена одной ссылкой: текущие запросы дорабатывают на старом лесе
+            self.forest, self.version = forest, version
+        logger.info(f"Загружена версия модели {version}")
+        return True
+    
+    def predict_proba_batch(self, X: np.ndarray) -> np.ndarray:
+        """Вероятности классов для матрицы признаков (n x 5) -> (n x 3) в порядке LABELS
+
+        Считает скомпилированный лес версии из реестра при любом размере батча.
+        Про батчи от ~10 тыс. строк см. CompiledForest.
+        """
+        self._ensure_model()
+        
+        X = np.asarray(X, dtype=float).reshape(-1, len(FEATURES))
+        probabilities = np.zeros((len(X), len(LABELS)))
+        if len(X) == 0:
+            return probabilities
+        
+        # Один проход скомпилированного леса на весь батч
+        forest, version = self.forest, self.version
+        started = time.perf_counter()
+        proba = forest.predict_proba(X)
+        self.registry.record_prediction(version, len(X), time.perf_counter() - started)
+        
+        # Модель могла видеть не все классы - раскладываем по столбцам classes_
+        probabilities[:, forest.classes.astype(int)] = proba
+        return probabilities
+    
+    def predict_batch(self, X: np.ndarray) -> tuple:
+        """Метки и вероятности для матрицы признаков; метка = argmax вероятностей"""
+        probabilities = self.predict_proba_batch(X)
+        labels = np.asarray(LABELS)[probabilities.argmax(axis=1)]
+        return labels, probabilities
+    
+    @staticmethod
+    def features_matrix(items: list) -> np.ndarray:
+        """Собрать матрицу признаков из списка словарей"""
+        return np.array(
+            [[item.get(name, FEATURE_DEFAULTS[name]) for name in FEATURES] for item in items],
+            dtype=float
+        ).reshape(-1, len(FEATURES))
+    
     def predict(self, features: dict) -> dict:
         """Предсказать критичность на основе признаков"""
         try:
-            if self.model is None:
-                self.load_model()
-            
-            if self.model is None:
-                # Если модель все еще не загружена, создаем по умолчанию
-                self.create_default_model()
-            
-            # Подготовка входных данных
-            input_features = np.array([
-                features.get('param1', 0),
-                features.get('param2', 0),
-                features.get('param3', 0),
-                features.get('temperature', 20),
-                features.get('humidity', 60)
-            ]).reshape(1, -1)
-            
-            # Масштабирование
-            input_scaled = self.scaler.transform(input_features)
-            
-            # Предсказание
-            prediction = self.model.predict(input_scaled)[0]
-            probabilities = self.model.predict_proba(input_scaled)[0]
-            
-            # Маппинг обратно в метки
-            label_map_reverse = {0: 'normal', 1: 'medium', 2: 'high'}
+            labels, probabilities = self.predict_batch(self.features_matrix([features]))
             
             return {
-                "prediction": label_map_reverse.get(prediction, 'normal'),
+                "prediction": str(labels[0]),
                 "probabilities": {
-                    "normal": float(probabilities[0]),
-                    "medium": float(probabilities[1]) if len(probabilities) > 1 else 0,
-                    "high": float(probabilities[2]) if len(probabilities) > 2 else 0
+                    label: float(probabilities[0, i]) for i, label in enumerate(LABELS)
                 },
                 "features_used": features
             }
@@ -116,34 +208,60 @@ class DefectPredictor:
             }
     
     def save_model(self):
-        """Сохранить модель и скейлер"""
+        """Опубликовать обученную модель новой версией в реестре"""
+        if self.model is None:
+            logger.info(f"Нет новой обученной модели, текущая версия: {self.version}")
+            return self.version
         try:
-            with open(self.model_path, 'wb') as f:
-                pickle.dump(self.model, f)
-            with open(self.scaler_path, 'wb') as f:
-                pickle.dump(self.scaler, f)
-            logger.info(f"Модель сохранена: {self.model_path}")
+            forest = CompiledForest.from_sklearn(self.model, self.scaler)
+            meta = {
+                'model_type': self.model.__class__.__name__,
+                'features': FEATURES,
+                **self.training_info
+            }
+            version = self.registry.publish(forest, meta)
+            self.forest, self.version = self.registry.load(version, mmap=settings.ml_mmap), version
+            logger.info(f"Модель сохранена: {self.registry.root}/{version}")
+            return version
         except Exception as e:
             logger.error(f"Ошибка сохранения модели: {e}")
     
     def load_model(self):
-        """Загрузить модель и скейлер"""
+        """Загрузить текущую версию из реестра (или перенести туда pickle-модель)"""
         try:
+            if self.reload_if_changed(force=True) or self.forest is not None:
+                return
             if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
                 with open(self.model_path, 'rb') as f:
                     self.model = pickle.load(f)
                 with open(self.scaler_path, 'rb') as f:
                     self.scaler = pickle.load(f)
-                logger.info("Модель успешно загружена")
+                self.training_info = {'migrated_from': os.path.basename(self.model_path)}
+                self.save_model()
+                self.model = None
+                logger.info("Модель перенесена из pickle в реестр")
             else:
-                logger.warning("Файлы модели не найдены. Создадим новую модель.")
+                logger.warning("Модель в реестре не найдена. Создадим новую модель.")
                 self.create_default_model()
         except Exception as e:
             logger.error(f"Ошибка загрузки модели: {e}")
             self.create_default_model()
     
+    def model_info(self) -> dict:
+        """Версия, метаданные и статистика задержек текущей модели"""
+        self._ensure_model()
+        return {
+            'version': self.version,
+            **self.forest.meta,
+            'runtime': dict(self.registry.stats.get(self.version, {}))
+        }
+    
     def create_default_model(self):
         """Создать модель по умолчанию на синтетических данных"""
+        import pandas as pd
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import StandardScaler
+        
         try:
             logger.info("Создание модели по умолчанию на синтетических данных...")
             
@@ -193,5 +311,6 @@ class DefectPredictor:
             )
             X = np.array([[0, 0, 0, 20, 60]])
             y = np.array([0])
-            self.model.fit(X, y)
+            self.scaler = StandardScaler()
+            self.model.fit(self.scaler.fit_transform(X), y)
             self.save_model()
\ No newline at end of file
@@ -0,0 +1,370 @@
+# backend/app/ml/registry.py
+"""Реестр версий модели и компактное представление случайного леса
+
+Каждая версия - каталог vNNNN с массивами .npy и meta.json. Версия сначала
+пишется во временный каталог и переименовывается целиком, затем атомарно
+(os.replace) обновляется указатель CURRENT. Воркеры периодически читают
+CURRENT и подменяют модель без перезапуска, полузаписанный файл им не виден.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+ARRAYS = ["feature", "threshold", "children", "value", "roots", "mean", "scale", "classes"]
+
+# Строк за один проход обхода деревьев: рабочие массивы (строки x деревья) держатся в кэше
+PREDICT_BATCH_ROWS = 1024
+# Предел объема таблиц масок листьев; для более крупных лесов - пошаговый спуск
+LEAF_TABLES_BUDGET = 32 * 1024 * 1024
+ALL_LEAVES = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+class CompiledForest:
+    """Случайный лес, развернутый в плоские массивы узлов
+
+    Все деревья лежат в общих массивах, обход идет векторно сразу по всем
+    строкам и деревьям; масштабирование StandardScaler встроено.
+    children[i] = (левый, правый) потомок узла i, лист ссылается сам на себя.
+
+    Рассчитан на онлайн-запросы: одна строка и сотни строк в десятки раз
+    быстрее sklearn. От ~10 тыс. строк numpy-обход не быстрее обхода sklearn на
+    Cython, а на 100 тыс. строк бывает до 1.5 раза медленнее. Эстиматоры
+    sklearn в реестре не хранятся, поэтому большие пакеты тоже идут здесь.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.meta = meta or {}
+        self.max_depth = int(self.meta.get("max_depth") or self._depth())
+        # Строятся при первом предсказании (у отображенных в память массивов - в каждом процессе)
+        self._leaf_tables = None
+        self._words = 1
+        self._leaf_node = None
+
+    @classmethod
+    def from_sklearn(cls, model, scaler) -> "CompiledForest":
+        feature, threshold, children, value, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        n_classes = len(model.classes_)
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            roots.append(offset)
+            is_leaf = tree.children_left < 0
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            # Лист ссылается сам на себя - обход можно делать фиксированное число шагов
+            own = np.arange(tree.node_count) + offset
+            children.append(np.column_stack([
+                np.where(is_leaf, own, tree.children_left + offset),
+                np.where(is_leaf, own, tree.children_right + offset)
+            ]))
+            counts = tree.value.reshape(tree.node_count, -1)[:, :n_classes]
+            totals = counts.sum(axis=1, keepdims=True)
+            value.append(counts / np.where(totals > 0, totals, 1))
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        arrays = {
+            "feature": np.concatenate(feature).astype(np.intp),
+            "threshold": np.concatenate(threshold).astype(np.float64),
+            "children": np.concatenate(children).astype(np.intp),
+            "value": np.concatenate(value).astype(np.float64),
+            "roots": np.asarray(roots, dtype=np.intp),
+            "mean": np.asarray(scaler.mean_, dtype=np.float64),
+            "scale": np.asarray(scaler.scale_, dtype=np.float64),
+            "classes": np.asarray(model.classes_).astype(np.int64),
+        }
+        return cls(arrays, {"max_depth": int(max_depth), "n_trees": len(roots), "n_nodes": int(offset)})
+
+    def _depth(self) -> int:
+        # Для артефактов без max_depth: спускаемся, пока хоть один узел двигается
+        node = self.roots.copy()
+        depth = 0
+        while True:
+            nxt = self.children[node, 0]
+            if np.array_equal(nxt, node):
+                return depth
+            node = nxt
+            depth += 1
+
+    def _build_leaf_tables(self) -> Optional[List[Tuple[np.ndarray, np.ndarray]]]:
+        """Таблицы поиска листа битовыми масками (как в QuickScorer); None - не помещаются в бюджет
+
+        Листья дерева нумеруются слева направо. Выполненное условие узла
+        (x > порог, переход вправо) исключает листья его левого поддерева;
+        строка попадает в самый левый неисключенный лист. Узлы признака
+        отсортированы по порогу, выполненные условия - префикс, поэтому маска
+        строки - AND заранее накопленных масок префиксов по признакам, без
+        пошагового спуска.
+        """
+        children = np.asarray(self.children)
+        roots = np.asarray(self.roots, dtype=np.intp)
+        n_nodes, n_trees = len(children), len(roots)
+        internal = children[:, 0] != np.arange(n_nodes)
+
+        # Уровни узлов сверху вниз и дерево каждого узла
+        tree = np.zeros(n_nodes, dtype=np.intp)
+        tree[roots] = np.arange(n_trees)
+        levels = [roots]
+        while True:
+            parents = levels[-1][internal[levels[-1]]]
+            if not len(parents):
+                break
+            for side in (0, 1):
+                tree[children[parents, side]] = tree[parents]
+            levels.append(children[parents].ravel())
+        # Число листьев поддерева (снизу вверх) и номер его первого листа (сверху вниз)
+        count = np.ones(n_nodes, dtype=np.intp)
+        for level in reversed(levels):
+            parents = level[internal[level]]
+            count[parents] = count[children[parents, 0]] + count[children[parents, 1]]
+        words = (int(count[roots].max()) + 63) // 64
+        nodes = np.flatnonzero(internal)
+        # Префиксы всех признаков: (узлы + признаки) x деревья x слова
+        if (len(nodes) + len(self.mean)) * n_trees * words * 8 > LEAF_TABLES_BUDGET:
+            return None
+        first = np.zeros(n_nodes, dtype=np.intp)
+        for level in levels:
+            parents = level[internal[level]]
+            first[children[parents, 0]] = first[parents]
+            first[children[parents, 1]] = first[parents] + count[children[parents, 0]]
+
+        self._words = words
+        leaves = np.flatnonzero(~internal)
+        self._leaf_node = np.zeros(n_trees * words * 64, dtype=np.intp)
+        self._leaf_node[tree[leaves] * words * 64 + first[leaves]] = leaves
+
+        # Маска узла: все листья, кроме левого поддерева [lo, hi)
+        lo = first[children[nodes, 0]]
+        hi = lo + count[children[nodes, 0]]
+        masks = np.empty((len(nodes), words), dtype=np.uint64)
+        for word in range(words):
+            start = np.clip(lo - 64 * word, 0, 64)
+            length = np.clip(hi - 64 * word, 0, 64) - start
+            # Сдвиг на 64 в numpy не определен: полное слово задается отдельно
+            bits = (np.uint64(1) << np.minimum(length, 63).astype(np.uint64)) - np.uint64(1)
+            bits <<= np.minimum(start, 63).astype(np.uint64)
+            masks[:, word] = ~np.where(length >= 64, ALL_LEAVES, bits)
+
+        tables = []
+        for feature in range(len(self.mean)):
+            selected = np.flatnonzero(self.feature[nodes] == feature)
+            selected = selected[np.argsort(self.threshold[nodes[selected]], kind="stable")]
+            steps = np.full((len(selected) + 1, n_trees, words), ALL_LEAVES, dtype=np.uint64)
+            steps[np.arange(1, len(selected) + 1), tree[nodes[selected]]] = masks[selected]
+            np.bitwise_and.accumulate(steps, axis=0, out=steps)
+            tables.append((np.asarray(self.threshold[nodes[selected]], dtype=np.float64), steps))
+        return tables
+
+    def _exit_leaves(self, scaled: np.ndarray) -> np.ndarray:
+        """Листья (строки x деревья) по таблицам масок"""
+        words = self._words
+        # NaN > порог ложно - при спуске такая строка идет влево
+        scaled = np.where(np.isnan(scaled), -np.inf, scaled)
+        mask = np.full((len(scaled), len(self.roots), words), ALL_LEAVES, dtype=np.uint64)
+        for feature, (thresholds, steps) in enumerate(self._leaf_tables):
+            if len(thresholds):
+                mask &= steps[np.searchsorted(thresholds, scaled[:, feature])]
+        # Самый левый лист - младший установленный бит первого ненулевого слова
+        word = (mask != 0).argmax(axis=2) if words > 1 else np.zeros(mask.shape[:2], dtype=np.intp)
+        bits = np.take_along_axis(mask, word[..., None], axis=2)[..., 0]
+        lowest = bits & (~bits + np.uint64(1))
+        number = np.log2(lowest.astype(np.float64)).astype(np.intp) + word * 64
+        return self._leaf_node[number + np.arange(len(self.roots), dtype=np.intp) * words * 64]
+
+    def _descend(self, scaled: np.ndarray) -> np.ndarray:
+        """Листья (строки x деревья) пошаговым спуском по всем деревьям сразу"""
+        n_trees = len(self.roots)
+        size = len(scaled) * n_trees
+        children = self.children.reshape(-1)
+        values = scaled.ravel()
+        offsets = np.repeat(np.arange(len(scaled), dtype=np.intp) * len(self.mean), n_trees)
+        node = np.tile(self.roots, len(scaled))
+        index, x, thresholds = np.empty(size, np.intp), np.empty(size), np.empty(size)
+        go_right = np.empty(size, dtype=bool)
+        # Один шаг спуска для всех пар (строка, дерево); take с out без лишних копий
+        for _ in range(self.max_depth):
+            np.take(self.feature, node, out=index)
+            index += offsets
+            np.take(values, index, out=x)
+            np.take(self.threshold, node, out=thresholds)
+            np.greater(x, thresholds, out=go_right)
+            node *= 2
+            node += go_right
+            np.take(children, node, out=node)
+        return node.reshape(len(scaled), n_trees)
+
+    def predict_proba(self, X: np.ndarray, use_masks: Optional[bool] = None) -> np.ndarray:
+        """Средние вероятности по деревьям, столбцы в порядке classes
+
+        use_masks=None - таблицы масок, если они помещаются в LEAF_TABLES_BUDGET
+        (неглубокие деревья), иначе спуск; результаты одинаковы.
+        """
+        if use_masks is None or use_masks:
+            if self._leaf_tables is None:
+                self._leaf_tables = self._build_leaf_tables() or ()
+            use_masks = bool(self._leaf_tables)
+        X = np.asarray(X, dtype=np.float64)
+        out = np.empty((len(X), len(self.classes)))
+        for start in range(0, len(X), PREDICT_BATCH_ROWS):
+            batch = X[start:start + PREDICT_BATCH_ROWS]
+            # Как в sklearn: признаки сравниваются с порогами после приведения к float32
+            scaled = ((batch - self.mean) / self.scale).astype(np.float32).astype(np.float64)
+            node = self._exit_leaves(scaled) if use_masks else self._descend(scaled)
+            out[start:start + len(batch)] = np.take(self.value, node, axis=0).mean(axis=1)
+        return out
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory: str, meta: Optional[Dict[str, Any]] = None, mmap: bool = False) -> "CompiledForest":
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode) for name in ARRAYS}
+        return cls(arrays, meta)
+
+
+class ModelRegistry:
+    """Версионированное хранилище моделей с атомарной сменой текущей версии"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        # Статистика этого процесса по версиям: время загрузки и задержки предсказаний
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def _path(self, *parts) -> str:
+        return os.path.join(self.root, *parts)
+
+    def versions(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if name.startswith("v") and name[1:].isdigit() and os.path.isdir(self._path(name))
+        )
+
+    def current_version(self) -> Optional[str]:
+        try:
+            with open(self._path(CURRENT_FILE), encoding="utf-8") as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        if version not in self.versions():
+            # Испорченный указатель не должен ломать загрузку во всех воркерах
+            if version:
+                logger.warning(f"CURRENT указывает на неизвестную версию модели {version!r}")
+            return None
+        return version
+
+    def read_meta(self, version: str) -> Dict[str, Any]:
+        with open(self._path(version, "meta.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def publish(self, forest: CompiledForest, meta: Optional[Dict[str, Any]] = None, activate: bool = True) -> str:
+        """Записать новую версию и (по умолчанию) сделать ее текущей"""
+        os.makedirs(self.root, exist_ok=True)
+        staging = self._path(f".tmp-{uuid.uuid4().hex}")
+        forest.save(staging)
+        meta = {**forest.meta, **(meta or {}), "created_at": datetime.now().isoformat()}
+        meta["benchmark"] = self._benchmark(staging, meta)
+
+        # Номер версии занимается атомарным переименованием каталога
+        while True:
+            existing = self.versions()
+            number = int(existing[-1][1:]) + 1 if existing else 1
+            version = f"v{number:04d}"
+            meta["version"] = version
+            with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+            try:
+                os.rename(staging, self._path(version))
+                break
+            except OSError:
+                if not os.path.exists(self._path(version)):
+                    shutil.rmtree(staging, ignore_errors=True)
+                    raise
+
+        if activate:
+            self.activate(version)
+        logger.info(f"Опубликована версия модели {version}")
+        return version
+
+    def activate(self, version: str):
+        """Атомарно переключить CURRENT на версию"""
+        # Только опубликованные версии: не "..", "." и не временные каталоги .tmp-*
+        if version not in self.versions():
+            raise ValueError(f"Версия модели {version} не найдена")
+        pointer = self._path(f".{CURRENT_FILE}-{uuid.uuid4().hex}")
+        with open(pointer, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(pointer, self._path(CURRENT_FILE))
+
+    def load(self, version: str, mmap: bool = False) -> CompiledForest:
+        started = time.perf_counter()
+        forest = CompiledForest.load(self._path(version), self.read_meta(version), mmap=mmap)
+        self._stats(version)["load_seconds"] = time.perf_counter() - started
+        return forest
+
+    def _stats(self, version: str) -> Dict[str, float]:
+        with self._lock:
+            return self.stats.setdefault(
+                version, {"load_seconds": 0.0, "calls": 0, "rows": 0, "predict_seconds": 0.0}
+            )
+
+    def record_prediction(self, version: str, rows: int, seconds: float):
+        stats = self._stats(version)
+        with self._lock:
+            stats["calls"] += 1
+            stats["rows"] += rows
+            stats["predict_seconds"] += seconds
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Версии с метаданными и статистикой задержек этого процесса"""
+        current = self.current_version()
+        described = []
+        for version in self.versions():
+            meta = self.read_meta(version)
+            stats = dict(self.stats.get(version, {}))
+            if stats.get("calls"):
+                stats["mean_call_ms"] = stats["predict_seconds"] / stats["calls"] * 1000
+                stats["mean_row_us"] = stats["predict_seconds"] / stats["rows"] * 1e6
+            described.append({**meta, "current": version == current, "runtime": stats})
+        return described
+
+    @staticmethod
+    def _benchmark(directory: str, meta: Dict[str, Any]) -> Dict[str, float]:
+        """Замер загрузки и задержки предсказания при публикации версии"""
+        started = time.perf_counter()
+        forest = CompiledForest.load(directory, meta)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        X = np.random.default_rng(0).uniform(0, 30, (1000, len(forest.mean)))
+        forest.predict_proba(X[:1])
+        started = time.perf_counter()
+        for _ in range(20):
+            forest.predict_proba(X[:1])
+        single_ms = (time.perf_counter() - started) / 20 * 1000
+        started = time.perf_counter()
+        forest.predict_proba(X)
+        batch_us = (time.perf_counter() - started) / len(X) * 1e6
+        return {
+            "load_ms": round(load_ms, 3),
+            "single_prediction_ms": round(single_ms, 3),
+            "batch_row_us": round(batch_us, 3),
+        }
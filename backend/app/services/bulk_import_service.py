@@ -0,0 +1,229 @@
+# backend/app/services/bulk_import_service.py
+"""Пакетная загрузка многих CSV: параллельный разбор, один писатель
+
+Файлы разбираются в пуле процессов (import_service.parse_csv_file), а
+записывает их один поток в порядке очереди: объекты раньше диагностик,
+каждый файл - отдельная транзакция. Ошибка файла откатывает только его,
+некорректные строки отбрасываются и попадают в отчет с номером строки.
+Разбор опережает запись не более чем на два файла на процесс. Разобранные
+чанки процесс разбора пишет на диск, а писатель читает их по одному, поэтому
+память не зависит от размера файлов.
+"""
+import functools
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.services import import_service, scoring_service
+from app.services.job_service import Job
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+PARSING = "parsing"
+WRITING = "writing"
+DONE = "done"
+FAILED = "failed"
+
+# Порядок записи: диагностики ссылаются на объекты
+KIND_ORDER = {"objects": 0, "diagnostics": 1}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def worker_count() -> int:
+    return settings.ingest_workers or os.cpu_count() or 1
+
+
+def parse_pool() -> ProcessPoolExecutor:
+    """Общий пул процессов разбора; создается при первой пакетной загрузке"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: fork процесса с потоками сервера и открытыми соединениями небезопасен
+            _pool = ProcessPoolExecutor(max_workers=worker_count(), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def save_uploads(files: List[Tuple[str, BinaryIO]]) -> Tuple[str, List[Tuple[str, str]]]:
+    """Сохранить загруженные файлы во временный каталог: процессы разбора читают их с диска"""
+    os.makedirs(settings.upload_dir, exist_ok=True)
+    workdir = tempfile.mkdtemp(prefix="bulk_", dir=settings.upload_dir)
+    paths = []
+    for i, (filename, source) in enumerate(files):
+        path = os.path.join(workdir, f"{i:04d}.csv")
+        with open(path, "wb") as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        paths.append((filename, path))
+    return workdir, paths
+
+
+def _header_kind(path: str) -> Optional[str]:
+    with open(path, encoding="utf-8", errors="replace") as source:
+        header = source.readline().strip().split(",")
+    return import_service.detect_kind([name.strip().strip('"') for name in header])
+
+
+def _file_report(filename: str, path: str) -> Dict[str, Any]:
+    return {
+        "filename": filename,
+        "status": QUEUED,
+        "success": None,
+        "kind": None,
+        "bytes": os.path.getsize(path),
+        "rows_total": None,
+        "rows_written": 0,
+        "rows_rejected": 0,
+        "errors": [],
+        "message": None,
+        "error": None,
+        "flags": None,
+        "parse_seconds": None,
+        "write_seconds": None,
+    }
+
+
+def _remove_parsed(parsed: Dict[str, Any]):
+    if os.path.exists(parsed["chunks_path"]):
+        os.remove(parsed["chunks_path"])
+
+
+def _write_file(report: Dict[str, Any], parsed: Dict[str, Any], on_chunk):
+    """Записать разобранный файл одной транзакцией"""
+    if parsed["kind"] is None:
+        _remove_parsed(parsed)
+        raise ValueError("Не удалось определить тип файла по заголовку")
+    report.update(
+        status=WRITING, kind=parsed["kind"], rows_total=parsed["rows"],
+        rows_rejected=parsed["rows_rejected"], errors=parsed["errors"], parse_seconds=parsed["parse_seconds"]
+    )
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        for columns in import_service.read_parsed_chunks(parsed["chunks_path"]):
+            scores = import_service.start_scoring(db, parsed["kind"], columns)
+            counts = import_service.write_chunk(db, parsed["kind"], columns, scores)
+            report["flags"] = scoring_service.add_counts(report["flags"], counts)
+            report["rows_written"] += len(columns["object_id"])
+            on_chunk()
+        db.commit()
+    except Exception:
+        db.rollback()
+        report["rows_written"] = 0
+        report["flags"] = None
+        raise
+    finally:
+        db.close()
+        _remove_parsed(parsed)
+    report["write_seconds"] = round(time.perf_counter() - started, 3)
+
+
+def ingest_files(paths: List[Tuple[str, str]], job: Optional[Job] = None, workers: Optional[int] = None,
+                 chunk_size: int = import_service.CHUNK_SIZE) -> Dict[str, Any]:
+    """Загрузить файлы [(имя, путь)]; отчет по файлам и суммарная скорость
+
+    Если передан job, отчет доступен в job.result уже во время загрузки.
+    workers=1 - разбор в текущем потоке, без пула процессов.
+    """
+    started = time.perf_counter()
+    workers = workers or worker_count()
+    reports = [_file_report(filename, path) for filename, path in paths]
+    summary = {"files": len(paths), "succeeded": 0, "failed": 0, "workers": workers}
+    result = {"results": reports, "summary": summary}
+    if job is not None:
+        job.result = result
+
+    order = sorted(range(len(paths)), key=lambda i: (KIND_ORDER.get(_header_kind(paths[i][1]), 0), i))
+    pending = deque(order)
+    in_flight: "deque[Tuple[int, Future]]" = deque()
+    pool = parse_pool() if workers > 1 and len(paths) > 1 else None
+
+    def submit():
+        while pending and (pool is None and not in_flight or pool is not None and len(in_flight) < workers * 2):
+            i = pending.popleft()
+            reports[i]["status"] = PARSING
+            if pool is None:
+                future = Future()
+                future.set_running_or_notify_cancel()
+                try:
+                    future.set_result(import_service.parse_csv_file(paths[i][1], chunk_size))
+                except Exception as e:
+                    future.set_exception(e)
+            else:
+                future = pool.submit(import_service.parse_csv_file, paths[i][1], chunk_size)
+            in_flight.append((i, future))
+
+    def progress():
+        if job is not None:
+            partial = sum(
+                report["rows_written"] / report["rows_total"]
+                for report in reports if report["status"] == WRITING and report["rows_total"]
+            )
+            job.update(progress=(summary["succeeded"] + summary["failed"] + partial) / max(len(paths), 1))
+
+    try:
+        submit()
+        while in_flight:
+            i, future = in_flight.popleft()
+            report = reports[i]
+            try:
+                _write_file(report, future.result(), progress)
+                report.update(status=DONE, success=True, message="Данные успешно загружены")
+                summary["succeeded"] += 1
+            except Exception as e:
+                if job is not None and job.cancel_requested:
+                    raise
+                logger.warning(f"Файл {report['filename']} не загружен: {e}")
+                report.update(status=FAILED, success=False, error=str(e))
+                summary["failed"] += 1
+            submit()
+            progress()
+    finally:
+        for _, future in in_flight:
+            # Уже разобранные, но не записанные файлы (отмена) не оставляют чанков на диске
+            if not future.cancel() and future.done() and future.exception() is None:
+                _remove_parsed(future.result())
+
+    elapsed = time.perf_counter() - started
+    rows = sum(report["rows_written"] for report in reports)
+    size = sum(report["bytes"] for report in reports)
+    summary.update(
+        rows_written=rows,
+        rows_rejected=sum(report["rows_rejected"] for report in reports),
+        flags=functools.reduce(scoring_service.add_counts, (report["flags"] for report in reports), None),
+        bytes=size,
+        elapsed_seconds=round(elapsed, 3),
+        rows_per_second=round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+        mb_per_second=round(size / 1024 / 1024 / elapsed, 2) if elapsed > 0 else 0.0
+    )
+    logger.info(
+        f"Пакетная загрузка: {summary['succeeded']}/{len(paths)} файлов, {rows} строк "
+        f"за {elapsed:.2f} с ({summary['rows_per_second']:.0f} строк/с)"
+    )
+    return result
+
+
+def run_job(job: Job, paths: List[Tuple[str, str]], workdir: str) -> Dict[str, Any]:
+    """Фоновая пакетная загрузка; временный каталог удаляется по завершении"""
+    try:
+        return ingest_files(paths, job=job)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
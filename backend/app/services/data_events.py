@@ -0,0 +1,222 @@
+# backend/app/services/data_events.py
+"""Шина событий об изменении данных, срабатывает после коммита
+
+Запись через ORM отмечается автоматически (after_flush), пакетная запись в
+обход ORM отмечается явно через mark_changed(db, "diagnostics"). После
+успешного коммита каждая затронутая таблица публикуется подписчикам, а общий
+номер версии данных увеличивается - по нему кэши понимают, что устарели.
+
+Подписчики subscribe_objects дополнительно получают идентификаторы объектов,
+чьи строки или диагностики изменились (None - набор неизвестен).
+
+При нескольких воркерах (share) события дописываются в общий файл-журнал, а
+каждый процесс вычитывает из него чужие события и публикует их у себя: при
+чтении версии данных и фоновым опросом раз в events_poll_interval.
+"""
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+OBJECTS = "objects"
+DIAGNOSTICS = "diagnostics"
+PIPELINES = "pipelines"
+# Пересборка счетчиков дашборда (summary_service.rebuild) в обход инкрементальных обновлений
+SUMMARY = "summary_counters"
+
+# Служебные таблицы: их изменения не затрагивают данные и не сбрасывают кэши
+UNTRACKED_TABLES = {"uploads"}
+
+_subscribers: Dict[str, List[Callable[[str], None]]] = defaultdict(list)
+_object_subscribers: List[Callable[[Optional[Set[int]]], None]] = []
+_lock = threading.Lock()
+_version = 0
+
+# Больше идентификаторов в журнал не пишется: другие процессы получат None
+MAX_SHARED_OBJECT_IDS = 10_000
+
+
+class SharedLog:
+    """Журнал событий в общем файле: строка JSON на коммит, дописывание через O_APPEND"""
+
+    def __init__(self, path: str, pid: Optional[int] = None):
+        self.path = path
+        self.pid = pid if pid is not None else os.getpid()
+        self._fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        # События до подключения уже учтены: состояние процесса строится с нуля
+        self._offset = os.fstat(self._fd).st_size
+        self._lock = threading.Lock()
+
+    def append(self, topics: Iterable[str], object_ids: Optional[Set[int]]):
+        if object_ids is not None and len(object_ids) > MAX_SHARED_OBJECT_IDS:
+            object_ids = None
+        record = {"pid": self.pid, "topics": list(topics), "objects": None if object_ids is None else sorted(object_ids)}
+        # Одна запись одним write: строки разных процессов не перемешиваются
+        os.write(self._fd, json.dumps(record).encode() + b"\n")
+
+    def read_new(self) -> List[Dict[str, Any]]:
+        """Чужие события, дописанные с прошлого чтения"""
+        with self._lock:
+            size = os.fstat(self._fd).st_size
+            if size <= self._offset:
+                return []
+            data = os.pread(self._fd, size - self._offset, self._offset)
+            # Незаконченная строка дочитается в следующий раз
+            complete = data.rfind(b"\n") + 1
+            self._offset += complete
+        records = [json.loads(line) for line in data[:complete].splitlines() if line]
+        return [record for record in records if record["pid"] != self.pid]
+
+    def close(self):
+        os.close(self._fd)
+
+
+_shared: Optional[SharedLog] = None
+_stop_watch = threading.Event()
+
+
+def data_version() -> int:
+    """Номер версии данных: растет при каждом опубликованном изменении"""
+    if _shared is not None:
+        sync()
+    return _version
+
+
+def subscribe(topic: str, callback: Callable[[str], None]):
+    """callback(topic) вызывается после коммита, изменившего таблицу topic"""
+    _subscribers[topic].append(callback)
+
+
+def subscribe_objects(callback: Callable[[Optional[Set[int]]], None]):
+    """callback(object_ids) после коммита, изменившего объекты или диагностики"""
+    _object_subscribers.append(callback)
+
+
+def _call(callback, argument, topic: str):
+    try:
+        callback(argument)
+    except Exception:
+        logger.exception(f"Ошибка обработчика события {topic}")
+
+
+def publish(*topics: str, object_ids: Optional[Set[int]] = None):
+    _deliver(topics, object_ids)
+    shared = _shared
+    if shared is not None:
+        try:
+            shared.append(topics, object_ids)
+        except OSError:
+            logger.exception("Ошибка записи в общий журнал событий")
+
+
+def _deliver(topics, object_ids: Optional[Set[int]]):
+    global _version
+    # Сначала подписчики помечают кэши устаревшими, затем растет версия:
+    # кто увидел новую версию, уже не получит старые данные
+    for topic in topics:
+        for callback in list(_subscribers.get(topic, ())):
+            _call(callback, topic, topic)
+    if OBJECTS in topics or DIAGNOSTICS in topics:
+        for callback in list(_object_subscribers):
+            _call(callback, object_ids, OBJECTS)
+    with _lock:
+        _version += 1
+
+
+def sync() -> int:
+    """Опубликовать в этом процессе события других воркеров; вернуть их число"""
+    shared = _shared
+    if shared is None:
+        return 0
+    records = shared.read_new()
+    for record in records:
+        objects = record["objects"]
+        _deliver(record["topics"], None if objects is None else set(objects))
+    return len(records)
+
+
+def _watch(interval: float):
+    # Кэши без чтения версии данных (рейтинг риска) узнают об изменениях отсюда
+    while not _stop_watch.wait(interval):
+        try:
+            sync()
+        except Exception:
+            logger.exception("Ошибка чтения общего журнала событий")
+
+
+def share(path: str, poll_interval: float = 0.05):
+    """Обмениваться событиями с другими процессами через файл path"""
+    global _shared
+    if _shared is not None:
+        return
+    _shared = SharedLog(path)
+    _stop_watch.clear()
+    threading.Thread(target=_watch, args=(poll_interval,), name="data-events-watch", daemon=True).start()
+    logger.info(f"Общий журнал событий данных: {path}")
+
+
+def unshare():
+    global _shared
+    shared, _shared = _shared, None
+    _stop_watch.set()
+    if shared is not None:
+        shared.close()
+
+
+def mark_changed(db: Session, *topics: str, object_ids: Optional[Iterable[int]] = None):
+    """Отметить таблицы, измененные в обход ORM; событие уйдет после коммита
+
+    object_ids - затронутые объекты; без них подписчики объектов получат None.
+    """
+    db.info.setdefault("changed_tables", set()).update(topics)
+    if object_ids is not None:
+        db.info.setdefault("changed_objects", set()).update(object_ids)
+    elif OBJECTS in topics or DIAGNOSTICS in topics:
+        db.info["changed_objects_unknown"] = True
+
+
+def _object_ids(instance) -> Set[int]:
+    """object_id строки, включая прежнее значение, если его изменили"""
+    history = inspect(instance).attrs.object_id.history
+    return {value for value in (*history.added, *history.unchanged, *history.deleted) if value is not None}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session, flush_context):
+    tables = set()
+    object_ids = set()
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if not hasattr(instance, "__table__") or instance.__table__.name in UNTRACKED_TABLES:
+            continue
+        tables.add(instance.__table__.name)
+        if hasattr(instance, "object_id"):
+            object_ids |= _object_ids(instance)
+    if tables:
+        mark_changed(session, *tables, object_ids=object_ids)
+
+
+def _pop_changes(session):
+    return (
+        session.info.pop("changed_tables", None),
+        session.info.pop("changed_objects", set()),
+        session.info.pop("changed_objects_unknown", False)
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    tables, object_ids, unknown = _pop_changes(session)
+    if tables:
+        publish(*sorted(tables), object_ids=None if unknown else object_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    _pop_changes(session)
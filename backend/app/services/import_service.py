@@ -0,0 +1,376 @@
+# backend/app/services/import_service.py
+"""Потоковая загрузка CSV: чтение чанками, векторный маппинг, пакетный upsert
+
+Разбор (parse_chunks) не обращается к БД и может выполняться в другом
+процессе; запись чанка - write_chunk. Строки с некорректными обязательными
+полями отбрасываются с указанием строки файла и столбца.
+"""
+import logging
+import os
+import pickle
+import time
+from concurrent.futures import Future
+from datetime import date
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import dialects
+from app.db.models import Object, Diagnostic, DiagnosticFlag, ObjectType, MethodType, QualityGrade, MLLabel
+from app.services import data_events, scoring_service, summary_service, timeseries_service
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Размер чанка CSV: ограничивает память независимо от размера файла
+CHUNK_SIZE = 50_000
+
+# Разобранные чанки файла (parse_csv_file) - рядом с ним, с этим суффиксом
+PARSED_SUFFIX = ".chunks"
+
+OBJECT_TYPE_MAP = {
+    "crane": ObjectType.CRANE,
+    "compressor": ObjectType.COMPRESSOR,
+    "pipeline_section": ObjectType.PIPELINE_SECTION
+}
+
+METHOD_MAP = {method.value: method for method in MethodType}
+
+QUALITY_GRADE_MAP = {
+    "удовлетворительно": QualityGrade.SATISFACTORY,
+    "допустимо": QualityGrade.ACCEPTABLE,
+    "требует_мер": QualityGrade.REQUIRES_ACTION,
+    "недопустимо": QualityGrade.UNACCEPTABLE
+}
+
+ML_LABEL_MAP = {
+    "normal": MLLabel.NORMAL,
+    "medium": MLLabel.MEDIUM,
+    "high": MLLabel.HIGH
+}
+
+TRUE_VALUES = {"true", "1", "1.0", "yes", "да"}
+
+# Обязательные поля и их тип; строка, где они пусты или не разбираются, отбрасывается
+REQUIRED_COLUMNS = {
+    "objects": {
+        "object_id": "int", "object_name": "str", "pipeline_id": "str", "lat": "float", "lon": "float", "year": "int",
+        "material": "str",
+    },
+    "diagnostics": {"diag_id": "int", "object_id": "int"},
+}
+# Сколько ошибок строк возвращать в отчете по файлу (считаются все)
+MAX_ROW_ERRORS = 100
+# Ключей в одном DELETE ... IN при снятии прежних отметок
+FLAG_DELETE_BATCH = 5000
+
+OBJECT_COLUMNS = ["object_id", "object_name", "object_type", "pipeline_id", "lat", "lon", "year", "material"]
+DIAGNOSTIC_COLUMNS = [
+    "diag_id", "object_id", "method", "date", "temperature", "humidity", "illumination",
+    "defect_found", "defect_description", "quality_grade", "param1", "param2", "param3", "ml_label"
+]
+
+
+class RowError(ValueError):
+    """Некорректные строки CSV; errors - их расположение в файле"""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        self.errors = errors
+        first = errors[0]
+        super().__init__(
+            f"Строка {first['line']}, столбец {first['column']}: {first['error']} ({first['value']!r})"
+            + (f" и еще ошибок: {len(errors) - 1}" if len(errors) > 1 else "")
+        )
+
+
+def detect_kind(columns) -> Optional[str]:
+    """Определить тип файла по заголовку"""
+    if "object_id" in columns and "object_name" in columns:
+        return "objects"
+    if "diag_id" in columns and "object_id" in columns:
+        return "diagnostics"
+    return None
+
+
+def _map_enum(series: "pd.Series", mapping: Dict[str, Any], default, lower: bool = False) -> "pd.Series":
+    """Векторно сопоставить строки с именами enum (в таком виде они хранятся в БД)"""
+    values = series.astype(str).str.strip()
+    if lower:
+        values = values.str.lower()
+    mapped = values.map({key: member.name for key, member in mapping.items()})
+    return mapped.where(mapped.notna(), default.name)
+
+
+def _column(df: "pd.DataFrame", name: str, default=None) -> "pd.Series":
+    import pandas as pd
+
+    if name in df.columns:
+        return df[name]
+    return pd.Series(default, index=df.index)
+
+
+def _to_bool(series: "pd.Series") -> "pd.Series":
+    if series.dtype == bool:
+        return series
+    return series.astype(str).str.strip().str.lower().isin(TRUE_VALUES)
+
+
+def _to_list(series: "pd.Series") -> List[Any]:
+    """Series -> список Python-значений, NaN заменяются на None"""
+    if series.hasnans:
+        return series.astype(object).where(series.notna(), None).tolist()
+    return series.tolist()
+
+
+def validate_chunk(kind: str, df: "pd.DataFrame") -> "Tuple[pd.DataFrame, List[Dict[str, Any]]]":
+    """Отбросить строки с некорректными обязательными полями
+
+    Возвращает чистый чанк (числовые поля уже приведены) и ошибки с номером
+    строки файла: индекс чанка продолжается между чанками, +2 - заголовок и счет с 1.
+    """
+    import pandas as pd
+
+    missing = [name for name in REQUIRED_COLUMNS[kind] if name not in df.columns]
+    if missing:
+        raise ValueError(f"В файле нет обязательных столбцов: {', '.join(missing)}")
+
+    bad = pd.Series(False, index=df.index)
+    errors = []
+    converted = {}
+    for name, kind_of_value in REQUIRED_COLUMNS[kind].items():
+        values = df[name]
+        if kind_of_value == "str":
+            invalid = values.isna() | (values.astype(str).str.strip() == "")
+            message = "пустое значение"
+        else:
+            numbers = pd.to_numeric(values, errors="coerce")
+            invalid = numbers.isna()
+            message = "не число"
+            if kind_of_value == "int":
+                invalid |= numbers.notna() & (numbers % 1 != 0)
+                message = "не целое число"
+            converted[name] = numbers
+        # Для каждой строки сообщаем первую найденную ошибку
+        for index in df.index[invalid & ~bad]:
+            value = values[index]
+            errors.append({
+                "line": int(index) + 2,
+                "column": name,
+                "value": None if pd.isna(value) else str(value),
+                "error": "пустое значение" if pd.isna(value) else message
+            })
+        bad |= invalid
+
+    if errors:
+        df = df[~bad]
+    return df.assign(**{name: numbers[~bad] for name, numbers in converted.items()}), errors
+
+
+def prepare_objects(df: "pd.DataFrame") -> Dict[str, List[Any]]:
+    """Подготовить чанк объектов к вставке (по столбцам)"""
+    return {
+        "object_id": df["object_id"].astype("int64").tolist(),
+        "object_name": df["object_name"].astype(str).tolist(),
+        "object_type": _map_enum(df["object_type"], OBJECT_TYPE_MAP, ObjectType.PIPELINE_SECTION, lower=True).tolist(),
+        "pipeline_id": df["pipeline_id"].astype(str).tolist(),
+        "lat": df["lat"].astype(float).tolist(),
+        "lon": df["lon"].astype(float).tolist(),
+        "year": df["year"].astype("int64").tolist(),
+        "material": df["material"].astype(str).tolist()
+    }
+
+
+def prepare_diagnostics(df: "pd.DataFrame") -> Dict[str, List[Any]]:
+    """Подготовить чанк диагностик к вставке (по столбцам)"""
+    import pandas as pd
+
+    # Неразборчивая или пустая дата заменяется текущей, как и раньше
+    dates = pd.to_datetime(_column(df, "date"), format="%Y-%m-%d", errors="coerce")
+    dates = dates.dt.strftime("%Y-%m-%d").fillna(date.today().isoformat())
+
+    def numeric(name):
+        return _to_list(pd.to_numeric(_column(df, name, 0), errors="coerce").astype(float))
+
+    return {
+        "diag_id": df["diag_id"].astype("int64").tolist(),
+        "object_id": df["object_id"].astype("int64").tolist(),
+        "method": _map_enum(_column(df, "method", ""), METHOD_MAP, MethodType.VIK).tolist(),
+        "date": dates.tolist(),
+        "temperature": numeric("temperature"),
+        "humidity": numeric("humidity"),
+        "illumination": numeric("illumination"),
+        "defect_found": _to_bool(_column(df, "defect_found", False)).tolist(),
+        "defect_description": _column(df, "defect_description", "").fillna("").astype(str).tolist(),
+        "quality_grade": _map_enum(_column(df, "quality_grade", ""), QUALITY_GRADE_MAP, QualityGrade.SATISFACTORY).tolist(),
+        "param1": numeric("param1"),
+        "param2": numeric("param2"),
+        "param3": numeric("param3"),
+        "ml_label": _map_enum(_column(df, "ml_label", ""), ML_LABEL_MAP, MLLabel.NORMAL, lower=True).tolist()
+    }
+
+
+def upsert(db: Session, model, columns: Dict[str, List[Any]], key: str):
+    """Пакетная вставка с обновлением существующих строк (INSERT ... ON CONFLICT)
+
+    Значения уже приведены к виду, в котором их хранит БД, поэтому пакет
+    уходит в executemany драйвера без покомпонентной обработки типов SQLAlchemy.
+    """
+    names = list(columns)
+    if not names or not columns[names[0]]:
+        return
+    dialect = db.bind.dialect
+    stmt = dialects.insert(db.bind)(model.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={name: stmt.excluded[name] for name in names if name != key}
+    )
+    compiled = stmt.compile(dialect=dialect, column_keys=names)
+
+    if compiled.positional:
+        params = list(zip(*(columns[name] for name in compiled.positiontup)))
+    else:
+        params = [dict(zip(names, row)) for row in zip(*(columns[name] for name in names))]
+    db.connection().exec_driver_sql(compiled.string, params)
+
+
+def parse_chunks(source, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[str, Dict[str, List[Any]], List[Dict[str, Any]]]]:
+    """Разобрать CSV без обращения к БД: (тип файла, столбцы чанка, ошибки строк)"""
+    # pandas импортируется при первой загрузке, а не при старте сервера
+    import pandas as pd
+
+    kind = None
+    for chunk in pd.read_csv(source, chunksize=chunk_size, encoding="utf-8"):
+        if kind is None:
+            kind = detect_kind(chunk.columns)
+            if kind is None:
+                return
+        chunk, errors = validate_chunk(kind, chunk)
+        columns = prepare_objects(chunk) if kind == "objects" else prepare_diagnostics(chunk)
+        yield kind, columns, errors
+
+
+def write_chunk(db: Session, kind: str, columns: Dict[str, List[Any]],
+                scores: Optional[Future] = None) -> Optional[Dict[str, int]]:
+    """Записать подготовленный чанк; коммит выполняет вызывающий код
+
+    scores - проверка чанка (scoring_service.start): ее отметки пишутся в той
+    же транзакции, возвращаются счетчики проверки.
+    """
+    # Счетчики дашборда и временные ряды обновляются до записи: им нужны прежние значения строк
+    if kind == "objects":
+        summary_service.record_objects(db, columns)
+        timeseries_service.record_objects(db, columns)
+        upsert(db, Object, columns, "object_id")
+        data_events.mark_changed(db, data_events.OBJECTS, object_ids=columns["object_id"])
+    else:
+        summary_service.record_diagnostics(db, columns)
+        timeseries_service.record_diagnostics(db, columns)
+        upsert(db, Diagnostic, columns, "diag_id")
+        data_events.mark_changed(db, data_events.DIAGNOSTICS, object_ids=columns["object_id"])
+    if scores is None:
+        return None
+    try:
+        result = scores.result()
+    except Exception:
+        # Проверка - подсказка, а не условие загрузки: данные записываются и без нее
+        logger.exception("Проверка чанка моделью не выполнена")
+        return None
+    write_flags(db, columns["diag_id"], result["flags"])
+    return result["counts"]
+
+
+def write_flags(db: Session, diag_ids: List[int], flags: Dict[str, List[Any]]):
+    """Заменить отметки строк чанка: повторная загрузка строки могла снять замечание"""
+    for start in range(0, len(diag_ids), FLAG_DELETE_BATCH):
+        db.execute(delete(DiagnosticFlag).where(DiagnosticFlag.diag_id.in_(diag_ids[start:start + FLAG_DELETE_BATCH])))
+    upsert(db, DiagnosticFlag, flags, "diag_id")
+
+
+def start_scoring(db: Session, kind: str, columns: Dict[str, List[Any]]) -> Optional[Future]:
+    """Проверка загружаемых диагностик (settings.ingest_scoring), None - не проверять"""
+    if kind != "diagnostics" or not settings.ingest_scoring:
+        return None
+    return scoring_service.start(db, columns)
+
+
+def parse_csv_file(path: str, chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """Разобрать файл (задача для пула процессов, результат сериализуем)
+
+    Чанки по одному дописываются в файл chunks_path рядом с исходным, в
+    результате только итоги: память процесса разбора и писателя не зависит
+    от размера файла. Чанки читает read_parsed_chunks.
+    """
+    started = time.perf_counter()
+    result = {"kind": None, "chunks_path": path + PARSED_SUFFIX, "rows": 0, "rows_rejected": 0, "errors": []}
+    try:
+        with open(path, "rb") as source, open(result["chunks_path"], "wb") as target:
+            for kind, columns, errors in parse_chunks(source, chunk_size):
+                result["kind"] = kind
+                pickle.dump(columns, target, protocol=pickle.HIGHEST_PROTOCOL)
+                result["rows"] += len(columns["object_id"])
+                result["rows_rejected"] += len(errors)
+                result["errors"] += errors[:MAX_ROW_ERRORS - len(result["errors"])]
+    except BaseException:
+        os.remove(result["chunks_path"])
+        raise
+    result["parse_seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def read_parsed_chunks(chunks_path: str) -> Iterator[Dict[str, List[Any]]]:
+    """Чанки, записанные parse_csv_file, по одному"""
+    with open(chunks_path, "rb") as source:
+        while True:
+            try:
+                yield pickle.load(source)
+            except EOFError:
+                return
+
+
+def ingest_csv(db: Session, source: BinaryIO, chunk_size: int = CHUNK_SIZE, skip_invalid: bool = False,
+               on_chunk: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """Загрузить CSV потоково; коммит выполняет вызывающий код
+
+    Некорректные строки по умолчанию прерывают загрузку (RowError с их
+    расположением), при skip_invalid=True отбрасываются и попадают в отчет.
+    on_chunk(строк записано) вызывается после каждого чанка.
+    """
+    started = time.perf_counter()
+    kind = None
+    rows = 0
+    chunks = 0
+    rejected = 0
+    reported = []
+    flags = None
+
+    for kind, columns, errors in parse_chunks(source, chunk_size):
+        if errors:
+            if not skip_invalid:
+                raise RowError(errors)
+            rejected += len(errors)
+            reported += errors[:MAX_ROW_ERRORS - len(reported)]
+        counts = write_chunk(db, kind, columns, start_scoring(db, kind, columns))
+        flags = scoring_service.add_counts(flags, counts)
+        rows += len(columns["object_id"])
+        chunks += 1
+        if on_chunk is not None:
+            on_chunk(rows)
+
+    elapsed = time.perf_counter() - started
+    rows_per_second = rows / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Загружено {rows} строк ({kind}) за {elapsed:.2f} с: {rows_per_second:.0f} строк/с")
+
+    return {
+        "kind": kind,
+        "rows_processed": rows,
+        "rows_rejected": rejected,
+        "errors": reported,
+        "chunks": chunks,
+        "flags": flags,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(rows_per_second, 1)
+    }
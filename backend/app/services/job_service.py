@@ -0,0 +1,298 @@
+# backend/app/services/job_service.py
+"""Фоновые задачи: пул потоков, статус, прогресс и отмена по идентификатору
+
+Задача выполняется в процессе, который ее принял, а ее состояние хранится в
+таблице jobs: при нескольких воркерах (serve.py) статус, прогресс и отмену
+видит любой из них. Выполняющий процесс раз в job_heartbeat_interval
+сохраняет прогресс, продлевает аренду (heartbeat_at) и забирает запросы
+отмены из других воркеров. Задача, аренда которой истекла (процесс
+остановлен), отдается как FAILED.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, select, update
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import JobRecord
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = {SUCCEEDED, FAILED, CANCELLED}
+
+# Сколько завершенных задач хранить для запросов статуса
+MAX_FINISHED_JOBS = 100
+
+# Процесс-исполнитель в записи задачи
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobCancelled(Exception):
+    """Задача остановлена по запросу отмены"""
+
+
+class Job:
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = ""
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._cancel = threading.Event()
+
+    @classmethod
+    def from_record(cls, record: JobRecord) -> "Job":
+        """Снимок задачи другого процесса (только для чтения)"""
+        job = cls(record.kind)
+        job.id = record.job_id
+        job.status = record.status
+        job.progress = record.progress
+        job.message = record.message or ""
+        job.result = record.result
+        job.error = record.error
+        job.created_at = record.created_at
+        job.started_at = record.started_at
+        job.finished_at = record.finished_at
+        return job
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def update(self, progress: float = None, message: str = None):
+        """Сообщить прогресс (0..1); заодно точка проверки отмены"""
+        if progress is not None:
+            self.progress = round(min(max(progress, 0.0), 1.0), 4)
+        if message is not None:
+            self.message = message
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+def _state(job: Job) -> Dict[str, Any]:
+    """Изменяемые поля задачи для записи в jobs"""
+    return {
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        # Результат хранится в JSON: значения, которых json не знает, - строками
+        "result": json.loads(json.dumps(job.result, default=str)),
+        "error": job.error,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "heartbeat_at": datetime.now(),
+    }
+
+
+class JobManager:
+    def __init__(self, max_workers: int = 1, session_factory: Callable = None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        # Задачи этого процесса; остальные читаются из таблицы jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._session_factory = session_factory or SessionLocal
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def create(self, kind: str) -> Job:
+        """Зарегистрировать задачу (видна всем воркерам), не запуская ее"""
+        job = Job(kind)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        db = self._session_factory()
+        try:
+            db.add(JobRecord(job_id=job.id, kind=kind, owner=OWNER, created_at=job.created_at, **_state(job)))
+            kept = select(JobRecord.job_id).where(JobRecord.status.in_(FINISHED)).order_by(
+                JobRecord.finished_at.desc()
+            ).limit(MAX_FINISHED_JOBS)
+            db.execute(delete(JobRecord).where(JobRecord.status.in_(FINISHED), JobRecord.job_id.not_in(kept)))
+            db.commit()
+        finally:
+            db.close()
+        self._start_heartbeat()
+        return job
+
+    def start(self, job: Job, func: Callable[..., Any], *args, **kwargs) -> Job:
+        """Запустить созданную задачу; func получает Job первым аргументом"""
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def submit(self, kind: str, func: Callable[..., Any], *args, **kwargs) -> Job:
+        """Поставить задачу в очередь; func получает Job первым аргументом"""
+        return self.start(self.create(kind), func, *args, **kwargs)
+
+    def _run(self, job: Job, func, args, kwargs):
+        if job.cancel_requested:
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = datetime.now()
+        self._save(job)
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.progress = 1.0
+            self._finish(job, SUCCEEDED)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            logger.exception(f"Задача {job.kind} {job.id} завершилась с ошибкой")
+            job.error = str(e)
+            self._finish(job, FAILED)
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished_at = datetime.now()
+        self._save(job)
+        logger.info(f"Задача {job.kind} {job.id}: {status}")
+
+    def _save(self, *saved: Job):
+        """Записать состояние задач этого процесса и продлить их аренду"""
+        db = self._session_factory()
+        try:
+            for job in saved:
+                db.execute(update(JobRecord).where(JobRecord.job_id == job.id).values(**_state(job)))
+            db.commit()
+        except Exception:
+            # Потеря отметки не должна ронять саму задачу
+            logger.exception("Не удалось сохранить состояние фоновых задач")
+        finally:
+            db.close()
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is None or not self._heartbeat.is_alive():
+                self._stopped.clear()
+                self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+                self._heartbeat.start()
+
+    def _beat(self):
+        while not self._stopped.wait(settings.job_heartbeat_interval):
+            active = [job for job in self.list(local=True) if job.status not in FINISHED]
+            if not active:
+                continue
+            self._save(*active)
+            db = self._session_factory()
+            try:
+                cancelled = set(db.scalars(select(JobRecord.job_id).where(
+                    JobRecord.job_id.in_([job.id for job in active]), JobRecord.cancel_requested == True
+                )))
+            except Exception:
+                logger.exception("Не удалось проверить запросы отмены задач")
+                cancelled = set()
+            finally:
+                db.close()
+            for job in active:
+                if job.id in cancelled:
+                    self.cancel(job.id)
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job_id]
+
+    def _snapshot(self, record: JobRecord) -> Job:
+        job = Job.from_record(record)
+        expired = datetime.now() - timedelta(seconds=settings.job_lease_seconds)
+        if job.status not in FINISHED and record.heartbeat_at < expired:
+            # Процесс-исполнитель остановлен: задача уже не завершится
+            job.status = FAILED
+            job.error = f"Задача прервана: процесс {record.owner} не отвечает"
+            job.finished_at = record.heartbeat_at
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        db = self._session_factory()
+        try:
+            record = db.get(JobRecord, job_id)
+            return self._snapshot(record) if record is not None else None
+        finally:
+            db.close()
+
+    def list(self, kind: str = None, local: bool = False) -> List[Job]:
+        """Задачи в порядке создания; local=True - только задачи этого процесса"""
+        own = [job for job in list(self._jobs.values()) if kind is None or job.kind == kind]
+        if local:
+            return own
+        db = self._session_factory()
+        try:
+            query = select(JobRecord).order_by(JobRecord.created_at)
+            if kind is not None:
+                query = query.where(JobRecord.kind == kind)
+            records = db.scalars(query).all()
+        finally:
+            db.close()
+        by_id = {job.id: job for job in own}
+        return [by_id.get(record.job_id) or self._snapshot(record) for record in records]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Запросить отмену: ожидающая задача не стартует, выполняющаяся остановится на ближайшей проверке
+
+        Задачу другого процесса отменяет ее исполнитель при следующей отметке аренды.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            db = self._session_factory()
+            try:
+                db.execute(update(JobRecord).where(
+                    JobRecord.job_id == job_id, JobRecord.status.not_in(FINISHED)
+                ).values(cancel_requested=True))
+                db.commit()
+            finally:
+                db.close()
+            return self.get(job_id)
+        if job.status not in FINISHED:
+            job._cancel.set()
+            if job.status == PENDING:
+                self._finish(job, CANCELLED)
+        return job
+
+    def shutdown(self):
+        for job in self.list(local=True):
+            if job.status not in FINISHED:
+                job._cancel.set()
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+jobs = JobManager(max_workers=settings.job_workers)
@@ -0,0 +1,355 @@
+# backend/app/services/risk_service.py
+"""Оценка риска каждого объекта и ранжирование для топ-K по всему парку и трубопроводам
+
+Балл 0-100 - взвешенная сумма факторов в [0, 1]:
+  - метка ML последней диагностики и ее оценка качества, найден ли дефект;
+  - история: доля диагностик с дефектами и средняя оценка качества;
+  - возраст объекта (Object.year) и материал.
+Объект без диагностик получает средний балл по факторам последней диагностики.
+
+Признаки считаются векторно по столбцам. Баллы хранятся в отсортированных
+списках (общем и по трубопроводам), поэтому топ-K - срез списка. После коммита
+data_events сообщает, какие объекты изменились: при следующем чтении
+пересчитываются только они (поиск по индексу object_id) и переставляются
+в списках бинарным поиском. Если набор неизвестен или слишком велик -
+полная пересборка.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import Float, case, desc, func, select, type_coerce, String
+from sqlalchemy.orm import Session
+
+from app.db import rows
+from app.db.database import SessionLocal
+from app.db.models import Object, Diagnostic, MLLabel, QualityGrade
+from app.services import data_events
+
+logger = logging.getLogger(__name__)
+
+# Вклад факторов в балл (сумма = 1)
+WEIGHTS = {
+    "label": 0.30,
+    "grade": 0.15,
+    "defect": 0.10,
+    "defect_rate": 0.15,
+    "history_grade": 0.10,
+    "age": 0.12,
+    "material": 0.08,
+}
+LABEL_SCORES = {MLLabel.NORMAL.name: 0.0, MLLabel.MEDIUM.name: 0.5, MLLabel.HIGH.name: 1.0}
+GRADE_SCORES = {
+    QualityGrade.SATISFACTORY: 0.0,
+    QualityGrade.ACCEPTABLE: 0.35,
+    QualityGrade.REQUIRES_ACTION: 0.7,
+    QualityGrade.UNACCEPTABLE: 1.0,
+}
+# Углеродистые стали старых марок корродируют быстрее низколегированных
+MATERIAL_SCORES = {"Ст3": 1.0, "Ст20": 0.8, "09Г2С": 0.5, "X70": 0.3}
+DEFAULT_MATERIAL_SCORE = 0.7
+NO_DATA_SCORE = 0.5  # фактор последней диагностики, если диагностик нет
+MAX_AGE = 60  # лет: старше - фактор возраста равен 1
+
+RISK_LEVELS = [(70.0, MLLabel.HIGH.value), (40.0, MLLabel.MEDIUM.value), (0.0, MLLabel.NORMAL.value)]
+
+# Доля парка в очереди изменений, начиная с которой выгоднее полная пересборка
+REBUILD_FRACTION = 0.2
+IN_BATCH = 5000
+
+FEATURES = [
+    "object_id", "object_name", "pipeline_id", "year", "material",
+    "n_diagnostics", "n_defects", "history_grade", "last_defect",
+    "latest_label", "latest_grade", "latest_defect", "latest_date"
+]
+
+
+def _in_batches(values: List[int]):
+    for start in range(0, len(values), IN_BATCH):
+        yield values[start:start + IN_BATCH]
+
+
+def _grade_score(column):
+    # Enum хранится именем: сравниваем со строками, а не с членами enum
+    return case(
+        {grade.name: score for grade, score in GRADE_SCORES.items()},
+        value=type_coerce(column, String), else_=NO_DATA_SCORE
+    )
+
+
+def load_features(db: Session, object_ids: Optional[Iterable[int]] = None) -> Dict[str, List[Any]]:
+    """Признаки объектов столбцами; object_ids=None - весь парк"""
+    object_query = select(*rows.plain_columns(Object, ["object_id", "object_name", "pipeline_id", "year", "material"]))
+    history_query = select(
+        Diagnostic.object_id,
+        func.count(Diagnostic.diag_id),
+        func.sum(case((Diagnostic.defect_found == True, 1), else_=0)),
+        func.avg(type_coerce(_grade_score(Diagnostic.quality_grade), Float)),
+        type_coerce(func.max(case((Diagnostic.defect_found == True, Diagnostic.date))), String)
+    ).group_by(Diagnostic.object_id)
+    ranked = select(
+        Diagnostic.object_id,
+        rows.plain(Diagnostic.ml_label),
+        type_coerce(_grade_score(Diagnostic.quality_grade), Float).label("grade"),
+        Diagnostic.defect_found,
+        rows.plain(Diagnostic.date),
+        func.row_number().over(
+            partition_by=Diagnostic.object_id,
+            order_by=(desc(Diagnostic.date), desc(Diagnostic.diag_id))
+        ).label("rn")
+    )
+
+    if object_ids is None:
+        batches = [None]
+    else:
+        batches = list(_in_batches(sorted(set(object_ids))))
+
+    objects, history, latest = [], {}, {}
+    for batch in batches:
+        queries = [object_query, history_query, ranked]
+        if batch is not None:
+            queries = [
+                object_query.where(Object.object_id.in_(batch)),
+                history_query.where(Diagnostic.object_id.in_(batch)),
+                ranked.where(Diagnostic.object_id.in_(batch)),
+            ]
+        objects += db.execute(queries[0]).all()
+        history.update((row[0], row[1:]) for row in db.execute(queries[1]))
+        subquery = queries[2].subquery()
+        latest.update(
+            (row[0], row[1:5]) for row in db.execute(select(subquery).where(subquery.c.rn == 1))
+        )
+
+    columns = {name: [] for name in FEATURES}
+    no_history = (0, 0, None, None)
+    no_latest = (None, None, None, None)
+    for object_id, name, pipeline_id, year, material in objects:
+        n_diagnostics, n_defects, history_grade, last_defect = history.get(object_id, no_history)
+        latest_label, latest_grade, latest_defect, latest_date = latest.get(object_id, no_latest)
+        for field, value in zip(FEATURES, (
+            object_id, name, pipeline_id, year, material,
+            n_diagnostics, n_defects or 0, history_grade, last_defect,
+            latest_label, latest_grade, latest_defect, latest_date
+        )):
+            columns[field].append(value)
+    return columns
+
+
+def compute_scores(features: Dict[str, List[Any]], current_year: int = None) -> Dict[str, np.ndarray]:
+    """Факторы в [0, 1] и итоговый балл 0-100 для столбцов признаков"""
+    current_year = current_year or date.today().year
+    n_diagnostics = np.asarray(features["n_diagnostics"], dtype=float)
+    has_data = n_diagnostics > 0
+
+    def numeric(values, missing):
+        return np.array([missing if value is None else value for value in values], dtype=float)
+
+    factors = {
+        "label": np.array([LABEL_SCORES.get(label, NO_DATA_SCORE) for label in features["latest_label"]]),
+        "grade": numeric(features["latest_grade"], NO_DATA_SCORE),
+        "defect": np.where(has_data, numeric(features["latest_defect"], 0.0), NO_DATA_SCORE),
+        "defect_rate": np.divide(
+            np.asarray(features["n_defects"], dtype=float), n_diagnostics,
+            out=np.zeros(len(n_diagnostics)), where=has_data
+        ),
+        "history_grade": numeric(features["history_grade"], NO_DATA_SCORE),
+        "age": np.clip((current_year - numeric(features["year"], current_year)) / MAX_AGE, 0.0, 1.0),
+        "material": np.array([MATERIAL_SCORES.get(material, DEFAULT_MATERIAL_SCORE) for material in features["material"]]),
+    }
+    score = sum(WEIGHTS[name] * values for name, values in factors.items()) * 100.0
+    return {"score": np.round(score, 3), **factors}
+
+
+def risk_level(score: float) -> str:
+    return next(level for threshold, level in RISK_LEVELS if score >= threshold)
+
+
+class RiskRanking:
+    """Отсортированные по убыванию балла списки (-балл, object_id): общий и по трубопроводам"""
+
+    def __init__(self):
+        self._all: List[tuple] = []
+        self._by_pipeline: Dict[str, List[tuple]] = defaultdict(list)
+        self._entries: Dict[int, tuple] = {}  # object_id -> (ключ, трубопровод)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @classmethod
+    def build(cls, object_ids, scores, pipelines) -> "RiskRanking":
+        ranking = cls()
+        order = np.lexsort((np.asarray(object_ids), -np.asarray(scores)))
+        for i in order.tolist():
+            key = (-float(scores[i]), int(object_ids[i]))
+            ranking._all.append(key)
+            ranking._by_pipeline[pipelines[i]].append(key)
+            ranking._entries[key[1]] = (key, pipelines[i])
+        return ranking
+
+    def remove(self, object_id: int):
+        entry = self._entries.pop(object_id, None)
+        if entry is None:
+            return
+        key, pipeline = entry
+        for ranked in (self._all, self._by_pipeline[pipeline]):
+            del ranked[bisect.bisect_left(ranked, key)]
+
+    def set(self, object_id: int, score: float, pipeline: str):
+        self.remove(object_id)
+        key = (-float(score), object_id)
+        bisect.insort(self._all, key)
+        bisect.insort(self._by_pipeline[pipeline], key)
+        self._entries[object_id] = (key, pipeline)
+
+    def top(self, limit: int, pipeline_id: Optional[str] = None) -> List[tuple]:
+        ranked = self._all if pipeline_id is None else self._by_pipeline.get(pipeline_id, [])
+        return [(object_id, -negative) for negative, object_id in ranked[:limit]]
+
+    def rank(self, object_id: int) -> Optional[int]:
+        """Место объекта в общем рейтинге (с 1)"""
+        entry = self._entries.get(object_id)
+        return None if entry is None else bisect.bisect_left(self._all, entry[0]) + 1
+
+
+class RiskEngine:
+    """Рейтинг риска, поддерживаемый инкрементально по событиям data_events"""
+
+    def __init__(self):
+        self.ranking = RiskRanking()
+        self._details: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending: Set[int] = set()
+        self._rebuild = True
+        self.stats = {"full_rebuilds": 0, "incremental_updates": 0, "last_refresh_seconds": 0.0}
+        data_events.subscribe_objects(self.mark_changed)
+
+    def mark_changed(self, object_ids: Optional[Set[int]] = None):
+        with self._pending_lock:
+            if object_ids is None:
+                self._rebuild = True
+            else:
+                self._pending |= set(object_ids)
+
+    @staticmethod
+    def _store(details: Dict[int, Dict[str, Any]], features: Dict[str, List[Any]], scores: Dict[str, np.ndarray]):
+        names = list(WEIGHTS)
+        for i, object_id in enumerate(features["object_id"]):
+            details[object_id] = {
+                "object_name": features["object_name"][i],
+                "pipeline_id": features["pipeline_id"][i],
+                "risk_score": float(scores["score"][i]),
+                "criticality": rows.ENUM_VALUES[MLLabel].get(features["latest_label"][i]),
+                "last_inspection": features["latest_date"][i],
+                "last_defect": features["last_defect"][i],
+                "factors": {name: float(scores[name][i]) for name in names},
+            }
+
+    def _rebuild_all(self, db: Session):
+        features = load_features(db)
+        scores = compute_scores(features)
+        details = {}
+        self._store(details, features, scores)
+        # Рейтинг и детали подменяются вместе, уже собранными
+        self.ranking, self._details = (
+            RiskRanking.build(features["object_id"], scores["score"], features["pipeline_id"]), details
+        )
+        self.stats["full_rebuilds"] += 1
+
+    def _update(self, db: Session, object_ids: Set[int]):
+        features = load_features(db, object_ids)
+        scores = compute_scores(features)
+        found = set(features["object_id"])
+        # Удаленные объекты уходят из рейтинга
+        for object_id in object_ids - found:
+            self.ranking.remove(object_id)
+            self._details.pop(object_id, None)
+        self._store(self._details, features, scores)
+        for object_id, score, pipeline in zip(features["object_id"], scores["score"].tolist(), features["pipeline_id"]):
+            self.ranking.set(object_id, score, pipeline)
+        self.stats["incremental_updates"] += 1
+
+    def refresh(self, db: Optional[Session] = None):
+        """Применить накопленные изменения (или пересобрать рейтинг)"""
+        with self._lock:
+            self._refresh(db)
+
+    def _refresh(self, db: Optional[Session]):
+        # Вызывается под self._lock
+        with self._pending_lock:
+            rebuild, pending = self._rebuild, self._pending
+            self._rebuild, self._pending = False, set()
+        if not rebuild and not pending:
+            return
+        if len(pending) > REBUILD_FRACTION * max(len(self.ranking), 1):
+            rebuild = True
+
+        started = time.perf_counter()
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            if rebuild:
+                self._rebuild_all(db)
+            else:
+                self._update(db, pending)
+        except Exception:
+            # Изменения не потеряны: следующая попытка пересоберет рейтинг целиком
+            self.mark_changed(None)
+            raise
+        finally:
+            if own_session:
+                db.close()
+        self.stats["last_refresh_seconds"] = time.perf_counter() - started
+        logger.info(
+            f"Рейтинг риска: {'пересборка' if rebuild else f'обновлено {len(pending)} объектов'} "
+            f"за {self.stats['last_refresh_seconds']:.3f} с"
+        )
+
+    def top(self, limit: int = 5, pipeline_id: Optional[str] = None, db: Optional[Session] = None) -> List[Dict[str, Any]]:
+        """Топ-K объектов по риску (по всему парку или по трубопроводу)"""
+        # Обновление и чтение под одной блокировкой: параллельный запрос не
+        # переставит списки рейтинга посреди чтения
+        with self._lock:
+            self._refresh(db)
+            top = [
+                (object_id, score, self._details[object_id])
+                for object_id, score in self.ranking.top(limit, pipeline_id)
+            ]
+        result = []
+        for object_id, score, details in top:
+            result.append({
+                "object_id": object_id,
+                "object_name": details["object_name"],
+                "pipeline_id": details["pipeline_id"],
+                "risk_score": round(score, 1),
+                "risk_level": risk_level(score),
+                "criticality": details["criticality"],
+                "last_inspection": details["last_inspection"],
+                "last_defect": details["last_defect"],
+                "factors": {name: round(value, 3) for name, value in details["factors"].items()},
+            })
+        return result
+
+    def describe(self, object_id: int, db: Optional[Session] = None) -> Optional[Dict[str, Any]]:
+        """Балл, место в рейтинге и факторы одного объекта"""
+        with self._lock:
+            self._refresh(db)
+            details = self._details.get(object_id)
+            if details is None:
+                return None
+            rank, total = self.ranking.rank(object_id), len(self.ranking)
+        return {
+            "object_id": object_id,
+            **details,
+            "risk_level": risk_level(details["risk_score"]),
+            "rank": rank,
+            "total_ranked": total,
+        }
+
+
+risk_engine = RiskEngine()
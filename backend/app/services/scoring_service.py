@@ -0,0 +1,169 @@
+# backend/app/services/scoring_service.py
+"""Проверка диагностик при загрузке CSV: предсказание модели и поиск выбросов
+
+Чанк диагностик целиком проходит через DefectPredictor (одна матрица, один
+проход леса) и детектор выбросов app.ml.anomaly. Отмечаются строки, где метка
+из файла расходится с предсказанием модели, и выбросы по параметрам и
+условиям контроля; отметки пишет import_service.write_chunk в diagnostic_flags.
+
+Чанк проверяется в отдельном потоке, пока он же записывается в БД: обход
+леса (numpy) и выполнение запросов SQLite отпускают GIL. Эталон детектора -
+последние REFERENCE_ROWS диагностик БД, обновляется после REFIT_ROWS
+проверенных строк.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.models import Diagnostic, MLLabel
+from app.ml.anomaly import ANOMALY_FEATURES, OutlierDetector
+from app.ml.model import DefectPredictor, FEATURES, FEATURE_DEFAULTS, LABELS
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_ROWS = 50_000
+# Проверенных строк до обновления эталона
+REFIT_ROWS = 500_000
+# Меньше строк в БД - эталоном служит и сам чанк
+MIN_REFERENCE_ROWS = 1_000
+
+# Метки модели в виде имен MLLabel, как они хранятся в БД
+LABEL_NAMES = np.asarray([MLLabel(label).name for label in LABELS], dtype=object)
+FLAG_FIELDS = [
+    "diag_id", "object_id", "stated_label", "predicted_label", "confidence", "anomaly_score",
+    "label_mismatch", "outlier", "model_version", "scored_at"
+]
+COUNTS = ["scored", "label_mismatch", "outliers", "flagged"]
+
+
+def _matrix(columns: Dict[str, List[Any]], names: List[str]) -> np.ndarray:
+    """Столбцы чанка -> матрица float, None -> NaN"""
+    return np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in names])
+
+
+def add_counts(total: Optional[Dict[str, int]], counts: Optional[Dict[str, int]]) -> Optional[Dict[str, int]]:
+    """Сложить счетчики проверки чанков (None - проверки не было)"""
+    if counts is None:
+        return total
+    if total is None:
+        return dict(counts)
+    return {name: total[name] + counts[name] for name in COUNTS}
+
+
+class IngestScorer:
+    """Модель и детектор выбросов для проверки загружаемых чанков"""
+
+    def __init__(self):
+        self.predictor: Optional[DefectPredictor] = None
+        self.detector = OutlierDetector()
+        self._lock = threading.Lock()
+        self._scored_since_fit = 0
+        self.stats = {"scored": 0, "label_mismatch": 0, "outliers": 0, "reference_fits": 0, "last_chunk_seconds": 0.0}
+
+    def use_predictor(self, predictor: DefectPredictor):
+        """Проверять той же моделью, что отвечает на /predict (общая перезагрузка версий)"""
+        self.predictor = predictor
+
+    def prepare(self, db: Session, columns: Dict[str, List[Any]]):
+        """Обновить эталон детектора, если пора; вызывается в потоке записи до записи чанка"""
+        with self._lock:
+            detector = self.detector
+            if detector.fitted and detector.reference_rows >= MIN_REFERENCE_ROWS and self._scored_since_fit < REFIT_ROWS:
+                return
+            query = select(Diagnostic.method, *(getattr(Diagnostic, name) for name in ANOMALY_FEATURES)).order_by(
+                Diagnostic.diag_id.desc()
+            ).limit(REFERENCE_ROWS)
+            rows = db.execute(query).all()
+            methods = [row[0].name for row in rows]
+            X = np.asarray([row[1:] for row in rows], dtype=np.float64).reshape(-1, len(ANOMALY_FEATURES))
+            if len(rows) < MIN_REFERENCE_ROWS:
+                methods += columns["method"]
+                X = np.vstack([X, _matrix(columns, ANOMALY_FEATURES)])
+            # Новый объект целиком: проверка, идущая в другом потоке, дорабатывает на прежнем
+            self.detector = OutlierDetector().fit(X, methods)
+            self._scored_since_fit = 0
+            self.stats["reference_fits"] += 1
+
+    def score(self, columns: Dict[str, List[Any]]) -> Dict[str, Any]:
+        """Отметки строк чанка (по столбцам, только отмеченные строки) и счетчики"""
+        started = time.perf_counter()
+        if self.predictor is None:
+            self.predictor = DefectPredictor()
+        n = len(columns["diag_id"])
+
+        X = _matrix(columns, FEATURES)
+        defaults = np.asarray([FEATURE_DEFAULTS[name] for name in FEATURES], dtype=np.float64)
+        probabilities = self.predictor.predict_proba_batch(np.where(np.isnan(X), defaults, X))
+        best = probabilities.argmax(axis=1)
+        predicted = LABEL_NAMES[best]
+        confidence = probabilities[np.arange(n), best]
+        stated = np.asarray(columns["ml_label"], dtype=object)
+        mismatch = stated != predicted
+
+        detector = self.detector
+        if detector.fitted:
+            anomaly = detector.score(_matrix(columns, ANOMALY_FEATURES), columns["method"])
+        else:
+            anomaly = np.zeros(n)
+        outlier = detector.is_outlier(anomaly)
+
+        flagged = np.flatnonzero(mismatch | outlier)
+        flags = {
+            "diag_id": np.asarray(columns["diag_id"])[flagged].tolist(),
+            "object_id": np.asarray(columns["object_id"])[flagged].tolist(),
+            "stated_label": stated[flagged].tolist(),
+            "predicted_label": predicted[flagged].tolist(),
+            "confidence": confidence[flagged].round(4).tolist(),
+            "anomaly_score": anomaly[flagged].round(3).tolist(),
+            "label_mismatch": mismatch[flagged].tolist(),
+            "outlier": outlier[flagged].tolist(),
+            "model_version": [self.predictor.version] * len(flagged),
+            "scored_at": [datetime.now().isoformat(sep=" ")] * len(flagged),
+        }
+        counts = {
+            "scored": n,
+            "label_mismatch": int(mismatch.sum()),
+            "outliers": int(outlier.sum()),
+            "flagged": len(flagged),
+        }
+        with self._lock:
+            self._scored_since_fit += n
+            for name in ("scored", "label_mismatch", "outliers"):
+                self.stats[name] += counts[name]
+            self.stats["last_chunk_seconds"] = time.perf_counter() - started
+        return {"flags": flags, "counts": counts}
+
+
+scorer = IngestScorer()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def start(db: Session, columns: Dict[str, List[Any]]) -> Future:
+    """Начать проверку чанка в фоновом потоке; результат забирает write_chunk"""
+    global _executor
+    try:
+        scorer.prepare(db, columns)
+    except Exception:
+        # Без эталона проверка идет только моделью
+        logger.exception("Не удалось обновить эталон детектора выбросов")
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-scoring")
+        return _executor.submit(scorer.score, columns)
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,205 @@
+# backend/app/services/spatial_index.py
+"""Пространственный индекс объектов в памяти с заранее посчитанными кластерами
+
+Объекты раскладываются по сетке Web Mercator: на уровне z мир делится на
+2^z тайлов по CELLS_PER_TILE ячеек на сторону. Для каждого уровня один раз
+считаются кластеры (ячейки с объектами): число объектов, число по
+критичности последней диагностики, худшая критичность и центроид. Кластеры
+уровня отсортированы по ключу (cx, cy), поэтому запрос окна карты - это
+бинарный поиск по диапазону cx и фильтр по cy.
+
+Индекс пересобирается лениво при первом запросе после коммита, изменившего
+объекты или диагностики (см. data_events).
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import String, desc, func, select, type_coerce
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.db.models import Object, Diagnostic, MLLabel
+from app.services import data_events
+
+logger = logging.getLogger(__name__)
+
+MAX_ZOOM = 18
+CELLS_PER_TILE = 4  # ячейка ~64 px при тайлах 256 px
+MAX_LAT = 85.05112878
+
+# Индексы критичности; -1 - у объекта нет диагностики с меткой
+CRITICALITY = [label.value for label in (MLLabel.NORMAL, MLLabel.MEDIUM, MLLabel.HIGH)]
+CRITICALITY_INDEX = {label.name: i for i, label in enumerate((MLLabel.NORMAL, MLLabel.MEDIUM, MLLabel.HIGH))}
+
+# Сдвиг для ключа cx << KEY_SHIFT | cy: хватает на MAX_ZOOM и CELLS_PER_TILE
+KEY_SHIFT = 32
+
+
+def mercator(lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Нормированные координаты Web Mercator в [0, 1)"""
+    lat = np.radians(np.clip(lat, -MAX_LAT, MAX_LAT))
+    mx = (np.asarray(lon, dtype=float) + 180.0) / 360.0
+    my = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0
+    return np.clip(mx, 0.0, np.nextafter(1.0, 0)), np.clip(my, 0.0, np.nextafter(1.0, 0))
+
+
+def cells_per_axis(level: int) -> int:
+    return (1 << level) * CELLS_PER_TILE
+
+
+class Level:
+    """Кластеры одного уровня, отсортированные по ключу ячейки"""
+
+    def __init__(self, level: int, keys, count, by_criticality, worst, lat, lon, object_id):
+        self.level = level
+        self.keys = keys
+        self.count = count
+        self.by_criticality = by_criticality  # (кластеры x 3)
+        self.worst = worst
+        self.lat = lat
+        self.lon = lon
+        self.object_id = object_id  # id объекта для одиночных ячеек, иначе -1
+
+    @classmethod
+    def build(cls, level: int, mx, my, lat, lon, criticality, object_ids) -> "Level":
+        n = cells_per_axis(level)
+        keys = ((mx * n).astype(np.int64) << KEY_SHIFT) | (my * n).astype(np.int64)
+        cells, inverse, count = np.unique(keys, return_inverse=True, return_counts=True)
+
+        labelled = criticality >= 0
+        by_criticality = np.bincount(
+            inverse[labelled] * len(CRITICALITY) + criticality[labelled],
+            minlength=len(cells) * len(CRITICALITY)
+        ).reshape(len(cells), len(CRITICALITY))
+        # Худшая критичность - старший индекс с ненулевым счетчиком
+        present = by_criticality > 0
+        worst = np.where(
+            present.any(axis=1), len(CRITICALITY) - 1 - np.argmax(present[:, ::-1], axis=1), -1
+        )
+
+        single = np.full(len(cells), -1, dtype=np.int64)
+        single[inverse[count[inverse] == 1]] = object_ids[count[inverse] == 1]
+        return cls(
+            level, cells, count, by_criticality, worst,
+            np.bincount(inverse, weights=lat) / count,
+            np.bincount(inverse, weights=lon) / count,
+            single
+        )
+
+    def window(self, mx_range, my_range) -> np.ndarray:
+        """Индексы кластеров, чьи ячейки попадают в окно"""
+        n = cells_per_axis(self.level)
+        x0, x1 = (int(value * n) for value in mx_range)
+        y0, y1 = (int(value * n) for value in my_range)
+        return self.cells(x0, x1, y0, y1)
+
+    def cells(self, x0: int, x1: int, y0: int, y1: int) -> np.ndarray:
+        """Индексы кластеров в прямоугольнике ячеек [x0, x1] x [y0, y1] включительно"""
+        start = np.searchsorted(self.keys, x0 << KEY_SHIFT, side="left")
+        end = np.searchsorted(self.keys, (x1 + 1) << KEY_SHIFT, side="left")
+        cy = self.keys[start:end] & ((1 << KEY_SHIFT) - 1)
+        return start + np.flatnonzero((cy >= y0) & (cy <= y1))
+
+
+class SpatialIndex:
+    def __init__(self, levels: List[Level], n_objects: int, data_version: int, build_seconds: float):
+        self.levels = levels
+        self.n_objects = n_objects
+        self.data_version = data_version
+        self.build_seconds = build_seconds
+
+    @classmethod
+    def from_arrays(cls, object_ids, lat, lon, criticality, data_version: int = 0) -> "SpatialIndex":
+        started = time.perf_counter()
+        mx, my = mercator(lat, lon)
+        levels = [Level.build(level, mx, my, lat, lon, criticality, object_ids) for level in range(MAX_ZOOM + 1)]
+        return cls(levels, len(object_ids), data_version, time.perf_counter() - started)
+
+    def query(self, bbox: Tuple[float, float, float, float], zoom: float) -> Dict[str, Any]:
+        """Кластеры в окне bbox = (min_lon, min_lat, max_lon, max_lat) для масштаба zoom"""
+        min_lon, min_lat, max_lon, max_lat = bbox
+        level = self.levels[int(min(max(round(zoom), 0), MAX_ZOOM))]
+        (x0, x1), (y1, y0) = mercator(np.array([min_lat, max_lat]), np.array([min_lon, max_lon]))
+        selected = level.window((x0, x1), (y0, y1))
+
+        clusters = []
+        for i in selected.tolist():
+            cluster = {
+                "lat": float(level.lat[i]),
+                "lon": float(level.lon[i]),
+                "count": int(level.count[i]),
+                "counts": dict(zip(CRITICALITY, level.by_criticality[i].tolist())),
+                "criticality": CRITICALITY[level.worst[i]] if level.worst[i] >= 0 else None
+            }
+            if level.object_id[i] >= 0:
+                cluster["object_id"] = int(level.object_id[i])
+            clusters.append(cluster)
+        return {
+            "level": level.level,
+            "clusters": clusters,
+            "objects_in_view": int(level.count[selected].sum())
+        }
+
+
+def load_arrays(db: Session):
+    """object_id, lat, lon и индекс критичности последней диагностики каждого объекта"""
+    ranked = select(
+        Diagnostic.object_id,
+        type_coerce(Diagnostic.ml_label, String).label("ml_label"),
+        func.row_number().over(
+            partition_by=Diagnostic.object_id,
+            order_by=(desc(Diagnostic.date), desc(Diagnostic.diag_id))
+        ).label("rn")
+    ).subquery()
+    latest = select(ranked.c.object_id, ranked.c.ml_label).where(ranked.c.rn == 1).subquery()
+    stmt = select(Object.object_id, Object.lat, Object.lon, latest.c.ml_label).outerjoin(
+        latest, latest.c.object_id == Object.object_id
+    ).where(Object.lat.isnot(None), Object.lon.isnot(None))
+
+    rows = db.execute(stmt).all()
+    object_ids, lat, lon, labels = zip(*rows) if rows else ((), (), (), ())
+    return (
+        np.array(object_ids, dtype=np.int64),
+        np.array(lat, dtype=float),
+        np.array(lon, dtype=float),
+        np.array([CRITICALITY_INDEX.get(label, -1) for label in labels], dtype=np.int64)
+    )
+
+
+class SpatialIndexService:
+    """Текущий индекс и его ленивая пересборка после изменений данных"""
+
+    def __init__(self):
+        self._index: Optional[SpatialIndex] = None
+        self._stale = True
+        self._lock = threading.Lock()
+        data_events.subscribe(data_events.OBJECTS, self.invalidate)
+        data_events.subscribe(data_events.DIAGNOSTICS, self.invalidate)
+
+    def invalidate(self, topic: str = None):
+        self._stale = True
+
+    def get(self) -> SpatialIndex:
+        if self._stale or self._index is None:
+            with self._lock:
+                if self._stale or self._index is None:
+                    # Снимаем флаг до чтения: изменения во время сборки вызовут новую сборку
+                    self._stale = False
+                    version = data_events.data_version()
+                    db = SessionLocal()
+                    try:
+                        arrays = load_arrays(db)
+                    finally:
+                        db.close()
+                    self._index = SpatialIndex.from_arrays(*arrays, data_version=version)
+                    logger.info(
+                        f"Пространственный индекс: {self._index.n_objects} объектов, "
+                        f"{self._index.build_seconds:.3f} с"
+                    )
+        return self._index
+
+
+spatial_index = SpatialIndexService()
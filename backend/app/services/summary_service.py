@@ -0,0 +1,274 @@
+# backend/app/services/summary_service.py
+"""Материализованные агрегаты дашборда с инкрементальным обновлением
+
+Счетчики хранятся в таблице summary_counters как (metric, key) -> value и
+обновляются в той же транзакции, что и запись объектов/диагностик. Дашборд
+читает их одним запросом, размер которого не зависит от размера таблиц.
+
+Полная пересборка (восстановление после сбоя или ручных правок в БД):
+    python -m app.services.summary_service
+"""
+import logging
+from collections import Counter
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from app.db import dialects
+from app.db.models import Object, Diagnostic, SummaryCounter
+from app.services import data_events
+
+logger = logging.getLogger(__name__)
+
+INITIALIZED = ("meta", "initialized")
+
+# Размер пачки идентификаторов в IN (...), чтобы не упираться в лимит параметров
+IN_BATCH = 5000
+
+DIAGNOSTIC_FIELDS = ["diag_id", "object_id", "method", "date", "defect_found", "quality_grade", "ml_label"]
+
+
+def _name(value):
+    """Enum -> имя (так значение хранится в БД), строки и None без изменений"""
+    return getattr(value, "name", value)
+
+
+def _month(value) -> str:
+    return str(value)[:7] if value else None
+
+
+def _in_batches(values: Iterable[Any]):
+    values = list(values)
+    for start in range(0, len(values), IN_BATCH):
+        yield values[start:start + IN_BATCH]
+
+
+def _last_occurrence(columns: Dict[str, List[Any]], key: str) -> Dict[str, List[Any]]:
+    """Оставить последнюю строку для повторяющихся ключей (так их запишет upsert)"""
+    ids = columns[key]
+    if len(set(ids)) == len(ids):
+        return columns
+    last = {value: position for position, value in enumerate(ids)}
+    positions = sorted(last.values())
+    return {name: [values[i] for i in positions] for name, values in columns.items()}
+
+
+def _is_initialized(db: Session) -> bool:
+    return db.get(SummaryCounter, INITIALIZED) is not None
+
+
+def _apply(db: Session, deltas: Counter):
+    """Прибавить дельты к счетчикам (INSERT ... ON CONFLICT DO UPDATE value = value + delta)"""
+    rows = [
+        {"metric": metric, "key": key or "", "value": value}
+        for (metric, key), value in deltas.items()
+        if value
+    ]
+    if not rows:
+        return
+    table = SummaryCounter.__table__
+    stmt = dialects.insert(db.bind)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.metric, table.c.key],
+        set_={"value": table.c.value + stmt.excluded.value}
+    )
+    db.execute(stmt, rows)
+
+
+def _diagnostic_deltas(columns: Dict[str, List[Any]], pipelines: Dict[int, str], sign: int, deltas: Counter):
+    methods = [_name(value) for value in columns["method"]]
+    defects = [bool(value) for value in columns["defect_found"]]
+    months = [_month(value) for value in columns["date"]]
+
+    deltas[("diagnostics", "")] += sign * len(methods)
+    deltas[("defects", "")] += sign * sum(defects)
+    for metric, keys in (
+        ("method", methods),
+        ("grade", [_name(value) for value in columns["quality_grade"]]),
+        ("label", [_name(value) for value in columns["ml_label"] if value is not None]),
+        ("month", months),
+        ("method_defects", [m for m, d in zip(methods, defects) if d]),
+        ("month_defects", [m for m, d in zip(months, defects) if d]),
+        ("pipeline_defects", [
+            pipelines.get(object_id)
+            for object_id, d in zip(columns["object_id"], defects)
+            if d and pipelines.get(object_id)
+        ]),
+    ):
+        for key, count in Counter(keys).items():
+            deltas[(metric, key)] += sign * count
+
+
+def _fetch_diagnostics(db: Session, diag_ids: Iterable[int]) -> Dict[str, List[Any]]:
+    columns = {name: [] for name in DIAGNOSTIC_FIELDS}
+    table = Diagnostic.__table__
+
+    # Выгрузки обычно дописывают новые id - такие строки заведомо не существуют
+    max_id = db.execute(select(func.max(table.c.diag_id))).scalar()
+    if max_id is None:
+        return columns
+    diag_ids = [diag_id for diag_id in diag_ids if diag_id <= max_id]
+
+    for batch in _in_batches(diag_ids):
+        rows = db.execute(
+            select(*(table.c[name] for name in DIAGNOSTIC_FIELDS)).where(table.c.diag_id.in_(batch))
+        ).all()
+        for row in rows:
+            for name, value in zip(DIAGNOSTIC_FIELDS, row):
+                columns[name].append(value)
+    return columns
+
+
+def _fetch_objects(db: Session, object_ids: Iterable[int]) -> Dict[int, tuple]:
+    """object_id -> (object_type, pipeline_id) для существующих объектов"""
+    result = {}
+    for batch in _in_batches(object_ids):
+        rows = db.execute(
+            select(Object.object_id, Object.object_type, Object.pipeline_id).where(Object.object_id.in_(batch))
+        ).all()
+        result.update({object_id: (_name(object_type), pipeline_id) for object_id, object_type, pipeline_id in rows})
+    return result
+
+
+def _object_defects(db: Session, object_ids: Iterable[int]) -> Dict[int, int]:
+    result = {}
+    for batch in _in_batches(object_ids):
+        rows = db.execute(
+            select(Diagnostic.object_id, func.count(Diagnostic.diag_id)).where(
+                Diagnostic.object_id.in_(batch),
+                Diagnostic.defect_found == True
+            ).group_by(Diagnostic.object_id)
+        ).all()
+        result.update(dict(rows))
+    return result
+
+
+def record_diagnostics(db: Session, columns: Dict[str, List[Any]]):
+    """Учесть вставку/замену диагностик; вызывать до записи строк в БД"""
+    if not columns["diag_id"] or not _is_initialized(db):
+        return
+    columns = _last_occurrence(columns, "diag_id")
+    old = _fetch_diagnostics(db, columns["diag_id"])
+    object_ids = set(columns["object_id"]) | set(old["object_id"])
+    pipelines = {object_id: pipeline for object_id, (_, pipeline) in _fetch_objects(db, object_ids).items()}
+
+    deltas = Counter()
+    _diagnostic_deltas(columns, pipelines, 1, deltas)
+    _diagnostic_deltas(old, pipelines, -1, deltas)
+    _apply(db, deltas)
+
+
+def record_objects(db: Session, columns: Dict[str, List[Any]]):
+    """Учесть вставку/замену объектов; вызывать до записи строк в БД"""
+    if not columns["object_id"] or not _is_initialized(db):
+        return
+    columns = _last_occurrence(columns, "object_id")
+    new = {
+        object_id: (_name(object_type), pipeline_id)
+        for object_id, object_type, pipeline_id in zip(
+            columns["object_id"], columns["object_type"], columns["pipeline_id"]
+        )
+    }
+    old = _fetch_objects(db, new)
+    moved = [object_id for object_id, (_, pipeline) in new.items() if old.get(object_id, (None, None))[1] != pipeline]
+    defects = _object_defects(db, moved)
+
+    deltas = Counter()
+    for object_id, (object_type, pipeline) in new.items():
+        if object_id in old:
+            old_type, old_pipeline = old[object_id]
+            deltas[("object_type", old_type)] -= 1
+            deltas[("pipeline_objects", old_pipeline)] -= 1
+            deltas[("pipeline_defects", old_pipeline)] -= defects.get(object_id, 0)
+        else:
+            deltas[("objects", "")] += 1
+        deltas[("object_type", object_type)] += 1
+        deltas[("pipeline_objects", pipeline)] += 1
+        deltas[("pipeline_defects", pipeline)] += defects.get(object_id, 0)
+    _apply(db, deltas)
+
+
+def forget_object(db: Session, object_id: int):
+    """Учесть удаление объекта; вызывать до удаления строки"""
+    if not _is_initialized(db):
+        return
+    old = _fetch_objects(db, [object_id])
+    if object_id not in old:
+        return
+    object_type, pipeline = old[object_id]
+    deltas = Counter({
+        ("objects", ""): -1,
+        ("object_type", object_type): -1,
+        ("pipeline_objects", pipeline): -1,
+        ("pipeline_defects", pipeline): -_object_defects(db, [object_id]).get(object_id, 0),
+    })
+    _apply(db, deltas)
+
+
+def rebuild(db: Session):
+    """Пересчитать все счетчики с нуля по таблицам objects и diagnostics"""
+    db.query(SummaryCounter).delete()
+
+    defects = func.count(case((Diagnostic.defect_found == True, 1)))
+    month = dialects.month_bucket(Diagnostic.date)
+    deltas = Counter({INITIALIZED: 1})
+
+    total, total_defects = db.query(func.count(Diagnostic.diag_id), defects).one()
+    deltas[("diagnostics", "")] = total
+    deltas[("defects", "")] = total_defects
+    deltas[("objects", "")] = db.query(func.count(Object.object_id)).scalar()
+
+    for metric, defects_metric, column in (
+        ("method", "method_defects", Diagnostic.method),
+        ("month", "month_defects", month),
+    ):
+        for key, count, defect_count in db.query(column, func.count(Diagnostic.diag_id), defects).group_by(column):
+            deltas[(metric, _name(key))] = count
+            deltas[(defects_metric, _name(key))] = defect_count
+
+    for metric, column, count_column in (
+        ("label", Diagnostic.ml_label, Diagnostic.diag_id),
+        ("grade", Diagnostic.quality_grade, Diagnostic.diag_id),
+        ("object_type", Object.object_type, Object.object_id),
+        ("pipeline_objects", Object.pipeline_id, Object.object_id),
+    ):
+        for key, count in db.query(column, func.count(count_column)).filter(column.isnot(None)).group_by(column):
+            deltas[(metric, _name(key))] = count
+
+    pipeline_defects = db.query(Object.pipeline_id, func.count(Diagnostic.diag_id)).join(
+        Diagnostic, Object.object_id == Diagnostic.object_id
+    ).filter(Diagnostic.defect_found == True).group_by(Object.pipeline_id)
+    for pipeline, count in pipeline_defects:
+        deltas[("pipeline_defects", pipeline)] = count
+
+    _apply(db, deltas)
+    # Запись в обход ORM: после коммита кэши ответов дашборда во всех воркерах устаревают
+    data_events.mark_changed(db, data_events.SUMMARY)
+    logger.info(f"Счетчики дашборда пересобраны: {len(deltas)} значений")
+
+
+def read_summary(db: Session) -> Dict[str, Dict[str, int]]:
+    """Все счетчики одним запросом: {metric: {key: value}}"""
+    if not _is_initialized(db):
+        rebuild(db)
+        db.commit()
+
+    summary: Dict[str, Dict[str, int]] = {}
+    for metric, key, value in db.query(SummaryCounter.metric, SummaryCounter.key, SummaryCounter.value):
+        summary.setdefault(metric, {})[key] = value
+    return summary
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal, engine
+    from app.db.migrations import upgrade
+
+    upgrade(engine)
+    db = SessionLocal()
+    try:
+        rebuild(db)
+        db.commit()
+        print("Счетчики дашборда пересобраны")
+    finally:
+        db.close()
@@ -0,0 +1,247 @@
+# backend/app/services/tile_service.py
+"""Векторные тайлы карты (MVT): объекты по критичности и трассы трубопроводов
+
+Точки берутся из пространственного индекса (уровень z + TILE_LEVEL_OFFSET,
+ячейка ~16 px), поэтому в тайле не больше нескольких сотен признаков при
+любой плотности объектов. Линии трасс обрезаются по тайлу с запасом BUFFER.
+Готовые тайлы кэшируются по (версия данных, z, x, y): после коммита,
+изменившего данные, кэш сбрасывается.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.db import crud
+from app.db.database import SessionLocal
+from app.services import data_events
+from app.services.spatial_index import (
+    SpatialIndex, spatial_index, mercator, cells_per_axis, MAX_ZOOM, CRITICALITY
+)
+from app.utils import mvt
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+MAX_TILE_ZOOM = 22
+TILE_LEVEL_OFFSET = 2
+BUFFER = 64  # пикселей extent за краем тайла
+
+# Цвета как у /api/map/clusters
+COLORS = {"normal": "#4CAF50", "medium": "#FF9800", "high": "#F44336"}
+
+
+class TileCache:
+    """LRU-кэш готовых тайлов"""
+
+    def __init__(self, max_tiles: int):
+        self.max_tiles = max_tiles
+        self._tiles: "OrderedDict[Tuple[int, int, int, int], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            data = self._tiles.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data: bytes):
+        with self._lock:
+            self._tiles[key] = data
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+
+    def drop_versions_except(self, version: int):
+        with self._lock:
+            for key in [key for key in self._tiles if key[0] != version]:
+                del self._tiles[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "tiles": len(self._tiles),
+                "max_tiles": self.max_tiles,
+                "bytes": sum(len(data) for data in self._tiles.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0
+            }
+
+
+def tile_pixels(mx: np.ndarray, my: np.ndarray, z: int, x: int, y: int, extent: int = mvt.EXTENT):
+    """Нормированные координаты Меркатора -> пиксели тайла (float)"""
+    scale = float(1 << z)
+    return (mx * scale - x) * extent, (my * scale - y) * extent
+
+
+def clip_segments(px: np.ndarray, py: np.ndarray, lo: float, hi: float):
+    """Обрезка отрезков ломаной по квадрату [lo, hi] (Лианг-Барски, векторно)
+
+    Возвращает маску принятых отрезков и их обрезанные концы.
+    """
+    x0, y0, x1, y1 = px[:-1], py[:-1], px[1:], py[1:]
+    dx, dy = x1 - x0, y1 - y0
+    t0 = np.zeros(len(dx))
+    t1 = np.ones(len(dx))
+    accepted = np.ones(len(dx), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for p, q in ((-dx, x0 - lo), (dx, hi - x0), (-dy, y0 - lo), (dy, hi - y0)):
+            accepted &= ~((p == 0) & (q < 0))
+            ratio = q / p
+            t0 = np.where(p < 0, np.maximum(t0, ratio), t0)
+            t1 = np.where(p > 0, np.minimum(t1, ratio), t1)
+    accepted &= t0 <= t1
+    return accepted, (x0 + t0 * dx, y0 + t0 * dy, x0 + t1 * dx, y0 + t1 * dy)
+
+
+def clip_line(px: np.ndarray, py: np.ndarray, lo: float, hi: float) -> List[List[Tuple[int, int]]]:
+    """Части ломаной внутри квадрата, в целых пикселях без повторов точек"""
+    if len(px) < 2:
+        return []
+    accepted, (sx, sy, ex, ey) = clip_segments(px, py, lo, hi)
+    sx, sy, ex, ey = (np.rint(values).astype(np.int64).tolist() for values in (sx, sy, ex, ey))
+    parts: List[List[Tuple[int, int]]] = []
+    part: List[Tuple[int, int]] = []
+    previous = -2
+    for i in np.flatnonzero(accepted).tolist():
+        start, end = (sx[i], sy[i]), (ex[i], ey[i])
+        # Новая часть, если предыдущий отрезок выброшен или обрезан с конца
+        if i != previous + 1 or not part or part[-1] != start:
+            if len(part) > 1:
+                parts.append(part)
+            part = [start]
+        if end != part[-1]:
+            part.append(end)
+        previous = i
+    if len(part) > 1:
+        parts.append(part)
+    return parts
+
+
+class PipelineGeometry:
+    """Трасса в координатах Меркатора с охватывающим прямоугольником"""
+
+    def __init__(self, pipeline_id: str, name: str, coordinates: List[List[float]]):
+        self.pipeline_id = pipeline_id
+        self.name = name
+        points = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        self.mx, self.my = mercator(points[:, 1], points[:, 0])
+        self.bounds = (
+            (self.mx.min(), self.my.min(), self.mx.max(), self.my.max()) if len(points) else (1.0, 1.0, 0.0, 0.0)
+        )
+
+
+def load_pipelines() -> List[PipelineGeometry]:
+    db = SessionLocal()
+    try:
+        return [
+            PipelineGeometry(pipeline.pipeline_id, pipeline.name, pipeline.coordinates)
+            for pipeline in crud.PipelineCRUD.get_pipelines(db)
+        ]
+    finally:
+        db.close()
+
+
+def objects_layer(index: SpatialIndex, z: int, x: int, y: int, extent: int = mvt.EXTENT) -> mvt.Layer:
+    """Кластеры индекса в тайле (с запасом BUFFER), одиночные - с id объекта"""
+    layer = mvt.Layer("objects", extent)
+    level = index.levels[min(z + TILE_LEVEL_OFFSET, MAX_ZOOM)]
+    n = cells_per_axis(level.level)
+    margin = BUFFER / extent
+    # Ячейки, пересекающие тайл с запасом; точный отбор - по пикселям центроидов
+    x0, x1 = (int(max(value, 0.0) * n / (1 << z)) for value in (x - margin, x + 1 + margin))
+    y0, y1 = (int(max(value, 0.0) * n / (1 << z)) for value in (y - margin, y + 1 + margin))
+    selected = level.cells(x0, min(x1, n - 1), y0, min(y1, n - 1))
+    if not len(selected):
+        return layer
+
+    px, py = tile_pixels(*mercator(level.lat[selected], level.lon[selected]), z, x, y, extent)
+    inside = (px >= -BUFFER) & (px <= extent + BUFFER) & (py >= -BUFFER) & (py <= extent + BUFFER)
+    for i, tx, ty in zip(selected[inside].tolist(), np.rint(px[inside]).astype(np.int64).tolist(),
+                         np.rint(py[inside]).astype(np.int64).tolist()):
+        criticality = CRITICALITY[level.worst[i]] if level.worst[i] >= 0 else None
+        object_id = int(level.object_id[i]) if level.object_id[i] >= 0 else None
+        layer.add_point(tx, ty, {
+            "count": int(level.count[i]),
+            "criticality": criticality,
+            "color": COLORS.get(criticality, COLORS["normal"]),
+            "object_id": object_id
+        }, feature_id=object_id)
+    return layer
+
+
+def pipelines_layer(pipelines: List[PipelineGeometry], z: int, x: int, y: int,
+                    extent: int = mvt.EXTENT) -> mvt.Layer:
+    layer = mvt.Layer("pipelines", extent)
+    scale = float(1 << z)
+    margin = BUFFER / extent
+    tile_bounds = ((x - margin) / scale, (y - margin) / scale, (x + 1 + margin) / scale, (y + 1 + margin) / scale)
+    for pipeline in pipelines:
+        min_x, min_y, max_x, max_y = pipeline.bounds
+        if min_x > tile_bounds[2] or max_x < tile_bounds[0] or min_y > tile_bounds[3] or max_y < tile_bounds[1]:
+            continue
+        px, py = tile_pixels(pipeline.mx, pipeline.my, z, x, y, extent)
+        parts = clip_line(px, py, -BUFFER, extent + BUFFER)
+        layer.add_lines(parts, {"pipeline_id": pipeline.pipeline_id, "name": pipeline.name})
+    return layer
+
+
+class TileService:
+    """Отрисовка тайлов с кэшем, сбрасываемым при смене версии данных"""
+
+    def __init__(self, max_tiles: int):
+        self.cache = TileCache(max_tiles)
+        self._version: Optional[int] = None
+        self._pipelines: Optional[List[PipelineGeometry]] = None
+        self._lock = threading.Lock()
+        data_events.subscribe(data_events.PIPELINES, self._invalidate_pipelines)
+
+    def _invalidate_pipelines(self, topic: str = None):
+        self._pipelines = None
+
+    def pipelines(self) -> List[PipelineGeometry]:
+        pipelines = self._pipelines
+        if pipelines is None:
+            with self._lock:
+                if self._pipelines is None:
+                    self._pipelines = load_pipelines()
+                pipelines = self._pipelines
+        return pipelines
+
+    def render(self, z: int, x: int, y: int) -> bytes:
+        return mvt.encode_tile([
+            pipelines_layer(self.pipelines(), z, x, y),
+            objects_layer(spatial_index.get(), z, x, y)
+        ])
+
+    def get(self, z: int, x: int, y: int) -> Tuple[bytes, int, bool]:
+        """(тайл, версия данных, взят ли из кэша)"""
+        # Версия читается до отрисовки: тайл не может оказаться старше своего ключа
+        version = data_events.data_version()
+        if version != self._version:
+            self.cache.drop_versions_except(version)
+            self._version = version
+        key = (version, z, x, y)
+        data = self.cache.get(key)
+        if data is not None:
+            return data, version, True
+        data = self.render(z, x, y)
+        self.cache.put(key, data)
+        return data, version, False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"data_version": self._version, **self.cache.stats()}
+
+
+tiles = TileService(settings.tile_cache_size)
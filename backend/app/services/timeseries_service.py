@@ -0,0 +1,503 @@
+# backend/app/services/timeseries_service.py
+"""Временные ряды диагностик: агрегаты по дням, месяцам и годам
+
+Таблица diagnostic_rollups хранит на каждый период число диагностик и
+дефектов и count/sum/min/max параметров param1-3: для всего парка по дням,
+месяцам и годам, для трубопровода по месяцам и годам. Остальное считается по
+diagnostics за окно: история объекта - десятки строк по индексу
+(object_id, date), дневной ряд трубопровода - по индексу дат. Хранение этих
+разрезов обновляло бы строку агрегата почти на каждую загруженную диагностику.
+Период, который окно покрывает частично, собирается из целых месяцев и
+оставшихся дней.
+
+Агрегаты обновляются в транзакции записи, как счетчики дашборда: новые
+строки прибавляются к периодам (min/max - через LEAST/GREATEST). При замене
+строк и переносе объекта на другой трубопровод счетчики и суммы уменьшаются
+точно, а min/max вычитанием не пересчитать: такие периоды помечаются stale и
+пересчитываются по diagnostics пачкой перед чтением.
+
+Полная пересборка:
+    python -m app.services.timeseries_service
+"""
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, case, delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.db import dialects
+from app.db.models import Object, Diagnostic, DiagnosticRollup
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ("fleet", "pipeline", "object")
+GRANULARITIES = ("day", "month", "year")
+# Хранимые разрезы и шаги; остальные считаются по diagnostics
+STORED = {
+    "fleet": ("day", "month", "year"),
+    "pipeline": ("month", "year"),
+}
+PERIOD_LENGTH = {"day": 10, "month": 7, "year": 4}
+BUCKETS = {"day": dialects.day_bucket, "month": dialects.month_bucket, "year": dialects.year_bucket}
+
+PARAMS = ("param1", "param2", "param3")
+FIELDS = ["inspections", "defects"] + [f"{param}_{stat}" for param in PARAMS for stat in ("count", "sum", "min", "max")]
+# Поля диагностики, из которых строятся агрегаты
+ROW_FIELDS = ["diag_id", "object_id", "date", "defect_found", *PARAMS]
+
+INITIALIZED = ("meta", "initialized", "", "")
+
+# Размер пачки идентификаторов в IN (...), чтобы не упираться в лимит параметров
+IN_BATCH = 5000
+# Строк на один INSERT при пересборке
+WRITE_BATCH = 10_000
+
+
+def period_of(value, granularity: str) -> str:
+    """Период даты (date или 'YYYY-MM-DD'): 'YYYY-MM-DD', 'YYYY-MM' или 'YYYY'"""
+    return str(value)[:PERIOD_LENGTH[granularity]]
+
+
+def period_bounds(period: str, granularity: str) -> Tuple[date, date]:
+    """Первый и последний день периода"""
+    if granularity == "day":
+        day = date.fromisoformat(period)
+        return day, day
+    if granularity == "month":
+        first = date.fromisoformat(f"{period}-01")
+        following = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return first, following - timedelta(days=1)
+    return date(int(period), 1, 1), date(int(period), 12, 31)
+
+
+def _in_batches(values: Iterable[Any]):
+    values = list(values)
+    for start in range(0, len(values), IN_BATCH):
+        yield values[start:start + IN_BATCH]
+
+
+def _empty() -> Dict[str, Any]:
+    return {field: None if field.endswith(("_min", "_max")) else 0 for field in FIELDS}
+
+
+def _merge(values: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Сложить агрегаты нескольких периодов"""
+    merged = _empty()
+    for value in values:
+        for field in FIELDS:
+            if field.endswith(("_min", "_max")):
+                if value[field] is not None:
+                    pick = min if field.endswith("_min") else max
+                    merged[field] = value[field] if merged[field] is None else pick(merged[field], value[field])
+            else:
+                merged[field] += value[field]
+    return merged
+
+
+def _is_initialized(db: Session) -> bool:
+    return db.get(DiagnosticRollup, INITIALIZED) is not None
+
+
+def aggregate_query(scope: str, granularity: str, keys: Optional[List[str]] = None,
+                    start: Optional[date] = None, end: Optional[date] = None):
+    """Агрегаты по diagnostics: строки (key, period, *FIELDS)"""
+    bucket = BUCKETS[granularity](Diagnostic.date)
+    columns = [
+        func.count(Diagnostic.diag_id).label("inspections"),
+        func.count(case((Diagnostic.defect_found == True, 1))).label("defects"),
+    ]
+    for param in PARAMS:
+        column = getattr(Diagnostic, param)
+        columns += [
+            func.count(column).label(f"{param}_count"),
+            func.coalesce(func.sum(column), 0.0).label(f"{param}_sum"),
+            func.min(column).label(f"{param}_min"),
+            func.max(column).label(f"{param}_max"),
+        ]
+
+    if scope == "object":
+        key = Diagnostic.object_id
+        query = select(key.label("key"), bucket.label("period"), *columns).group_by(key, bucket)
+        if keys is not None:
+            query = query.where(Diagnostic.object_id.in_([int(value) for value in keys]))
+    elif scope == "pipeline":
+        key = Object.pipeline_id
+        query = select(key.label("key"), bucket.label("period"), *columns).join(
+            Object, Object.object_id == Diagnostic.object_id
+        ).group_by(key, bucket)
+        if keys is not None:
+            query = query.where(Object.pipeline_id.in_(keys))
+    else:
+        query = select(literal("").label("key"), bucket.label("period"), *columns).group_by(bucket)
+
+    if start is not None:
+        query = query.where(Diagnostic.date >= start)
+    if end is not None:
+        query = query.where(Diagnostic.date <= end)
+    return query
+
+
+def _row(scope: str, granularity: str, row) -> Dict[str, Any]:
+    return {
+        "scope": scope, "key": str(row.key), "granularity": granularity, "period": row.period,
+        **{field: getattr(row, field) for field in FIELDS}, "stale": False
+    }
+
+
+def _upsert(db: Session, rows: List[Dict[str, Any]], replace: bool = False):
+    """Прибавить агрегаты к периодам (replace=True - записать поверх)"""
+    if not rows:
+        return
+    table = DiagnosticRollup.__table__
+    stmt = dialects.insert(db.bind)(table)
+    excluded = stmt.excluded
+    if replace:
+        set_ = {field: excluded[field] for field in (*FIELDS, "stale")}
+    else:
+        set_ = {"stale": table.c.stale | excluded.stale}
+        for field in FIELDS:
+            if field.endswith("_min"):
+                set_[field] = dialects.least(table.c[field], excluded[field])
+            elif field.endswith("_max"):
+                set_[field] = dialects.greatest(table.c[field], excluded[field])
+            else:
+                set_[field] = table.c[field] + excluded[field]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.scope, table.c.key, table.c.granularity, table.c.period], set_=set_
+    )
+    db.execute(stmt, rows)
+
+
+def _fetch_rows(db: Session, diag_ids: List[int]) -> Dict[str, List[Any]]:
+    """Текущие значения диагностик, которые будут заменены"""
+    columns = {name: [] for name in ROW_FIELDS}
+    # Выгрузки обычно дописывают новые id - такие строки заведомо не существуют
+    max_id = db.execute(select(func.max(Diagnostic.diag_id))).scalar()
+    if max_id is None:
+        return columns
+    diag_ids = [diag_id for diag_id in diag_ids if diag_id <= max_id]
+    for batch in _in_batches(diag_ids):
+        rows = db.execute(
+            select(*(getattr(Diagnostic, name) for name in ROW_FIELDS)).where(Diagnostic.diag_id.in_(batch))
+        ).all()
+        for row in rows:
+            for name, value in zip(ROW_FIELDS, row):
+                columns[name].append(value)
+    return columns
+
+
+def _fetch_pipelines(db: Session, object_ids: Iterable[int]) -> Dict[int, str]:
+    result = {}
+    for batch in _in_batches(object_ids):
+        rows = db.execute(select(Object.object_id, Object.pipeline_id).where(Object.object_id.in_(batch))).all()
+        result.update(dict(rows))
+    return result
+
+
+def _aggregate(frame: "pd.DataFrame", pipelines: Dict[int, str]) -> List[Dict[str, Any]]:
+    """Дельты периодов по строкам со знаком (+1 - новая строка, -1 - заменяемая)"""
+    import pandas as pd
+
+    sign = frame["sign"]
+    added = sign > 0
+    dates = frame["date"].astype(str)
+    data = {
+        "fleet": "",
+        "pipeline": frame["object_id"].map(pipelines),
+        "inspections": sign,
+        "defects": frame["defect_found"].eq(True) * sign,
+        # min/max по заменяемым строкам не вычесть: их периоды помечаются stale
+        "stale": ~added,
+    }
+    for granularity in GRANULARITIES:
+        data[granularity] = dates.str[:PERIOD_LENGTH[granularity]]
+    for param in PARAMS:
+        values = pd.to_numeric(frame[param], errors="coerce")
+        data[f"{param}_count"] = values.notna() * sign
+        data[f"{param}_sum"] = values.fillna(0.0) * sign
+        data[f"{param}_min"] = data[f"{param}_max"] = values.where(added)
+    frame = pd.DataFrame(data, index=frame.index)
+
+    aggregations = {
+        field: "min" if field.endswith("_min") else "max" if field.endswith("_max") else "sum"
+        for field in FIELDS
+    }
+    aggregations["stale"] = "any"
+    rows = []
+    for scope, granularities in STORED.items():
+        # Диагностики объектов, которых еще нет в БД, в разрез трубопровода не попадают
+        scoped = frame[frame["pipeline"].notna()] if scope == "pipeline" else frame
+        for granularity in granularities:
+            grouped = scoped.groupby([scope, granularity], sort=False).agg(aggregations)
+            columns = [grouped.index.get_level_values(0).tolist(), grouped.index.get_level_values(1).tolist()]
+            for field in (*FIELDS, "stale"):
+                values = grouped[field]
+                columns.append(values.astype(object).where(values.notna(), None).tolist())
+            names = ["key", "period", *FIELDS, "stale"]
+            rows += [
+                {"scope": scope, "granularity": granularity, **dict(zip(names, values))}
+                for values in zip(*columns)
+            ]
+    return rows
+
+
+def record_diagnostics(db: Session, columns: Dict[str, List[Any]]):
+    """Учесть вставку/замену диагностик; вызывать до записи строк в БД"""
+    if not columns["diag_id"] or not _is_initialized(db):
+        return
+    import pandas as pd
+
+    size = len(columns["diag_id"])
+    new = pd.DataFrame({name: columns.get(name, [None] * size) for name in ROW_FIELDS})
+    # Повторяющиеся id запишутся последней строкой (так их запишет upsert)
+    new = new.drop_duplicates("diag_id", keep="last")
+    old = _fetch_rows(db, new["diag_id"].tolist())
+    pipelines = _fetch_pipelines(db, set(new["object_id"].tolist()) | set(old["object_id"]))
+    frame = new.assign(sign=1)
+    if old["diag_id"]:
+        frame = pd.concat([frame, pd.DataFrame(old).assign(sign=-1)], ignore_index=True)
+    _upsert(db, _aggregate(frame, pipelines))
+
+
+def _mark_moved(db: Session, moved: Dict[int, Tuple[Optional[str], Optional[str]]]):
+    """Объекты сменили трубопровод (None - объекта нет): их периоды в обоих разрезах - stale"""
+    buckets = set()
+    for batch in _in_batches(moved):
+        days = db.execute(
+            select(Diagnostic.object_id, Diagnostic.date).where(Diagnostic.object_id.in_(batch)).distinct()
+        ).all()
+        for object_id, day in days:
+            for pipeline in moved[object_id]:
+                if pipeline is None:
+                    continue
+                for granularity in STORED["pipeline"]:
+                    buckets.add((pipeline, granularity, period_of(day, granularity)))
+    _upsert(db, [
+        {"scope": "pipeline", "key": pipeline, "granularity": granularity, "period": period, **_empty(), "stale": True}
+        for pipeline, granularity, period in buckets
+    ])
+
+
+def record_objects(db: Session, columns: Dict[str, List[Any]]):
+    """Учесть вставку/замену объектов; вызывать до записи строк в БД"""
+    if not columns["object_id"] or not _is_initialized(db):
+        return
+    new = dict(zip(columns["object_id"], columns["pipeline_id"]))
+    old = _fetch_pipelines(db, new)
+    # Новый объект тоже "переезжает": его диагностики могли быть загружены раньше него
+    moved = {object_id: (old.get(object_id), pipeline) for object_id, pipeline in new.items() if old.get(object_id) != pipeline}
+    _mark_moved(db, moved)
+
+
+def forget_object(db: Session, object_id: int):
+    """Учесть удаление объекта; вызывать до удаления строки"""
+    if not _is_initialized(db):
+        return
+    old = _fetch_pipelines(db, [object_id])
+    if object_id in old:
+        _mark_moved(db, {object_id: (old[object_id], None)})
+
+
+def refresh_stale(db: Session) -> int:
+    """Пересчитать помеченные периоды по diagnostics; вернуть их число"""
+    table = DiagnosticRollup.__table__
+    stale = db.execute(
+        select(table.c.scope, table.c.key, table.c.granularity, table.c.period).where(table.c.stale == True)
+    ).all()
+    groups = defaultdict(set)
+    for scope, key, granularity, period in stale:
+        groups[(scope, granularity)].add((key, period))
+
+    for (scope, granularity), buckets in groups.items():
+        first = min(period_bounds(period, granularity)[0] for _, period in buckets)
+        last = max(period_bounds(period, granularity)[1] for _, period in buckets)
+        keys = sorted({key for key, _ in buckets})
+        found = []
+        for batch in _in_batches(keys) if scope != "fleet" else [None]:
+            for row in db.execute(aggregate_query(scope, granularity, batch, first, last)):
+                if (str(row.key), row.period) in buckets:
+                    found.append(_row(scope, granularity, row))
+        _upsert(db, found, replace=True)
+        # Период, где строк не осталось, удаляется
+        emptied = buckets - {(row["key"], row["period"]) for row in found}
+        if emptied:
+            db.execute(
+                delete(table).where(
+                    table.c.scope == scope, table.c.granularity == granularity,
+                    table.c.key == bindparam("rollup_key"), table.c.period == bindparam("rollup_period")
+                ),
+                [{"rollup_key": key, "rollup_period": period} for key, period in emptied]
+            )
+    if stale:
+        logger.info(f"Пересчитано периодов временных рядов: {len(stale)}")
+    return len(stale)
+
+
+def rebuild(db: Session):
+    """Пересчитать все агрегаты с нуля по таблицам objects и diagnostics"""
+    table = DiagnosticRollup.__table__
+    db.execute(delete(table))
+    total = 0
+    for scope, granularities in STORED.items():
+        # Таблица читается один раз по самому мелкому шагу, крупные складываются из него
+        finest, coarser = granularities[0], granularities[1:]
+        rolled = {granularity: defaultdict(list) for granularity in coarser}
+        for rows in db.execute(aggregate_query(scope, finest)).partitions(WRITE_BATCH):
+            batch = [_row(scope, finest, row) for row in rows]
+            db.execute(insert(table), batch)
+            for row in batch:
+                for granularity in coarser:
+                    rolled[granularity][(row["key"], period_of(row["period"], granularity))].append(row)
+            total += len(batch)
+        for granularity, periods in rolled.items():
+            batch = [
+                {"scope": scope, "key": key, "granularity": granularity, "period": period, **_merge(values), "stale": False}
+                for (key, period), values in periods.items()
+            ]
+            for start in range(0, len(batch), WRITE_BATCH):
+                db.execute(insert(table), batch[start:start + WRITE_BATCH])
+            total += len(batch)
+    scope, key, granularity, period = INITIALIZED
+    db.execute(insert(table), [{"scope": scope, "key": key, "granularity": granularity, "period": period, **_empty()}])
+    logger.info(f"Временные ряды пересобраны: {total} периодов")
+
+
+def initialize(db: Session) -> bool:
+    """Собрать агрегаты, если их еще нет; вызывается при старте (main.startup), не из запросов"""
+    if _is_initialized(db):
+        return False
+    rebuild(db)
+    db.commit()
+    return True
+
+
+def prepare(db: Session) -> bool:
+    """Пересчитать устаревшие периоды; False - агрегаты не собраны, отвечать по diagnostics"""
+    if not _is_initialized(db):
+        return False
+    if refresh_stale(db):
+        db.commit()
+    return True
+
+
+def _values(row) -> Dict[str, Any]:
+    return {field: getattr(row, field) for field in FIELDS}
+
+
+def _point(period: str, values: Dict[str, Any]) -> Dict[str, Any]:
+    inspections, defects = values["inspections"], values["defects"]
+    point = {
+        "period": period,
+        "inspections": inspections,
+        "defects": defects,
+        "defect_rate": round(defects / inspections * 100, 1) if inspections else 0.0,
+    }
+    for param in PARAMS:
+        count = values[f"{param}_count"]
+        point[param] = {
+            "count": count,
+            "mean": values[f"{param}_sum"] / count if count else None,
+            "min": values[f"{param}_min"],
+            "max": values[f"{param}_max"],
+        }
+    return point
+
+
+def _stored(db: Session, scope: str, key: str, granularity: str, first: str, last: str) -> Dict[str, Dict[str, Any]]:
+    """Хранимые агрегаты периодов first..last: период -> значения"""
+    table = DiagnosticRollup.__table__
+    query = select(table).where(table.c.scope == scope, table.c.key == key, table.c.granularity == granularity)
+    if first is not None:
+        query = query.where(table.c.period >= first)
+    if last is not None:
+        query = query.where(table.c.period <= last)
+    return {row.period: _values(row) for row in db.execute(query)}
+
+
+def _scan(db: Session, scope: str, key: str, granularity: str,
+          start: Optional[date], end: Optional[date]) -> Dict[str, Dict[str, Any]]:
+    """Агрегаты по diagnostics за окно [start, end], отсеченное по дате точно"""
+    rows = db.execute(aggregate_query(scope, granularity, None if scope == "fleet" else [key], start, end))
+    return {row.period: _values(row) for row in rows}
+
+
+def _window(db: Session, scope: str, key: str, first: date, last: date) -> Dict[str, Any]:
+    """Сумма агрегатов за дни [first, last]: целые месяцы из таблицы, остаток по diagnostics"""
+    if "day" in STORED.get(scope, ()):
+        return _merge(_stored(db, scope, key, "day", first.isoformat(), last.isoformat()).values())
+    month_start = first if first.day == 1 else period_bounds(period_of(first, "month"), "month")[1] + timedelta(days=1)
+    month_end = last if last == period_bounds(period_of(last, "month"), "month")[1] else last.replace(day=1) - timedelta(days=1)
+    if scope not in STORED or month_start > month_end:
+        return _merge(_scan(db, scope, key, "year", first, last).values())
+    parts = list(_stored(db, scope, key, "month", period_of(month_start, "month"), period_of(month_end, "month")).values())
+    if first < month_start:
+        parts += _scan(db, scope, key, "year", first, month_start - timedelta(days=1)).values()
+    if last > month_end:
+        parts += _scan(db, scope, key, "year", month_end + timedelta(days=1), last).values()
+    return _merge(parts)
+
+
+def _partial_periods(granularity: str, start: Optional[date], end: Optional[date]) -> Dict[str, Tuple[date, date]]:
+    """Крайние периоды, которые окно покрывает не целиком: период -> покрытые дни"""
+    partial = {}
+    if start is not None:
+        first, last = period_bounds(period_of(start, granularity), granularity)
+        if start > first:
+            partial[period_of(start, granularity)] = (start, last if end is None else min(last, end))
+    if end is not None:
+        first, last = period_bounds(period_of(end, granularity), granularity)
+        if end < last:
+            partial[period_of(end, granularity)] = (first if start is None else max(first, start), end)
+    return partial
+
+
+def query_range(db: Session, scope: str, key: Optional[str], granularity: str,
+                start: Optional[date] = None, end: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Ряд за окно [start, end] с шагом granularity; периоды без диагностик пропускаются
+
+    Крайний период, попавший в окно частично, считается только за попавшие дни.
+    """
+    if scope not in SCOPES:
+        raise ValueError(f"Неизвестный разрез: {scope} (допустимо: {', '.join(SCOPES)})")
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Неизвестный шаг: {granularity} (допустимо: {', '.join(GRANULARITIES)})")
+    if scope == "fleet":
+        key = ""
+    elif not key:
+        raise ValueError(f"Для разреза {scope} нужен key")
+    elif scope == "object" and not key.isdigit():
+        raise ValueError("key разреза object - идентификатор объекта")
+    if start is not None and end is not None and start > end:
+        raise ValueError("start позже end")
+
+    if not prepare(db) or granularity not in STORED.get(scope, ()):
+        # Не хранимый разрез: объект по индексу (object_id, date), дни трубопровода по индексу дат;
+        # до сборки агрегатов - так же, точным подсчетом за окно
+        points = _scan(db, scope, key, granularity, start, end)
+    else:
+        points = _stored(
+            db, scope, key, granularity,
+            period_of(start, granularity) if start else None, period_of(end, granularity) if end else None
+        )
+        for period, (first, last) in _partial_periods(granularity, start, end).items():
+            points[period] = _window(db, scope, key, first, last)
+    return [_point(period, values) for period, values in sorted(points.items()) if values["inspections"]]
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal, engine
+    from app.db.migrations import upgrade
+
+    upgrade(engine)
+    db = SessionLocal()
+    try:
+        rebuild(db)
+        db.commit()
+        print("Временные ряды пересобраны")
+    finally:
+        db.close()
@@ -0,0 +1,269 @@
+# backend/app/services/upload_service.py
+"""Загрузка больших CSV частями с возобновлением
+
+Клиент открывает загрузку, указав размер и SHA-256 файла, и отправляет части
+по смещению. Части дописываются в файл в upload_dir/sessions, поэтому принятый
+объем - это размер файла на диске: после обрыва связи или перезапуска сервера
+клиент узнает смещение и продолжает с него. Повторно присланная часть не
+меняет файл. Открытие загрузки с хэшем уже загруженного файла ничего не
+делает, с хэшем незавершенной - возвращает ее для продолжения.
+
+После завершения фоновая задача проверяет хэш и потоково загружает файл в БД.
+При нескольких воркерах части одной загрузки пишутся по очереди под flock
+файла, а задачу загрузки в БД запускает только воркер, условным UPDATE
+захвативший загрузку; ее состояние остальные читают из таблицы jobs.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import Upload, UploadStatus
+from app.services import import_service
+from app.services.job_service import FINISHED, Job, jobs
+
+try:
+    import fcntl
+except ImportError:  # Windows: только блокировка между потоками одного процесса
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SHA256 = re.compile(r"^[0-9a-f]{64}$")
+HASH_BLOCK = 1024 * 1024
+
+# Запись частей одной загрузки выполняется по очереди (между процессами - flock в _staged)
+_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+
+class UploadConflict(ValueError):
+    """Часть пришла не с того смещения: expected - сколько байт уже принято"""
+
+    def __init__(self, expected: int):
+        self.expected = expected
+        super().__init__(f"Ожидается часть со смещения {expected}")
+
+
+def sessions_dir() -> str:
+    return os.path.join(settings.upload_dir, "sessions")
+
+
+def staged_path(upload_id: str) -> str:
+    return os.path.join(sessions_dir(), f"{upload_id}.csv")
+
+
+def received(upload_id: str) -> int:
+    try:
+        return os.path.getsize(staged_path(upload_id))
+    except FileNotFoundError:
+        return 0
+
+
+@contextmanager
+def _staged(upload_id: str) -> Iterator[BinaryIO]:
+    """Собираемый файл под исключительной блокировкой: потоки и воркеры пишут по очереди"""
+    with _locks[upload_id], open(staged_path(upload_id), "r+b") as target:
+        if fcntl is not None:
+            fcntl.flock(target.fileno(), fcntl.LOCK_EX)
+        yield target
+
+
+def open_upload(db: Session, filename: str, size: int, sha256: str) -> Tuple[Upload, bool]:
+    """Открыть загрузку или найти прежнюю с тем же хэшем; (загрузка, создана ли новая)"""
+    sha256 = sha256.lower()
+    if not SHA256.match(sha256):
+        raise ValueError("sha256 должен состоять из 64 шестнадцатеричных символов")
+    if size <= 0 or size > settings.chunked_upload_max_size:
+        raise ValueError(f"Размер файла должен быть от 1 до {settings.chunked_upload_max_size} байт")
+
+    existing = db.scalars(
+        select(Upload).where(Upload.sha256 == sha256, Upload.size == size).order_by(Upload.created_at.desc())
+    ).all()
+    for status in (UploadStatus.DONE, UploadStatus.INGESTING, UploadStatus.UPLOADING, UploadStatus.FAILED):
+        for upload in existing:
+            if upload.status == status:
+                return upload, False
+
+    upload = Upload(
+        upload_id=uuid.uuid4().hex, filename=filename, size=size, sha256=sha256,
+        status=UploadStatus.UPLOADING, created_at=datetime.now()
+    )
+    os.makedirs(sessions_dir(), exist_ok=True)
+    open(staged_path(upload.upload_id), "wb").close()
+    db.add(upload)
+    db.commit()
+    logger.info(f"Открыта загрузка {upload.upload_id}: {filename}, {size} байт")
+    return upload, True
+
+
+def append_chunk(upload: Upload, offset: int, data: bytes) -> int:
+    """Дописать часть со смещения offset; вернуть, сколько байт принято"""
+    if upload.status not in (UploadStatus.UPLOADING, UploadStatus.FAILED):
+        raise UploadConflict(upload.size)
+    with _staged(upload.upload_id) as target:
+        current = os.fstat(target.fileno()).st_size
+        end = offset + len(data)
+        if offset < 0 or offset > current:
+            raise UploadConflict(current)
+        if end > upload.size:
+            raise ValueError(f"Часть выходит за объявленный размер файла ({upload.size} байт)")
+        if end > current:
+            # Уже принятое начало части (повтор после обрыва) пропускается
+            target.seek(current)
+            target.write(memoryview(data)[current - offset:])
+            current = end
+        return current
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _job(upload: Upload) -> Optional[Job]:
+    """Задача загрузки в БД, в каком бы воркере она ни выполнялась"""
+    return jobs.get(upload.job_id) if upload.job_id else None
+
+
+def _ingest_running(upload: Upload) -> bool:
+    job = _job(upload)
+    return job is not None and job.status not in FINISHED
+
+
+def complete(db: Session, upload: Upload) -> Upload:
+    """Файл принят целиком: поставить загрузку в БД фоновой задачей"""
+    if upload.status == UploadStatus.DONE:
+        return upload
+    if upload.status == UploadStatus.INGESTING and _ingest_running(upload):
+        return upload
+    current = received(upload.upload_id)
+    if current != upload.size:
+        raise UploadConflict(current)
+
+    # Задача регистрируется до захвата: другой воркер сразу видит ее выполняющейся.
+    # Захват - условный UPDATE по прежним статусу и задаче: из воркеров,
+    # одновременно завершающих одну загрузку, задачу запускает один.
+    job = jobs.create("upload_ingest")
+    claimed = db.execute(
+        update(Upload).where(
+            Upload.upload_id == upload.upload_id, Upload.status == upload.status, Upload.job_id == upload.job_id
+        ).values(status=UploadStatus.INGESTING, job_id=job.id, error=None)
+    ).rowcount
+    # Статус фиксируется до запуска задачи: иначе он затер бы уже записанный ею итог
+    db.commit()
+    if not claimed:
+        jobs.cancel(job.id)
+    else:
+        jobs.start(job, ingest_upload, upload.upload_id)
+    db.refresh(upload)
+    return upload
+
+
+def _finish(job: Job, upload_id: str, status: UploadStatus, result: Dict[str, Any] = None, error: str = None):
+    db = SessionLocal()
+    try:
+        upload = db.get(Upload, upload_id)
+        # Загрузку отменили, пока шла задача, или ее уже перезапустила другая задача
+        if upload is None or upload.job_id != job.id:
+            return
+        upload.status = status
+        upload.result = result
+        upload.error = error
+        upload.completed_at = datetime.now() if status == UploadStatus.DONE else None
+        db.commit()
+    finally:
+        db.close()
+
+
+def ingest_upload(job: Job, upload_id: str) -> Dict[str, Any]:
+    """Фоновая задача: проверить хэш собранного файла и загрузить его в БД"""
+    db = SessionLocal()
+    try:
+        upload = db.get(Upload, upload_id)
+        size, sha256 = upload.size, upload.sha256
+    finally:
+        db.close()
+
+    path = staged_path(upload_id)
+    job.update(progress=0.0, message="Проверка SHA-256")
+    if file_sha256(path) != sha256:
+        # Части испорчены: принятое сбрасывается, клиент отправляет файл заново
+        with _staged(upload_id) as target:
+            target.truncate(0)
+        _finish(job, upload_id, UploadStatus.UPLOADING, error="SHA-256 собранного файла не совпадает с объявленным")
+        raise ValueError("SHA-256 собранного файла не совпадает с объявленным")
+
+    job.update(message="Загрузка в БД")
+    db = SessionLocal()
+    try:
+        with open(path, "rb") as source:
+            def progress(rows: int):
+                job.update(progress=source.tell() / size, message=f"Загружено строк: {rows}")
+
+            stats = import_service.ingest_csv(db, source, skip_invalid=True, on_chunk=progress)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        _finish(job, upload_id, UploadStatus.FAILED, error=str(e) or "Загрузка отменена")
+        raise
+    finally:
+        db.close()
+
+    # Файл больше не нужен: повтор той же загрузки отсекается по хэшу
+    if os.path.exists(path):
+        os.remove(path)
+    _finish(job, upload_id, UploadStatus.DONE, result=stats)
+    logger.info(f"Загрузка {upload_id} завершена: {stats['rows_processed']} строк")
+    return stats
+
+
+def cancel(db: Session, upload: Upload) -> bool:
+    """Прервать загрузку и удалить принятые части; завершенная остается для проверки повторов"""
+    if upload.status == UploadStatus.DONE:
+        return False
+    if upload.job_id:
+        # Задачу другого воркера отменит ее исполнитель
+        jobs.cancel(upload.job_id)
+    if os.path.exists(staged_path(upload.upload_id)):
+        with _staged(upload.upload_id):
+            os.remove(staged_path(upload.upload_id))
+    db.delete(upload)
+    db.commit()
+    return True
+
+
+def describe(upload: Upload) -> Dict[str, Any]:
+    job = _job(upload)
+    status = upload.status
+    error = upload.error
+    if status == UploadStatus.INGESTING and upload.job_id and (job is None or job.status in FINISHED):
+        # Задача не выполняется ни в одном воркере (процесс остановлен): файл на месте,
+        # загрузку можно завершить заново
+        status, error = UploadStatus.FAILED, job.error if job is not None else "Загрузка прервана перезапуском сервера"
+    return {
+        "upload_id": upload.upload_id,
+        "filename": upload.filename,
+        "size": upload.size,
+        "sha256": upload.sha256,
+        "status": status.value,
+        "received": upload.size if status == UploadStatus.DONE else received(upload.upload_id),
+        "job": job.to_dict() if job is not None else None,
+        "result": upload.result,
+        "error": error,
+        "created_at": upload.created_at.isoformat(),
+        "completed_at": upload.completed_at.isoformat() if upload.completed_at else None,
+    }
@@ -0,0 +1,42 @@
+# backend/app/utils/fast_json.py
+"""Быстрая сериализация JSON: orjson, если установлен, иначе стандартный json
+
+FastJSONResponse, возвращенный из эндпоинта, FastAPI отдает как есть - без
+jsonable_encoder и повторного кодирования.
+"""
+import json
+from datetime import date, datetime
+from typing import Any
+
+import numpy as np
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    # Как OPT_SERIALIZE_NUMPY у orjson: скаляры и массивы numpy
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        # Ключи-числа (например, номера лет) как в стандартном json
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
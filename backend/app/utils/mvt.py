@@ -0,0 +1,125 @@
+# backend/app/utils/mvt.py
+"""Минимальный кодировщик Mapbox Vector Tile 2.1 (protobuf) без зависимостей
+
+Поддерживаются точки и линии, свойства - строки, целые и числа с плавающей
+точкой. Координаты - целые пиксели тайла в диапазоне [0, extent).
+"""
+import struct
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+EXTENT = 4096
+
+POINT = 1
+LINESTRING = 2
+
+MOVE_TO = 1
+LINE_TO = 2
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field: int, data: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(data)) + data
+
+
+def _packed(field: int, values: Sequence[int]) -> bytes:
+    return _bytes_field(field, b"".join(_varint(value) for value in values))
+
+
+def _command(command: int, count: int) -> int:
+    return (command & 0x7) | (count << 3)
+
+
+def _encode_value(value: Any) -> bytes:
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return _key(5, 0) + _varint(value)
+        return _key(6, 0) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack("<d", value)
+    return _bytes_field(1, str(value).encode("utf-8"))
+
+
+class Layer:
+    """Слой тайла: признаки копятся, ключи и значения свойств дедуплицируются"""
+
+    def __init__(self, name: str, extent: int = EXTENT):
+        self.name = name
+        self.extent = extent
+        self.keys: Dict[str, int] = {}
+        self.values: Dict[Tuple[type, Any], int] = {}
+        self.features: List[bytes] = []
+
+    def __len__(self):
+        return len(self.features)
+
+    def _tags(self, properties: Dict[str, Any]) -> List[int]:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            tags.append(self.keys.setdefault(key, len(self.keys)))
+            # Тип в ключе: 1 и True - разные значения
+            tags.append(self.values.setdefault((type(value), value), len(self.values)))
+        return tags
+
+    def _add(self, geom_type: int, geometry: List[int], properties: Dict[str, Any], feature_id: Optional[int]):
+        data = b""
+        if feature_id is not None:
+            data += _key(1, 0) + _varint(feature_id)
+        tags = self._tags(properties)
+        if tags:
+            data += _packed(2, tags)
+        data += _key(3, 0) + _varint(geom_type) + _packed(4, geometry)
+        self.features.append(data)
+
+    def add_point(self, x: int, y: int, properties: Dict[str, Any], feature_id: Optional[int] = None):
+        self._add(POINT, [_command(MOVE_TO, 1), _zigzag(x), _zigzag(y)], properties, feature_id)
+
+    def add_lines(self, parts: Sequence[Sequence[Tuple[int, int]]], properties: Dict[str, Any],
+                  feature_id: Optional[int] = None):
+        """Линия или мультилиния: каждая часть - не меньше двух различных точек"""
+        geometry = []
+        cx = cy = 0
+        for part in parts:
+            if len(part) < 2:
+                continue
+            (x, y), rest = part[0], part[1:]
+            geometry += [_command(MOVE_TO, 1), _zigzag(x - cx), _zigzag(y - cy)]
+            cx, cy = x, y
+            geometry.append(_command(LINE_TO, len(rest)))
+            for x, y in rest:
+                geometry += [_zigzag(x - cx), _zigzag(y - cy)]
+                cx, cy = x, y
+        if geometry:
+            self._add(LINESTRING, geometry, properties, feature_id)
+
+    def encode(self) -> bytes:
+        data = _key(15, 0) + _varint(2) + _bytes_field(1, self.name.encode("utf-8"))
+        data += b"".join(_bytes_field(2, feature) for feature in self.features)
+        data += b"".join(_bytes_field(3, key.encode("utf-8")) for key in self.keys)
+        data += b"".join(_bytes_field(4, _encode_value(value)) for _, value in self.values)
+        data += _key(5, 0) + _varint(self.extent)
+        return data
+
+
+def encode_tile(layers: Sequence[Layer]) -> bytes:
+    """Тайл из непустых слоев"""
+    return b"".join(_bytes_field(3, layer.encode()) for layer in layers if len(layer))
@@ -0,0 +1,26 @@
+# backend/app/utils/pagination.py
+"""Непрозрачные курсоры для keyset-пагинации"""
+import base64
+import json
+from typing import Any, Dict
+
+# Предел limit в режиме курсора; режим смещения принимает limit как раньше
+MAX_PAGE = 10000
+
+
+def encode_cursor(kind: str, **position: Any) -> str:
+    """Позиция последней строки страницы -> токен продолжения"""
+    payload = json.dumps({"k": kind, **position}, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, kind: str) -> Dict[str, Any]:
+    """Токен -> позиция; ValueError, если токен поврежден или от другого списка"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Некорректный курсор")
+    if not isinstance(position, dict) or position.pop("k", None) != kind:
+        raise ValueError("Курсор относится к другому списку")
+    return position
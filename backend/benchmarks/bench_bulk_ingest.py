@@ -0,0 +1,60 @@
+# backend/benchmarks/bench_bulk_ingest.py
+"""Бенчмарк пакетной загрузки: последовательно по файлам против пула разбора
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_bulk_ingest [файлов] [строк_в_файле]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from app.services import bulk_import_service, import_service
+from benchmarks.bench_ingest import write_diagnostics_csv
+from benchmarks.common import make_engine
+
+
+def sequential(paths, session_factory):
+    """Прежнее поведение /upload/bulk: файл за файлом, разбор и запись в одном потоке"""
+    for _, path in paths:
+        db = session_factory()
+        try:
+            with open(path, "rb") as source:
+                import_service.ingest_csv(db, source)
+            db.commit()
+        finally:
+            db.close()
+
+
+def run(n_files: int, n_rows: int):
+    workdir = tempfile.mkdtemp(prefix="integrity_bulk_")
+    paths = []
+    for i in range(n_files):
+        path = os.path.join(workdir, f"region_{i:02d}.csv")
+        write_diagnostics_csv(path, n_rows, seed=i, first_id=i * n_rows + 1)
+        paths.append((os.path.basename(path), path))
+    total_rows = n_files * n_rows
+    print(f"Файлов: {n_files} x {n_rows} строк, ядер: {os.cpu_count()}")
+
+    variants = [("последовательно", None)] + [
+        (f"пакетно, процессов: {workers}", workers) for workers in sorted({1, 2, bulk_import_service.worker_count()})
+    ]
+    for name, workers in variants:
+        engine, session_factory = make_engine()
+        bulk_import_service.SessionLocal = session_factory
+        started = time.perf_counter()
+        if workers is None:
+            sequential(paths, session_factory)
+        else:
+            bulk_import_service.ingest_files(paths, workers=workers)
+        elapsed = time.perf_counter() - started
+        bulk_import_service.shutdown()
+        engine.dispose()
+        print(f"  {name:<24} {elapsed:7.2f} с  {total_rows / elapsed:10.0f} строк/с")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    )
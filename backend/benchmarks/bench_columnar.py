@@ -0,0 +1,57 @@
+# backend/benchmarks/bench_columnar.py
+"""Бенчмарк столбцовой выдачи диагностик: JSON против Arrow IPC и Parquet
+
+Для каждого формата - время формирования ответа на сервере, размер и время
+загрузки в pandas.DataFrame на клиенте.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_columnar [объектов]
+"""
+import io
+import json
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.db import crud
+from app.services import columnar_service
+from app.utils.fast_json import dumps
+from benchmarks.common import make_engine, populate, timed
+
+
+def run(n_objects: int):
+    engine, session_factory = make_engine()
+    populate(engine, n_objects, diags_per_object=5)
+    columnar_service.SessionLocal = session_factory
+    db = session_factory()
+
+    def json_body():
+        return dumps(crud.DiagnosticCRUD.get_diagnostic_rows(db, limit=None))
+
+    def columnar_body(fmt):
+        return b"".join(columnar_service.stream_table("diagnostics", fmt, {}))
+
+    cases = [
+        ("json", json_body, lambda body: pd.DataFrame(json.loads(body))),
+        ("arrow", lambda: columnar_body("arrow"), lambda body: pa.ipc.open_stream(body).read_pandas()),
+        ("parquet", lambda: columnar_body("parquet"), lambda body: pq.read_table(io.BytesIO(body)).to_pandas()),
+    ]
+    print(f"Диагностик: {n_objects * 5}\n")
+    print(f"{'format':>8} | {'server ms':>9} | {'MB':>7} | {'client ms':>9} | {'frame MB':>8}")
+    try:
+        for name, produce, load in cases:
+            server_time, body = timed(produce, repeat=1)
+            client_time, frame = timed(load, body, repeat=3)
+            print(
+                f"{name:>8} | {server_time * 1000:>9.0f} | {len(body) / 2 ** 20:>7.1f} | "
+                f"{client_time * 1000:>9.0f} | {frame.memory_usage(deep=True).sum() / 2 ** 20:>8.1f}"
+            )
+    finally:
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
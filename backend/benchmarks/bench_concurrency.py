@@ -0,0 +1,76 @@
+# backend/benchmarks/bench_concurrency.py
+"""Бенчмарк задержки /api/objects/ во время загрузки большого CSV
+
+Сравнивает загрузку прямо на event loop (как было раньше) с загрузкой в пуле
+потоков. Запуск из каталога backend:
+    python -m benchmarks.bench_concurrency [число_строк]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# БД бенчмарка задается до импорта приложения: движок создается из настроек
+_workdir = tempfile.mkdtemp(prefix="integrity_concurrency_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'bench.db')}"
+
+import httpx
+from fastapi import File, UploadFile
+
+from app.api.endpoints.upload import ingest_file
+from app.main import app
+from benchmarks.bench_ingest import write_diagnostics_csv
+
+
+@app.post("/bench/inline-upload")
+async def inline_upload(file: UploadFile = File(...)):
+    """Прежнее поведение: блокирующая загрузка прямо в корутине"""
+    return ingest_file(file.file)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def measure(client, upload_path: str, csv_bytes: bytes):
+    latencies = []
+    upload = asyncio.create_task(
+        client.post(upload_path, files={"file": ("diagnostics.csv", csv_bytes, "text/csv")})
+    )
+    # Даем загрузке стартовать
+    await asyncio.sleep(0)
+    while not upload.done():
+        started = time.perf_counter()
+        response = await client.get("/api/objects/", params={"limit": 50})
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+        await asyncio.sleep(0.005)
+    response = await upload
+    assert response.status_code == 200, response.text
+    return latencies
+
+
+async def run(n_rows: int):
+    csv_path = os.path.join(_workdir, "diagnostics.csv")
+    write_diagnostics_csv(csv_path, n_rows)
+    with open(csv_path, "rb") as f:
+        csv_bytes = f.read()
+
+    # ASGITransport не запускает lifespan: миграции и остановка - через контекст приложения
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"Загрузка {n_rows} строк, параллельно GET /api/objects/")
+        print(f"{'mode':>10} | {'requests':>8} | {'p50 ms':>8} | {'p99 ms':>9} | {'max ms':>9}")
+        for mode, path in (("inline", "/bench/inline-upload"), ("threadpool", "/api/upload/")):
+            latencies = await measure(client, path, csv_bytes)
+            print(
+                f"{mode:>10} | {len(latencies):>8} | {percentile(latencies, 0.5) * 1000:>8.1f} | "
+                f"{percentile(latencies, 0.99) * 1000:>9.1f} | {max(latencies) * 1000:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 300_000))
@@ -0,0 +1,70 @@
+# backend/benchmarks/bench_export.py
+"""Бенчмарк потоковой выгрузки диагностик: строк в секунду и пиковая память (RSS)
+
+Каждый формат выгружается в отдельном процессе, чтобы пик RSS относился
+только к выгрузке. Запуск из каталога backend:
+    python -m benchmarks.bench_export [число_строк]
+"""
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+
+from app.services import import_service
+from benchmarks.bench_ingest import write_diagnostics_csv
+from benchmarks.common import make_engine
+
+
+def _rss_mb() -> float:
+    # ru_maxrss в Linux - килобайты
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def export_worker(fmt: str, queue):
+    """Выгрузка в отдельном процессе (DATABASE_URL задан родителем до запуска)"""
+    from app.services import export_service
+
+    baseline = _rss_mb()
+    stats = {}
+    size = 0
+    for chunk in export_service.export_diagnostics(fmt, {}, stats=stats):
+        size += len(chunk)
+    queue.put({**stats, "bytes": size, "baseline_mb": baseline, "peak_mb": _rss_mb()})
+
+
+def run(n_rows: int):
+    workdir = tempfile.mkdtemp(prefix="integrity_export_")
+    csv_path = os.path.join(workdir, "diagnostics.csv")
+    write_diagnostics_csv(csv_path, n_rows)
+
+    engine, session_factory = make_engine()
+    db = session_factory()
+    try:
+        with open(csv_path, "rb") as source:
+            import_service.ingest_csv(db, source)
+        db.commit()
+    finally:
+        db.close()
+    # Дочерние процессы импортируют приложение заново и читают DATABASE_URL из окружения
+    os.environ["DATABASE_URL"] = engine.url.render_as_string(hide_password=False)
+    engine.dispose()
+    os.remove(csv_path)
+
+    context = multiprocessing.get_context("spawn")
+    print(f"Выгрузка {n_rows} строк")
+    print(f"{'format':>8} | {'rows/s':>9} | {'MB':>8} | {'RSS base MB':>11} | {'RSS peak MB':>11}")
+    for fmt in ("ndjson", "csv", "parquet"):
+        queue = context.Queue()
+        process = context.Process(target=export_worker, args=(fmt, queue))
+        process.start()
+        result = queue.get()
+        process.join()
+        print(
+            f"{fmt:>8} | {result['rows_per_second']:>9.0f} | {result['bytes'] / 1024 / 1024:>8.1f} | "
+            f"{result['baseline_mb']:>11.1f} | {result['peak_mb']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000)
@@ -0,0 +1,64 @@
+# backend/benchmarks/bench_forecast.py
+"""Бенчмарк прогноза деградации: векторная подгонка трендов против цикла по объектам
+
+Строит парк (populate), подгоняет тренды param1 по MFL/UTWM для всех объектов
+одним проходом np.bincount и циклом np.polyfit по объектам, затем замеряет
+инкрементальное обновление после новых обследований и запрос плана.
+Запуск из каталога backend:
+    python -m benchmarks.bench_forecast [число_объектов]
+"""
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+from app.ml import forecast
+from benchmarks.common import make_engine, populate, timed
+
+
+def fit_loop(measurements):
+    """Прежний подход: отдельная подгонка для каждого объекта"""
+    order = np.argsort(measurements["object_id"], kind="stable")
+    object_ids = measurements["object_id"][order]
+    t, y = measurements["t"][order], measurements["value"][order]
+    starts = np.flatnonzero(np.diff(object_ids, prepend=-1))
+    slopes = {}
+    for start, end in zip(starts, np.append(starts[1:], len(order))):
+        if len(np.unique(t[start:end])) >= 2:
+            slopes[int(object_ids[start])] = np.polyfit(t[start:end], y[start:end], 1)[0]
+    return slopes
+
+
+def run(n_objects: int):
+    engine, session_factory = make_engine()
+    populate(engine, n_objects, diags_per_object=20)
+    db = session_factory()
+
+    load_seconds, measurements = timed(forecast.load_measurements, db, repeat=1)
+    print(f"Парк: {n_objects} объектов, {len(measurements['t'])} измерений MFL/UTWM; выборка {load_seconds:.2f} с")
+    vector_seconds, trends = timed(forecast.fit_trends, measurements, repeat=3)
+    loop_seconds, slopes = timed(fit_loop, measurements, repeat=1)
+    valid = np.isfinite(trends["slope"])
+    assert np.allclose(trends["slope"][valid], [slopes[i] for i in trends["object_id"][valid].tolist()])
+    print(f"Подгонка трендов: векторно {vector_seconds * 1000:.1f} мс, цикл по объектам {loop_seconds * 1000:.1f} мс")
+
+    trends_engine = forecast.ForecastEngine()
+    refresh_seconds, _ = timed(trends_engine.refresh, db, repeat=1)
+    print(f"Полная пересборка движка: {refresh_seconds:.2f} с")
+    for changed in (10, 1000):
+        trends_engine.mark_changed(set(range(1, changed + 1)))
+        seconds, _ = timed(trends_engine.refresh, db, repeat=1)
+        print(f"Обновление после обследований {changed} объектов: {seconds * 1000:.1f} мс")
+
+    today = date(2024, 1, 1)
+    seconds, plan = timed(trends_engine.schedule, 15.0, 2.0, 100, None, today, db, repeat=5)
+    print(f"План на 2 года (порог 15): {plan['total_due']} объектов, {seconds * 1000:.1f} мс")
+    seconds, _ = timed(trends_engine.forecast, 17, 15.0, today, db, repeat=5)
+    print(f"Прогноз одного объекта: {seconds * 1000:.2f} мс")
+    db.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,72 @@
+# backend/benchmarks/bench_ingest.py
+"""Бенчмарк потоковой загрузки CSV диагностик (строк в секунду)
+
+Загрузка замеряется без проверки моделью и с ней (settings.ingest_scoring).
+Запуск из каталога backend:
+    python -m benchmarks.bench_ingest [число_строк]
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+from app.core.config import settings
+from app.services import import_service, scoring_service
+from benchmarks.common import make_engine
+
+
+def write_diagnostics_csv(path: str, n_rows: int, seed: int = 42, first_id: int = 1):
+    rnd = random.Random(seed)
+    methods = ["VIK", "PVK", "MFL", "UTWM", "VIBRO", "RGK"]
+    grades = ["удовлетворительно", "допустимо", "требует_мер", "недопустимо"]
+    labels = ["normal", "medium", "high"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(import_service.DIAGNOSTIC_COLUMNS)
+        for diag_id in range(first_id, first_id + n_rows):
+            defect = rnd.random() < 0.3
+            writer.writerow([
+                diag_id, rnd.randint(1, 10000), rnd.choice(methods),
+                f"20{rnd.randint(15, 23)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                round(rnd.uniform(-20, 35), 1), round(rnd.uniform(30, 90), 1), round(rnd.uniform(500, 2000), 1),
+                defect, "Дефект" if defect else "", rnd.choice(grades),
+                round(rnd.uniform(0, 20), 2), round(rnd.uniform(0, 30), 2), round(rnd.uniform(0, 5), 2),
+                rnd.choice(labels)
+            ])
+
+
+def ingest(path: str, scoring: bool):
+    settings.ingest_scoring = scoring
+    engine, session_factory = make_engine()
+    db = session_factory()
+    try:
+        started = time.perf_counter()
+        with open(path, "rb") as source:
+            stats = import_service.ingest_csv(db, source)
+        db.commit()
+        return time.perf_counter() - started, stats
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def run(n_rows: int):
+    path = os.path.join(tempfile.mkdtemp(prefix="integrity_ingest_"), "diagnostics.csv")
+    write_diagnostics_csv(path, n_rows)
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    print(f"Файл: {n_rows} строк, {size_mb:.1f} МБ")
+
+    # Модель загружается заранее: в замер попадает только проверка
+    scoring_service.scorer.predictor = scoring_service.DefectPredictor()
+    scoring_service.scorer.predictor.warm_up()
+    for scoring in (False, True):
+        total, stats = ingest(path, scoring)
+        label = f"с проверкой ({stats['flags']})" if scoring else "без проверки"
+        print(f"{label}: чанков {stats['chunks']}, время {total:.2f} с, {n_rows / total:.0f} строк/с")
+    scoring_service.shutdown()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,53 @@
+# backend/benchmarks/bench_map_data.py
+"""Бенчмарк /api/map/data: число запросов и задержка в зависимости от числа объектов
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_map_data
+"""
+import json
+import sys
+
+from app.api.endpoints import map as map_endpoint
+from app.db.models import Object, Diagnostic
+from benchmarks.common import make_engine, populate, count_queries, timed
+
+
+def legacy_map_data(session_factory):
+    """Старая реализация: отдельный запрос диагностики для каждого объекта"""
+    db = session_factory()
+    try:
+        features = []
+        for obj in db.query(Object).all():
+            latest = db.query(Diagnostic).filter(
+                Diagnostic.object_id == obj.object_id
+            ).order_by(Diagnostic.date.desc()).first()
+            if latest:
+                features.append((obj.object_id, latest.diag_id))
+        return features
+    finally:
+        db.close()
+
+
+def run(sizes):
+    print(f"{'objects':>8} | {'legacy q':>9} | {'legacy ms':>10} | {'new q':>6} | {'new ms':>8}")
+    for n_objects in sizes:
+        engine, session_factory = make_engine()
+        populate(engine, n_objects, diags_per_object=5)
+        map_endpoint.SessionLocal = session_factory
+
+        with count_queries(engine) as legacy_q:
+            legacy_time, _ = timed(legacy_map_data, session_factory, repeat=1)
+        with count_queries(engine) as new_q:
+            new_time, result = timed(map_endpoint.get_map_data, repeat=1)
+
+        assert len(json.loads(result.body)["features"]) == n_objects
+        print(
+            f"{n_objects:>8} | {legacy_q['queries']:>9} | {legacy_time * 1000:>10.1f} | "
+            f"{new_q['queries']:>6} | {new_time * 1000:>8.1f}"
+        )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000, 20000]
+    run(sizes)
@@ -0,0 +1,90 @@
+# backend/benchmarks/bench_map_tiles.py
+"""Бенчмарк векторных тайлов: байты и задержка на окно карты против GeoJSON /api/map/data
+
+Окно 1280x800 px (как в bench_map_viewport) покрывается тайлами 256 px;
+для каждого масштаба - суммарный размер тайлов, время отрисовки (кэш пуст)
+и время отдачи из кэша.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_map_tiles [объектов]
+"""
+import math
+import random
+import sys
+import time
+
+from app.api.endpoints import map as map_endpoint
+from app.db.models import Pipeline
+from app.services import spatial_index as spatial_index_module, tile_service
+from benchmarks.bench_map_viewport import viewport
+from benchmarks.common import make_engine, populate, timed
+
+N_PIPELINES = 20
+PIPELINE_POINTS = 5000
+
+
+def make_pipelines(seed: int = 7):
+    """Трассы-случайные блуждания по территории парка"""
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(1, N_PIPELINES + 1):
+        lon, lat = rnd.uniform(50.0, 80.0), rnd.uniform(42.0, 53.0)
+        heading = rnd.uniform(0, 2 * math.pi)
+        coordinates = []
+        for _ in range(PIPELINE_POINTS):
+            heading += rnd.gauss(0, 0.1)
+            lon += 0.005 * math.cos(heading)
+            lat += 0.005 * math.sin(heading)
+            coordinates.append([round(lon, 6), round(lat, 6)])
+        rows.append({"pipeline_id": f"MT-{i:02d}", "name": f"Магистраль {i:02d}", "coordinates": coordinates})
+    return rows
+
+
+def tiles_in(bbox, z):
+    """Тайлы, покрывающие bbox на масштабе z"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+
+    def tile(lat, lon):
+        (mx,), (my,) = spatial_index_module.mercator([lat], [lon])
+        return int(mx * 2 ** z), int(my * 2 ** z)
+
+    (x0, y0), (x1, y1) = tile(max_lat, min_lon), tile(min_lat, max_lon)
+    return [(z, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def fetch_all(service, tiles):
+    return sum(len(service.get(*tile)[0]) for tile in tiles)
+
+
+def run(n_objects: int):
+    engine, session_factory = make_engine()
+    populate(engine, n_objects, diags_per_object=1)
+    with engine.begin() as conn:
+        conn.execute(Pipeline.__table__.insert(), make_pipelines())
+    map_endpoint.SessionLocal = session_factory
+    spatial_index_module.SessionLocal = session_factory
+    tile_service.SessionLocal = session_factory
+
+    # Эндпоинт отдает готовые байты JSON (FastJSONResponse)
+    geojson_time, response = timed(map_endpoint.get_map_data, repeat=1)
+    geojson_kb = len(response.body) / 1024
+    started = time.perf_counter()
+    spatial_index_module.spatial_index.get()
+    print(f"Объектов: {n_objects}, трасс: {N_PIPELINES} x {PIPELINE_POINTS} точек")
+    print(f"/api/map/data: {geojson_kb:.0f} КБ, {geojson_time * 1000:.0f} мс; "
+          f"сборка индекса {(time.perf_counter() - started) * 1000:.0f} мс\n")
+
+    print(f"{'zoom':>4} | {'tiles':>5} | {'KB':>7} | {'render ms':>9} | {'cached ms':>9}")
+    for zoom in range(3, 15):
+        tiles = tiles_in(viewport(zoom), zoom)
+        service = tile_service.TileService(max_tiles=4096)
+        service.pipelines()
+        started = time.perf_counter()
+        size = fetch_all(service, tiles)
+        render = time.perf_counter() - started
+        cached, _ = timed(fetch_all, service, tiles, repeat=5)
+        print(f"{zoom:>4} | {len(tiles):>5} | {size / 1024:>7.1f} | {render * 1000:>9.1f} | {cached * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
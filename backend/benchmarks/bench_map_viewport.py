@@ -0,0 +1,66 @@
+# backend/benchmarks/bench_map_viewport.py
+"""Бенчмарк кластеров окна карты: размер ответа и задержка по уровням масштаба
+
+Окно 1280x800 px с центром в Казахстане. Для сравнения - размер полной
+коллекции точек, которую раньше кластеризовал браузер.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_map_viewport [объектов]
+"""
+import json
+import math
+import sys
+import time
+
+from app.services.spatial_index import SpatialIndex, load_arrays
+from benchmarks.common import make_engine, populate, timed
+
+CENTER = (50.0, 67.0)  # lat, lon
+WIDTH_PX, HEIGHT_PX = 1280, 800
+
+
+def viewport(zoom: int):
+    """bbox окна WIDTH_PX x HEIGHT_PX вокруг CENTER на уровне zoom"""
+    world_px = 256 * 2 ** zoom
+    lat, lon = CENTER
+    cx = (lon + 180) / 360 * world_px
+    cy = (1 - math.log(math.tan(math.radians(lat)) + 1 / math.cos(math.radians(lat))) / math.pi) / 2 * world_px
+
+    def to_lon(x):
+        return max(min(x / world_px * 360 - 180, 180), -180)
+
+    def to_lat(y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / world_px))))
+
+    return (to_lon(cx - WIDTH_PX / 2), to_lat(cy + HEIGHT_PX / 2), to_lon(cx + WIDTH_PX / 2), to_lat(cy - HEIGHT_PX / 2))
+
+
+def run(n_objects: int):
+    engine, session_factory = make_engine()
+    populate(engine, n_objects, diags_per_object=1)
+    db = session_factory()
+    try:
+        started = time.perf_counter()
+        arrays = load_arrays(db)
+        load_seconds = time.perf_counter() - started
+    finally:
+        db.close()
+    index = SpatialIndex.from_arrays(*arrays)
+
+    points = [
+        {"id": int(object_id), "coordinates": [float(lon), float(lat)]}
+        for object_id, lat, lon in zip(arrays[0], arrays[1], arrays[2])
+    ]
+    print(f"Объектов: {n_objects}; загрузка {load_seconds * 1000:.0f} мс, сборка индекса {index.build_seconds * 1000:.0f} мс")
+    print(f"Все точки одним списком: {len(json.dumps(points)) / 1024:.0f} КБ\n")
+
+    print(f"{'zoom':>4} | {'clusters':>8} | {'in view':>8} | {'KB':>7} | {'query ms':>8}")
+    for zoom in range(3, 17):
+        bbox = viewport(zoom)
+        elapsed, result = timed(index.query, bbox, zoom, repeat=5)
+        size = len(json.dumps(result)) / 1024
+        print(f"{zoom:>4} | {len(result['clusters']):>8} | {result['objects_in_view']:>8} | {size:>7.1f} | {elapsed * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
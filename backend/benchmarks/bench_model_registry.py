@@ -0,0 +1,54 @@
+# backend/benchmarks/bench_model_registry.py
+"""Бенчмарк загрузки и инференса: pickle sklearn против скомпилированного леса из реестра
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_model_registry
+"""
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+
+from app.ml.model import DefectPredictor
+from benchmarks.bench_predict import make_batch
+from benchmarks.common import timed
+
+
+def run(sizes=(1, 100, 10_000, 100_000)):
+    with tempfile.TemporaryDirectory() as root:
+        predictor = DefectPredictor(registry_dir=root)
+        predictor.create_default_model()
+        model, scaler = predictor.model, predictor.scaler
+
+        model_path = os.path.join(root, "model.pkl")
+        with open(model_path, "wb") as f:
+            pickle.dump((model, scaler), f)
+
+        def load_pickle():
+            with open(model_path, "rb") as f:
+                pickle.load(f)
+
+        pickle_load, _ = timed(load_pickle, repeat=20)
+        registry_load, _ = timed(lambda: predictor.registry.load(predictor.version), repeat=20)
+        print(f"load: pickle {pickle_load * 1000:.2f} ms, registry {registry_load * 1000:.2f} ms")
+
+        print(f"{'batch':>8} | {'sklearn ms':>10} | {'compiled ms':>11} | {'max diff':>9}")
+        for n in sizes:
+            X = make_batch(n)
+            repeat = 20 if n <= 100 else 3
+            reference = model.predict_proba(scaler.transform(X))
+            compiled = predictor.forest.predict_proba(X)
+            sklearn_time, _ = timed(lambda: model.predict_proba(scaler.transform(X)), repeat=repeat)
+            compiled_time, _ = timed(lambda: predictor.forest.predict_proba(X), repeat=repeat)
+            print(
+                f"{n:>8} | {sklearn_time * 1000:>10.2f} | {compiled_time * 1000:>11.2f} | "
+                f"{np.abs(reference - compiled).max():>9.1e}"
+            )
+
+        print("Публикация:", predictor.registry.read_meta(predictor.version)["benchmark"])
+
+
+if __name__ == "__main__":
+    run()
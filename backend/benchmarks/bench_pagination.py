@@ -0,0 +1,54 @@
+# backend/benchmarks/bench_pagination.py
+"""Бенчмарк глубоких страниц /api/diagnostics и /api/objects: смещение против курсора
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_pagination [объектов] [диагностик на объект]
+"""
+import sys
+
+from app.db import crud
+from benchmarks.common import make_engine, populate, timed
+
+PAGE = 100
+
+
+def depths(total: int):
+    """100, 1000, ... и последняя страница"""
+    depth = PAGE
+    while depth < total - PAGE:
+        yield depth
+        depth *= 10
+    yield total - PAGE
+
+
+def run(n_objects: int, diags_per_object: int):
+    engine, session_factory = make_engine()
+    populate(engine, n_objects, diags_per_object)
+    total = n_objects * diags_per_object
+    db = session_factory()
+
+    print(f"diagnostics: {total} строк, страница {PAGE}")
+    print(f"{'offset':>9} | {'offset ms':>9} | {'keyset ms':>9}")
+    for depth in depths(total):
+        # Позиция для курсора берется вне замера - как если бы клиент дошел до нее постранично
+        last = crud.DiagnosticCRUD.get_diagnostics(db, skip=depth - 1, limit=1)[0]
+        after = (last.date, last.diag_id)
+        offset_time, by_offset = timed(crud.DiagnosticCRUD.get_diagnostics, db, skip=depth, limit=PAGE, repeat=5)
+        keyset_time, by_keyset = timed(crud.DiagnosticCRUD.get_diagnostics, db, after=after, limit=PAGE, repeat=5)
+        assert [d.diag_id for d in by_offset] == [d.diag_id for d in by_keyset]
+        print(f"{depth:>9} | {offset_time * 1000:>9.2f} | {keyset_time * 1000:>9.2f}")
+
+    print(f"\nobjects: {n_objects} строк, страница {PAGE}")
+    print(f"{'offset':>9} | {'offset ms':>9} | {'keyset ms':>9}")
+    for depth in depths(n_objects):
+        offset_time, _ = timed(crud.ObjectCRUD.get_objects, db, skip=depth, limit=PAGE, repeat=5)
+        keyset_time, _ = timed(crud.ObjectCRUD.get_objects, db, after=depth, limit=PAGE, repeat=5)
+        print(f"{depth:>9} | {offset_time * 1000:>9.2f} | {keyset_time * 1000:>9.2f}")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    n_objects = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    diags_per_object = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    run(n_objects, diags_per_object)
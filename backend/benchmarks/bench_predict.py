@@ -0,0 +1,53 @@
+# backend/benchmarks/bench_predict.py
+"""Бенчмарк пакетного инференса DefectPredictor: поштучно против одной матрицы
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_predict
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.ml.model import DefectPredictor, FEATURES
+
+# Поштучный путь на больших батчах занимает минуты - ограничиваем его
+LEGACY_LIMIT = 10_000
+
+
+def make_batch(n: int, seed: int = 42) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.uniform(0, 20, n),
+        rng.uniform(0, 30, n),
+        rng.uniform(0, 5, n),
+        rng.uniform(10, 30, n),
+        rng.uniform(40, 80, n)
+    ])
+
+
+def run(sizes):
+    predictor = DefectPredictor()
+    predictor.create_default_model()
+
+    print(f"{'batch':>8} | {'per-item items/s':>17} | {'batch items/s':>14} | {'batch ms':>9}")
+    for n in sizes:
+        X = make_batch(n)
+
+        legacy = "-"
+        if n <= LEGACY_LIMIT:
+            started = time.perf_counter()
+            for row in X:
+                predictor.predict(dict(zip(FEATURES, row)))
+            legacy = f"{n / (time.perf_counter() - started):.0f}"
+
+        started = time.perf_counter()
+        predictor.predict_batch(X)
+        elapsed = time.perf_counter() - started
+
+        print(f"{n:>8} | {legacy:>17} | {n / elapsed:>14.0f} | {elapsed * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1, 100, 10_000, 100_000]
+    run(sizes)
@@ -0,0 +1,145 @@
+# backend/benchmarks/bench_serialization.py
+"""Бенчмарк сериализации больших списков: ORM + dict + jsonable_encoder против строк + orjson
+
+Для каждого эндпоинта сравниваются прежний путь (ORM-объекты, .value и
+isoformat на строку, jsonable_encoder, JSONResponse) и новый (кортежи
+строк, перевод enum по столбцу, FastJSONResponse). Время включает запрос.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_serialization [объектов]
+"""
+import sys
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.api.endpoints import map as map_endpoint
+from app.db import crud
+from app.db.models import Object, Diagnostic, MLLabel
+from app.utils.fast_json import FastJSONResponse
+from benchmarks.common import make_engine, populate, timed
+
+
+def legacy_response(content) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def legacy_objects(db, limit):
+    return legacy_response([
+        {
+            "object_id": obj.object_id,
+            "object_name": obj.object_name,
+            "object_type": obj.object_type.value,
+            "pipeline_id": obj.pipeline_id,
+            "lat": obj.lat,
+            "lon": obj.lon,
+            "year": obj.year,
+            "material": obj.material
+        }
+        for obj in crud.ObjectCRUD.get_objects(db, limit=limit)
+    ])
+
+
+def legacy_diagnostics(db, limit):
+    return legacy_response([
+        {
+            "diag_id": diag.diag_id,
+            "object_id": diag.object_id,
+            "method": diag.method.value,
+            "date": diag.date.isoformat(),
+            "temperature": diag.temperature,
+            "humidity": diag.humidity,
+            "illumination": diag.illumination,
+            "defect_found": diag.defect_found,
+            "defect_description": diag.defect_description,
+            "quality_grade": diag.quality_grade.value,
+            "param1": diag.param1,
+            "param2": diag.param2,
+            "param3": diag.param3,
+            "ml_label": diag.ml_label.value if diag.ml_label else None
+        }
+        for diag in crud.DiagnosticCRUD.get_diagnostics(db, limit=limit)
+    ])
+
+
+def legacy_map_data(db):
+    features = []
+    for obj, latest_diag in crud.DiagnosticCRUD.get_latest_diagnostics(db):
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [obj.lon, obj.lat]},
+            "properties": {
+                "object_id": obj.object_id,
+                "name": obj.object_name,
+                "type": obj.object_type.value,
+                "pipeline_id": obj.pipeline_id,
+                "latest_inspection": {
+                    "date": latest_diag.date.isoformat() if latest_diag.date else None,
+                    "method": latest_diag.method.value,
+                    "defect_found": latest_diag.defect_found,
+                    "criticality": latest_diag.ml_label.value if latest_diag.ml_label else None,
+                    "quality": latest_diag.quality_grade.value if latest_diag.quality_grade else None
+                }
+            }
+        })
+    return legacy_response({"type": "FeatureCollection", "features": features})
+
+
+def legacy_map_clusters(db):
+    rows = db.query(
+        Object.object_id, Object.object_name, Object.object_type, Object.pipeline_id,
+        Object.lat, Object.lon, Diagnostic.ml_label, Diagnostic.defect_found
+    ).join(Diagnostic, Object.object_id == Diagnostic.object_id).distinct(Object.object_id).all()
+    clusters = []
+    for obj in rows:
+        color = "#4CAF50"
+        if obj.ml_label:
+            if obj.ml_label == MLLabel.HIGH:
+                color = "#F44336"
+            elif obj.ml_label == MLLabel.MEDIUM:
+                color = "#FF9800"
+        clusters.append({
+            "id": obj.object_id,
+            "name": obj.object_name,
+            "type": obj.object_type.value,
+            "pipeline_id": obj.pipeline_id,
+            "coordinates": [obj.lon, obj.lat],
+            "criticality": obj.ml_label.value if obj.ml_label else "normal",
+            "color": color,
+            "has_defect": obj.defect_found or False
+        })
+    return legacy_response({"clusters": clusters, "total": len(clusters)})
+
+
+def run(n_objects: int):
+    engine, session_factory = make_engine()
+    populate(engine, n_objects, diags_per_object=2)
+    map_endpoint.SessionLocal = session_factory
+    db = session_factory()
+    limit = n_objects
+
+    cases = [
+        ("/api/objects", lambda: legacy_objects(db, limit),
+         lambda: FastJSONResponse(crud.ObjectCRUD.get_object_rows(db, limit=limit)).body),
+        ("/api/diagnostics", lambda: legacy_diagnostics(db, limit),
+         lambda: FastJSONResponse(crud.DiagnosticCRUD.get_diagnostic_rows(db, limit=limit)).body),
+        ("/api/map/data", lambda: legacy_map_data(db), lambda: map_endpoint.get_map_data().body),
+        ("/api/map/clusters", lambda: legacy_map_clusters(db), lambda: map_endpoint.get_map_clusters().body),
+    ]
+    print(f"Объектов: {n_objects}, диагностик: {n_objects * 2}; в списках limit={limit}\n")
+    print(f"{'endpoint':>18} | {'before ms':>9} | {'after ms':>8} | {'x':>5} | {'before MB':>9} | {'after MB':>8}")
+    try:
+        for name, before, after in cases:
+            before_time, before_body = timed(before, repeat=3)
+            after_time, after_body = timed(after, repeat=3)
+            print(
+                f"{name:>18} | {before_time * 1000:>9.0f} | {after_time * 1000:>8.0f} | "
+                f"{before_time / after_time:>5.1f} | {len(before_body) / 2 ** 20:>9.1f} | {len(after_body) / 2 ** 20:>8.1f}"
+            )
+    finally:
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,74 @@
+# backend/benchmarks/bench_startup.py
+"""Бенчмарк запуска: импорт app.main, готовность /health и загрузка ML-модели
+
+Каждый замер - отдельный процесс Python (холодный импорт). Режимы:
+    пустая БД и реестр - первый запуск;
+    повторный запуск на тех же БД и реестре - типичный рестарт воркера.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_startup [повторов]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CHILD = r"""
+import json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    health = client.get("/health").json()
+    healthy = time.perf_counter()
+    # Модель грузится в фоне: ждем флага готовности (до появления флага модель грузилась при импорте)
+    while not health.get("ml_ready", True) and time.perf_counter() - started < 120:
+        time.sleep(0.01)
+        health = client.get("/health").json()
+    ml_ready = time.perf_counter()
+    modules = __import__("sys").modules
+print(json.dumps({
+    "import": imported - started,
+    "healthy": healthy - started,
+    "ml_ready": ml_ready - started,
+    "sklearn_loaded": "sklearn" in modules,
+    "pandas_loaded": "pandas" in modules,
+}))
+"""
+
+
+def measure(workdir: str) -> dict:
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'integrity.db')}",
+        "ML_REGISTRY_DIR": os.path.join(workdir, "ml_models"),
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, cwd=os.getcwd(), capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(repeat: int):
+    rows = []
+    for _ in range(repeat):
+        workdir = tempfile.mkdtemp(prefix="integrity_startup_")
+        rows.append(("первый запуск", measure(workdir)))
+        rows.append(("рестарт", measure(workdir)))
+
+    print(f"{'режим':<16}{'импорт, с':>11}{'/health, с':>12}{'ML готова, с':>14}  sklearn  pandas")
+    for mode in ("первый запуск", "рестарт"):
+        results = [result for name, result in rows if name == mode]
+        best = {key: min(result[key] for result in results) for key in ("import", "healthy", "ml_ready")}
+        last = results[-1]
+        print(
+            f"{mode:<16}{best['import']:>11.2f}{best['healthy']:>12.2f}{best['ml_ready']:>14.2f}"
+            f"  {str(last['sklearn_loaded']):<8} {last['pandas_loaded']}"
+        )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
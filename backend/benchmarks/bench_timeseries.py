@@ -0,0 +1,82 @@
+# backend/benchmarks/bench_timeseries.py
+"""Бенчмарк временных рядов: чтение ряда из агрегатов против группировки diagnostics
+
+Строит парк (populate), замеряет многолетний ряд по месяцам для всего парка,
+трубопровода и объекта из diagnostic_rollups и прежним GROUP BY по таблице,
+затем - цену обновления агрегатов при загрузке CSV.
+Запуск из каталога backend:
+    python -m benchmarks.bench_timeseries [число_объектов]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import func, select
+
+from app.db import dialects
+from app.db.models import Diagnostic, Object
+from app.services import import_service, timeseries_service
+from benchmarks.bench_ingest import write_diagnostics_csv
+from benchmarks.common import make_engine, populate, timed
+
+START, END = date(2018, 3, 10), date(2023, 6, 20)
+
+
+def scan(db, scope: str, key):
+    """Прежний способ: группировка всей таблицы за окно"""
+    month = dialects.month_bucket(Diagnostic.date)
+    query = select(month, func.count(Diagnostic.diag_id), func.avg(Diagnostic.param1), func.max(Diagnostic.param1))
+    if scope == "pipeline":
+        query = query.join(Object, Object.object_id == Diagnostic.object_id).where(Object.pipeline_id == key)
+    elif scope == "object":
+        query = query.where(Diagnostic.object_id == int(key))
+    query = query.where(Diagnostic.date.between(START, END)).group_by(month)
+    return db.execute(query).all()
+
+
+def ingest(session_factory, path: str, initialized: bool) -> float:
+    db = session_factory()
+    try:
+        if initialized:
+            timeseries_service.prepare(db)
+        started = time.perf_counter()
+        with open(path, "rb") as source:
+            import_service.ingest_csv(db, source)
+        db.commit()
+        return time.perf_counter() - started
+    finally:
+        db.close()
+
+
+def run(n_objects: int):
+    engine, session_factory = make_engine()
+    populate(engine, n_objects, diags_per_object=20)
+    db = session_factory()
+    started = time.perf_counter()
+    timeseries_service.prepare(db)
+    print(f"Парк: {n_objects} объектов, {n_objects * 20} диагностик; пересборка агрегатов {time.perf_counter() - started:.2f} с")
+
+    print(f"{'ряд по месяцам':<22}{'GROUP BY, мс':>14}{'агрегаты, мс':>14}")
+    for scope, key in (("fleet", None), ("pipeline", "MT-03"), ("object", "17")):
+        scan_seconds, _ = timed(scan, db, scope, key, repeat=5)
+        rollup_seconds, _ = timed(timeseries_service.query_range, db, scope, key, "month", START, END, repeat=5)
+        print(f"{scope:<22}{scan_seconds * 1000:>14.1f}{rollup_seconds * 1000:>14.1f}")
+    db.close()
+    engine.dispose()
+
+    # Загрузка 200k новых диагностик: без агрегатов и с их обновлением
+    path = os.path.join(tempfile.mkdtemp(prefix="integrity_timeseries_"), "diagnostics.csv")
+    write_diagnostics_csv(path, 200_000, first_id=10_000_000)
+    for initialized in (False, True):
+        engine, session_factory = make_engine()
+        populate(engine, 10_000, diags_per_object=1)
+        seconds = ingest(session_factory, path, initialized)
+        label = "с агрегатами" if initialized else "без агрегатов"
+        print(f"Загрузка 200000 строк {label}: {seconds:.2f} с, {200_000 / seconds:.0f} строк/с")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
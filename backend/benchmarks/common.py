@@ -0,0 +1,98 @@
+# backend/benchmarks/common.py
+"""Общие утилиты для бенчмарков: временная БД, синтетические данные, счетчик запросов"""
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import build_engine
+from app.db.models import (
+    Base, Object, Diagnostic, ObjectType, MethodType, QualityGrade, MLLabel
+)
+
+
+def make_engine():
+    """Создать движок на временном файле SQLite"""
+    path = os.path.join(tempfile.mkdtemp(prefix="integrity_bench_"), "bench.db")
+    engine = build_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def populate(engine, n_objects: int, diags_per_object: int = 5, seed: int = 42):
+    """Заполнить БД синтетическим парком объектов и диагностик"""
+    rnd = random.Random(seed)
+    object_types = list(ObjectType)
+    methods = list(MethodType)
+    grades = list(QualityGrade)
+    labels = list(MLLabel)
+    start = date(2018, 1, 1)
+
+    objects = []
+    diagnostics = []
+    diag_id = 1
+    for object_id in range(1, n_objects + 1):
+        objects.append({
+            "object_id": object_id,
+            "object_name": f"Объект {object_id}",
+            "object_type": rnd.choice(object_types),
+            "pipeline_id": f"MT-{rnd.randint(1, 20):02d}",
+            "lat": rnd.uniform(40.0, 55.0),
+            "lon": rnd.uniform(46.0, 88.0),
+            "year": rnd.randint(1960, 2020),
+            "material": rnd.choice(["Ст3", "09Г2С", "X70", "Ст20"]),
+        })
+        for _ in range(diags_per_object):
+            defect = rnd.random() < 0.3
+            diagnostics.append({
+                "diag_id": diag_id,
+                "object_id": object_id,
+                "method": rnd.choice(methods),
+                "date": start + timedelta(days=rnd.randint(0, 2000)),
+                "temperature": rnd.uniform(-20, 35),
+                "humidity": rnd.uniform(30, 90),
+                "illumination": rnd.uniform(500, 2000),
+                "defect_found": defect,
+                "defect_description": "Дефект" if defect else "",
+                "quality_grade": rnd.choice(grades),
+                "param1": rnd.uniform(0, 20),
+                "param2": rnd.uniform(0, 30),
+                "param3": rnd.uniform(0, 5),
+                "ml_label": rnd.choice(labels),
+            })
+            diag_id += 1
+
+    with engine.begin() as conn:
+        conn.execute(Object.__table__.insert(), objects)
+        conn.execute(Diagnostic.__table__.insert(), diagnostics)
+
+
+@contextmanager
+def count_queries(engine):
+    """Подсчитать SQL-запросы, выполненные внутри блока"""
+    counter = {"queries": 0}
+
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["queries"] += 1
+
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_execute)
+
+
+def timed(func, *args, repeat: int = 3, **kwargs):
+    """Лучшее время выполнения функции из нескольких прогонов (секунды)"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - started)
+    return best, result
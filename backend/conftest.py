@@ -0,0 +1,70 @@
+# backend/conftest.py
+"""Общие фикстуры: БД SQLite во временном каталоге и столбцы чанков для import_service.write_chunk"""
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import build_engine
+from app.db.migrations import upgrade
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    upgrade(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+def _column(value, n):
+    """Значение столбца: массив или список - как есть, скаляр - для всех строк"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value] * n
+
+
+def object_columns(ids, pipeline="MT-01"):
+    """Столбцы чанка объектов; pipeline - pipeline_id или функция id -> pipeline_id"""
+    ids = list(ids)
+    return {
+        "object_id": ids, "object_name": [f"Объект {i}" for i in ids], "object_type": ["CRANE"] * len(ids),
+        "pipeline_id": [pipeline(i) if callable(pipeline) else pipeline for i in ids],
+        "lat": [50.0] * len(ids), "lon": [70.0] * len(ids), "year": [2000] * len(ids), "material": ["Ст3"] * len(ids)
+    }
+
+
+def diagnostic_columns(rng, ids, n_objects=1, start=date(2021, 1, 1), days=500, methods=("UZK",),
+                       param1=None, labels="NORMAL", **columns):
+    """Столбцы чанка диагностик
+
+    Объект (1..n_objects), дата (start + до days дней) и метод выбираются
+    случайно. param1 - значения или функция (rng, object_id, дни от start) -> значения.
+    Остальные столбцы по умолчанию пустые или постоянные; columns заменяет
+    любой из них (скаляр - для всех строк).
+    """
+    n = len(ids)
+    object_id = rng.integers(1, n_objects + 1, n)
+    offsets = rng.integers(0, days, n)
+    values = {
+        "diag_id": list(ids),
+        "object_id": object_id,
+        "method": rng.choice(methods, n),
+        "date": [(start + timedelta(days=int(day))).isoformat() for day in offsets],
+        "temperature": None, "humidity": None, "illumination": None,
+        "defect_found": False, "defect_description": "", "quality_grade": "SATISFACTORY",
+        "param1": param1(rng, object_id, offsets) if callable(param1) else param1, "param2": None, "param3": None,
+        "ml_label": labels,
+        **columns
+    }
+    return {name: _column(value, n) for name, value in values.items()}
@@ -1,11 +1,12 @@
-from app.db.models import Base, Object, Diagnostic, ObjectType, MethodType, QualityGrade, MLLabel
+from app.db.models import Object, Diagnostic, Pipeline, ObjectType, MethodType, QualityGrade, MLLabel
 from app.db.database import engine, SessionLocal
+from app.db.migrations import upgrade
 from datetime import date
 
 def init_db():
     """Инициализировать базу данных"""
     print("Создание таблиц в базе данных...")
-    Base.metadata.create_all(bind=engine)
+    upgrade(engine)
     print("Таблицы созданы успешно!")
 
 def seed_sample_data():
@@ -194,6 +195,33 @@ def seed_sample_data():
     finally:
         db.close()
 
+# Демонстрационные трассы магистралей (раньше были зашиты в /api/map/pipelines)
+SAMPLE_PIPELINES = {
+    "MT-01": [[71.0, 51.0], [71.5, 51.2], [72.0, 51.3], [72.5, 51.5]],
+    "MT-02": [[63.0, 52.0], [63.5, 52.2], [64.0, 52.4], [64.5, 52.6]],
+    "MT-03": [[69.0, 50.0], [69.5, 50.3], [70.0, 50.5], [70.5, 50.8]],
+}
+
+def seed_pipelines():
+    """Заполнить трассы трубопроводов, если таблица пуста"""
+    db = SessionLocal()
+    
+    try:
+        if db.query(Pipeline).count() > 0:
+            return
+        
+        for pipeline_id, coordinates in SAMPLE_PIPELINES.items():
+            db.add(Pipeline(
+                pipeline_id=pipeline_id,
+                name=f"Магистраль {pipeline_id.split('-')[1]}",
+                coordinates=coordinates
+            ))
+        db.commit()
+        print(f"Добавлены трассы трубопроводов: {len(SAMPLE_PIPELINES)}")
+    finally:
+        db.close()
+
 if __name__ == "__main__":
     init_db()
-    seed_sample_data()
\ No newline at end of file
+    seed_sample_data()
+    seed_pipelines()
\ No newline at end of file
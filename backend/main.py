@@ -1,6 +1,9 @@
+import os
 import uvicorn
 
 if __name__ == "__main__":
+    # Локальный запуск: пустая БД заполняется тестовыми данными
+    os.environ.setdefault("SEED_SAMPLE_DATA", "true")
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
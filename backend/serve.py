@@ -0,0 +1,71 @@
+# backend/serve.py
+"""Запуск API в несколько воркеров (production)
+
+Главный процесс один раз готовит БД (таблицы, индексы и, по флагу, тестовые
+данные) и модель в реестре, после чего запускает воркеры uvicorn. Воркеры
+не трогают схему, отображают массивы модели в память - страницы общие через
+кэш ОС - и обмениваются событиями об изменении данных через общий файл, так
+что запись в одном воркере сбрасывает кэши остальных. Новая версия модели
+подхватывается каждым воркером из реестра (ml_reload_interval).
+
+    python serve.py --workers 4 --port 8000
+"""
+import argparse
+import logging
+import os
+import tempfile
+
+import uvicorn
+
+logger = logging.getLogger("serve")
+
+
+def prepare():
+    """Однократная подготовка до запуска воркеров"""
+    from app.api.endpoints.predictions import predictor
+    from app.main import startup
+
+    startup()
+    # Перенос pickle-модели или обучение модели по умолчанию - здесь, а не наперегонки в воркерах
+    predictor.warm_up()
+    logger.info(f"Модель готова: версия {predictor.version}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IntegrityOS API: несколько воркеров")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+
+    prepare()
+
+    events_file = os.environ.get("EVENTS_FILE") or os.path.join(
+        tempfile.gettempdir(), f"integrityos-events-{os.getpid()}.log"
+    )
+    # Журнал начинается заново: события прошлого запуска воркерам не нужны
+    open(events_file, "wb").close()
+    # Воркеры запускаются через spawn и читают настройки из окружения
+    os.environ.update({
+        "EVENTS_FILE": events_file,
+        "DB_AUTO_MIGRATE": "false",
+        "SEED_SAMPLE_DATA": "false",
+        "ML_MMAP": "true",
+    })
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level=args.log_level
+        )
+    finally:
+        if os.path.exists(events_file):
+            os.remove(events_file)
+
+
+if __name__ == "__main__":
+    main()
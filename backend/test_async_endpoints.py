@@ -0,0 +1,110 @@
+# backend/test_async_endpoints.py
+import asyncio
+from datetime import date
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.api.endpoints import diagnostics, objects
+from app.db import crud
+from app.db.database import build_async_engine, get_async_db
+from app.services import import_service
+from conftest import diagnostic_columns, object_columns
+
+
+def legacy_object(obj):
+    """Объект в списке /api/objects/ до перевода на async"""
+    return {
+        "object_id": obj.object_id, "object_name": obj.object_name, "object_type": obj.object_type.value,
+        "pipeline_id": obj.pipeline_id, "lat": obj.lat, "lon": obj.lon, "year": obj.year, "material": obj.material
+    }
+
+
+def legacy_diagnostic(diag):
+    """Диагностика в списке /api/diagnostics/ до перевода на async"""
+    return {
+        "diag_id": diag.diag_id, "object_id": diag.object_id, "method": diag.method.value,
+        "date": diag.date.isoformat(), "temperature": diag.temperature, "humidity": diag.humidity,
+        "illumination": diag.illumination, "defect_found": diag.defect_found,
+        "defect_description": diag.defect_description, "quality_grade": diag.quality_grade.value,
+        "param1": diag.param1, "param2": diag.param2, "param3": diag.param3,
+        "ml_label": diag.ml_label.value if diag.ml_label else None
+    }
+
+
+@pytest.fixture
+def client(db, session_factory):
+    rng = np.random.default_rng(7)
+    import_service.write_chunk(db, "objects", object_columns(range(1, 31), lambda i: f"MT-0{i % 2 + 1}"))
+    import_service.write_chunk(db, "diagnostics", diagnostic_columns(
+        rng, range(1, 301), 30, start=date(2022, 1, 1), days=60, methods=("UZK", "MFL", "VIK"),
+        param1=rng.normal(5.0, 1.0, 300), defect_found=rng.random(300) < 0.3,
+        labels=rng.choice(["NORMAL", "MEDIUM", "HIGH", None], 300)
+    ))
+    db.commit()
+
+    # Асинхронная сессия на ту же БД, что и синхронная фикстура
+    async_engine = build_async_engine(session_factory.kw["bind"].url.render_as_string(hide_password=False))
+    async_session = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override():
+        async with async_session() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(objects.router, prefix="/api/objects")
+    app.include_router(diagnostics.router, prefix="/api/diagnostics")
+    app.dependency_overrides[get_async_db] = override
+    with TestClient(app) as test_client:
+        yield test_client
+    asyncio.run(async_engine.dispose())
+
+
+def pages(client, url, limit):
+    """Все элементы при обходе курсором"""
+    items, cursor = [], ""
+    while cursor is not None:
+        body = client.get(url, params={"cursor": cursor, "limit": limit}).json()
+        items.extend(body["items"])
+        cursor = body["next_cursor"]
+    return items
+
+
+def test_object_endpoints_match_sync_crud(client, db):
+    for params in ({}, {"pipeline_id": "MT-02"}, {"object_type": "CRANE", "skip": 5, "limit": 7}):
+        expected = [legacy_object(obj) for obj in crud.ObjectCRUD.get_objects(db, **params)]
+        assert client.get("/api/objects/", params=params).json() == expected
+    assert pages(client, "/api/objects/?pipeline_id=MT-01", 4) == [
+        legacy_object(obj) for obj in crud.ObjectCRUD.get_objects(db, pipeline_id="MT-01")
+    ]
+
+    obj = crud.ObjectCRUD.get_object(db, 12)
+    detail = client.get("/api/objects/12").json()
+    assert detail["coordinates"] == {"lat": obj.lat, "lon": obj.lon}
+    assert [diag["diag_id"] for diag in detail["diagnostics"]] == [
+        diag.diag_id for diag in crud.DiagnosticCRUD.get_diagnostics(db, object_id=12, limit=10)
+    ]
+    assert client.get("/api/objects/999").status_code == 404
+
+
+def test_diagnostic_endpoints_match_sync_crud(client, db):
+    for params in (
+        {}, {"object_id": 3}, {"method": "MFL", "defect_found": True},
+        {"start_date": "2022-01-10", "end_date": "2022-02-01", "skip": 4, "limit": 9}
+    ):
+        filters = {
+            **params,
+            **{key: date.fromisoformat(params[key]) for key in ("start_date", "end_date") if key in params}
+        }
+        expected = [legacy_diagnostic(diag) for diag in crud.DiagnosticCRUD.get_diagnostics(db, **filters)]
+        assert client.get("/api/diagnostics/", params=params).json() == expected
+
+    # Даты повторяются: обход курсором дает ровно список смещения
+    assert pages(client, "/api/diagnostics/?method=UZK", 11) == [
+        legacy_diagnostic(diag) for diag in crud.DiagnosticCRUD.get_diagnostics(db, method="UZK", limit=1000)
+    ]
+    assert client.get("/api/diagnostics/stats").json() == jsonable_encoder(crud.DiagnosticCRUD.get_diagnostics_stats(db))
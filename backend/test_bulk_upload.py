@@ -0,0 +1,94 @@
+# backend/test_bulk_upload.py
+import io
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import build_engine
+from app.db.migrations import upgrade
+from app.db.models import Object, Diagnostic
+from app.services import bulk_import_service, import_service
+
+OBJECTS_CSV = """object_id,object_name,object_type,pipeline_id,lat,lon,year,material
+1,Кран 1,crane,MT-01,50.1,70.2,1990,Ст3
+2,Кран 2,crane,MT-01,50.3,70.4,2001,X70
+"""
+
+DIAGNOSTICS_CSV = """diag_id,object_id,method,date,defect_found,quality_grade,param1,ml_label
+1,1,UZK,2023-01-10,true,допустимо,1.5,medium
+2,abc,UZK,2023-01-11,false,допустимо,1.0,normal
+3,2,MFL,2023-02-01,false,удовлетворительно,0.5,normal
+4,,MFL,2023-02-02,false,удовлетворительно,0.5,normal
+"""
+
+
+@pytest.fixture
+def session_factory(monkeypatch, tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'bulk.db'}")
+    upgrade(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(bulk_import_service, "SessionLocal", factory)
+    return factory
+
+
+def write_files(tmp_path, contents):
+    paths = []
+    for name, content in contents:
+        path = tmp_path / name
+        path.write_text(content, encoding="utf-8")
+        paths.append((name, str(path)))
+    return paths
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_bulk_isolates_files_and_reports_rows(session_factory, tmp_path, workers):
+    # Диагностики идут первыми, но записываются после объектов
+    paths = write_files(tmp_path, [
+        ("diagnostics.csv", DIAGNOSTICS_CSV), ("broken.csv", "a,b\n1,2\n"), ("objects.csv", OBJECTS_CSV)
+    ])
+    try:
+        report = bulk_import_service.ingest_files(paths, workers=workers)
+    finally:
+        bulk_import_service.shutdown()
+
+    results = {result["filename"]: result for result in report["results"]}
+    assert results["objects.csv"]["success"] and results["objects.csv"]["rows_written"] == 2
+    assert results["broken.csv"]["success"] is False and results["broken.csv"]["status"] == "failed"
+
+    diagnostics = results["diagnostics.csv"]
+    assert diagnostics["success"] and diagnostics["rows_written"] == 2 and diagnostics["rows_rejected"] == 2
+    assert [(error["line"], error["column"], error["error"]) for error in diagnostics["errors"]] == [
+        (3, "object_id", "не целое число"), (5, "object_id", "пустое значение")
+    ]
+
+    summary = report["summary"]
+    assert (summary["succeeded"], summary["failed"], summary["rows_written"]) == (2, 1, 4)
+    assert summary["rows_per_second"] > 0
+
+    db = session_factory()
+    assert db.scalar(select(func.count()).select_from(Object)) == 2
+    assert sorted(db.scalars(select(Diagnostic.diag_id))) == [1, 3]
+    # Разобранные чанки удаляются после записи (и после ошибки файла)
+    assert list(tmp_path.glob(f"*{import_service.PARSED_SUFFIX}")) == []
+
+
+def test_parsed_chunks_streamed_from_disk(tmp_path):
+    (_, path), = write_files(tmp_path, [("objects.csv", OBJECTS_CSV)])
+    parsed = import_service.parse_csv_file(path, chunk_size=1)
+    # В результате разбора только итоги, чанки - в файле рядом с исходным
+    assert set(parsed) == {"kind", "chunks_path", "rows", "rows_rejected", "errors", "parse_seconds"}
+    chunks = list(import_service.read_parsed_chunks(parsed["chunks_path"]))
+    assert [columns["object_id"] for columns in chunks] == [[1], [2]]
+    assert parsed["rows"] == 2 and parsed["kind"] == "objects"
+
+
+def test_single_upload_reports_first_bad_row(session_factory):
+    db = session_factory()
+    with pytest.raises(import_service.RowError) as error:
+        import_service.ingest_csv(db, io.BytesIO(DIAGNOSTICS_CSV.encode("utf-8")))
+    assert str(error.value).startswith("Строка 3, столбец object_id")
+    assert len(error.value.errors) == 2
+
+    stats = import_service.ingest_csv(db, io.BytesIO(DIAGNOSTICS_CSV.encode("utf-8")), skip_invalid=True)
+    assert (stats["rows_processed"], stats["rows_rejected"]) == (2, 2)
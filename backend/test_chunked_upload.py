@@ -0,0 +1,108 @@
+# backend/test_chunked_upload.py
+import hashlib
+import os
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.api.endpoints import upload
+from app.core.config import settings
+from app.db.database import build_engine
+from app.db.migrations import upgrade
+from app.db.models import Diagnostic, JobRecord
+from app.services import upload_service
+from app.services.job_service import JobManager
+from test_bulk_upload import DIAGNOSTICS_CSV
+
+CONTENT = DIAGNOSTICS_CSV.encode("utf-8")
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'upload.db'}")
+    upgrade(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(upload, "SessionLocal", factory)
+    monkeypatch.setattr(upload_service, "SessionLocal", factory)
+    monkeypatch.setattr(upload_service, "jobs", JobManager(session_factory=factory))
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path / "uploads"))
+    app = FastAPI()
+    app.include_router(upload.router, prefix="/api/upload")
+    return TestClient(app), factory
+
+
+def wait_done(client, upload_id):
+    for _ in range(100):
+        state = client.get(f"/api/upload/sessions/{upload_id}").json()
+        if state["status"] != "ingesting":
+            return state
+        time.sleep(0.05)
+    raise AssertionError(f"Загрузка не завершилась: {state}")
+
+
+def test_resumable_upload_is_idempotent(client):
+    client, factory = client
+    opened = client.post("/api/upload/sessions", json={"filename": "d.csv", "size": len(CONTENT), "sha256": SHA256}).json()
+    assert opened["created"] and opened["received"] == 0
+    url = f"/api/upload/sessions/{opened['upload_id']}"
+
+    assert client.put(f"{url}/chunks?offset=0", content=CONTENT[:100]).json()["received"] == 100
+    # Пропуск данных отклоняется с текущим смещением, повтор части - без изменений
+    gap = client.put(f"{url}/chunks?offset=150", content=CONTENT[150:])
+    assert gap.status_code == 409 and gap.json()["detail"]["received"] == 100
+    assert client.post(f"{url}/complete").status_code == 409
+    assert client.put(f"{url}/chunks?offset=50", content=CONTENT[50:120]).json()["received"] == 120
+    assert client.put(f"{url}/chunks?offset=120", content=CONTENT[120:]).json()["received"] == len(CONTENT)
+
+    assert client.post(f"{url}/complete").json()["status"] == "ingesting"
+    state = wait_done(client, opened["upload_id"])
+    assert state["status"] == "done" and state["result"]["rows_processed"] == 2
+    assert state["result"]["rows_rejected"] == 2
+    assert not os.path.exists(upload_service.staged_path(opened["upload_id"]))
+    assert factory().scalar(select(func.count()).select_from(Diagnostic)) == 2
+
+    again = client.post("/api/upload/sessions", json={"filename": "copy.csv", "size": len(CONTENT), "sha256": SHA256}).json()
+    assert not again["created"] and again["upload_id"] == opened["upload_id"] and again["status"] == "done"
+
+
+def test_hash_mismatch_resets_upload(client):
+    client, _ = client
+    opened = client.post("/api/upload/sessions", json={"filename": "d.csv", "size": len(CONTENT), "sha256": "0" * 64}).json()
+    url = f"/api/upload/sessions/{opened['upload_id']}"
+    client.put(f"{url}/chunks?offset=0", content=CONTENT)
+    client.post(f"{url}/complete")
+    state = wait_done(client, opened["upload_id"])
+    assert state["status"] == "uploading" and state["received"] == 0 and "SHA-256" in state["error"]
+
+    assert client.post("/api/upload/sessions", json={"filename": "x", "size": 10, "sha256": "xyz"}).status_code == 400
+    too_big = {"filename": "x", "size": settings.chunked_upload_max_size + 1, "sha256": SHA256}
+    assert client.post("/api/upload/sessions", json=too_big).status_code == 413
+
+
+def test_ingest_in_another_worker_is_not_restarted(client, monkeypatch):
+    client, factory = client
+    release = threading.Event()
+
+    def slow_ingest(job, upload_id):
+        release.wait(5)
+        return {}
+
+    monkeypatch.setattr(upload_service, "ingest_upload", slow_ingest)
+    opened = client.post("/api/upload/sessions", json={"filename": "d.csv", "size": len(CONTENT), "sha256": SHA256}).json()
+    url = f"/api/upload/sessions/{opened['upload_id']}"
+    client.put(f"{url}/chunks?offset=0", content=CONTENT)
+    job_id = client.post(f"{url}/complete").json()["job"]["job_id"]
+
+    # Запросы попадают в воркер, у которого задачи нет в памяти
+    monkeypatch.setattr(upload_service, "jobs", JobManager(session_factory=factory))
+    state = client.get(url).json()
+    assert state["status"] == "ingesting" and state["job"]["job_id"] == job_id and state["error"] is None
+    assert client.post(f"{url}/complete").json()["job"]["job_id"] == job_id
+    assert factory().scalar(select(func.count()).select_from(JobRecord)) == 1
+    release.set()
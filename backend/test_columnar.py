@@ -0,0 +1,41 @@
+# backend/test_columnar.py
+import io
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.db import crud
+from app.services import columnar_service
+from test_query_plans import make_session
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def test_arrow_stream_matches_rows_with_categorical_enums(monkeypatch):
+    engine, db = make_session()
+    monkeypatch.setattr(columnar_service, "SessionLocal", sessionmaker(bind=engine))
+
+    stream = b"".join(columnar_service.stream_table("diagnostics", "arrow", {"method": "MFL"}, batch_size=50))
+    table = pa.ipc.open_stream(stream).read_all()
+
+    expected = sorted(crud.DiagnosticCRUD.get_diagnostic_rows(db, limit=None, method="MFL"), key=lambda row: row["diag_id"])
+    assert table.num_rows == len(expected) > 50
+    assert table.schema.field("method").type == pa.dictionary(pa.int8(), pa.string())
+    frame = table.to_pandas()
+    assert frame["ml_label"].dtype == "category"
+    assert frame["diag_id"].tolist() == [row["diag_id"] for row in expected]
+    assert frame["ml_label"].astype(str).tolist() == [row["ml_label"] for row in expected]
+    assert [value.isoformat() for value in frame["date"]] == [row["date"] for row in expected]
+
+
+def test_parquet_objects_with_filter(monkeypatch):
+    engine, db = make_session()
+    monkeypatch.setattr(columnar_service, "SessionLocal", sessionmaker(bind=engine))
+
+    data = b"".join(columnar_service.stream_table("objects", "parquet", {"pipeline_id": "MT-03"}))
+    table = pq.read_table(io.BytesIO(data))
+    assert table.column("object_id").to_pylist() == [
+        row["object_id"] for row in crud.ObjectCRUD.get_object_rows(db, limit=None, pipeline_id="MT-03")
+    ]
+    assert set(table.column("object_type").to_pylist()) == {"crane"}
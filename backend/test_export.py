@@ -0,0 +1,88 @@
+# backend/test_export.py
+import csv
+import io
+import json
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.db import crud
+from app.services import columnar_service, export_service, import_service
+from conftest import diagnostic_columns, object_columns
+
+FILTERS = [
+    {},
+    {"method": "MFL", "defect_found": True},
+    {"object_id": 2, "start_date": date(2021, 3, 1), "end_date": date(2021, 9, 30)},
+]
+
+
+@pytest.fixture
+def db(db, session_factory, monkeypatch):
+    rng = np.random.default_rng(11)
+    n = 500
+    import_service.write_chunk(db, "objects", object_columns(range(1, 6)))
+    import_service.write_chunk(db, "diagnostics", diagnostic_columns(
+        rng, range(1, n + 1), 5, methods=("UZK", "MFL", "VIK"),
+        param1=rng.normal(5.0, 2.0, n), temperature=np.where(rng.random(n) < 0.2, None, rng.uniform(-30, 30, n)),
+        defect_found=rng.random(n) < 0.4, defect_description='Коррозия, "язвенная"',
+        quality_grade=rng.choice(["SATISFACTORY", "UNACCEPTABLE"], n),
+        labels=rng.choice(["NORMAL", "HIGH", None], n)
+    ))
+    db.commit()
+    monkeypatch.setattr(export_service, "SessionLocal", session_factory)
+    monkeypatch.setattr(columnar_service, "SessionLocal", session_factory)
+    return db
+
+
+def expected_rows(db, filters):
+    rows = crud.DiagnosticCRUD.get_diagnostic_rows(db, limit=None, **filters)
+    return sorted(rows, key=lambda row: row["diag_id"])
+
+
+def export(fmt, filters):
+    stats = {}
+    data = b"".join(export_service.export_diagnostics(fmt, filters, batch_size=64, stats=stats))
+    return data, stats
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_ndjson_roundtrip(db, filters):
+    expected = expected_rows(db, filters)
+    data, stats = export("ndjson", filters)
+    assert [json.loads(line) for line in data.decode("utf-8").splitlines()] == expected
+    assert stats["rows"] == len(expected) > 0
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_csv_roundtrip(db, filters):
+    expected = expected_rows(db, filters)
+    data, _ = export("csv", filters)
+    header, *rows = csv.reader(io.StringIO(data.decode("utf-8")))
+    assert header == export_service.EXPORT_FIELDS
+    # csv не хранит типы: значения сравниваются строками, None - пустая строка
+    assert rows == [["" if row[name] is None else str(row[name]) for name in header] for row in expected]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_parquet_roundtrip(db, filters):
+    pq = pytest.importorskip("pyarrow.parquet")
+    expected = expected_rows(db, filters)
+    data, _ = export("parquet", filters)
+    parquet = pq.ParquetFile(io.BytesIO(data))
+    # Каждая порция курсора - своя группа строк
+    assert parquet.metadata.num_row_groups == -(-len(expected) // 64)
+    rows = parquet.read().to_pylist()
+    for row in rows:
+        row["date"] = row["date"].isoformat()
+    assert rows == expected
+
+
+def test_empty_export(db):
+    filters = {"object_id": 99}
+    assert export("ndjson", filters)[0] == b""
+    assert export("csv", filters)[0].decode("utf-8").splitlines() == [",".join(export_service.EXPORT_FIELDS)]
+    if export_service.parquet_available():
+        import pyarrow.parquet as pq
+        assert pq.read_table(io.BytesIO(export("parquet", filters)[0])).num_rows == 0
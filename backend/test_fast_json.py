@@ -0,0 +1,58 @@
+# backend/test_fast_json.py
+import json
+from datetime import date
+
+import numpy as np
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from app.db import crud
+from app.utils import fast_json
+from app.utils.fast_json import dumps
+from test_query_plans import make_session
+
+
+def orm_dict(instance):
+    return {
+        column.name: getattr(instance, column.name).value if hasattr(getattr(instance, column.name), "value")
+        else getattr(instance, column.name)
+        for column in instance.__table__.columns
+    }
+
+
+def test_rows_match_orm_serialization():
+    engine, db = make_session()
+    filters = dict(limit=500, method="VIK")
+    expected = jsonable_encoder([orm_dict(diag) for diag in crud.DiagnosticCRUD.get_diagnostics(db, **filters)])
+    assert json.loads(dumps(crud.DiagnosticCRUD.get_diagnostic_rows(db, **filters))) == expected
+
+    expected = jsonable_encoder([orm_dict(obj) for obj in crud.ObjectCRUD.get_objects(db, pipeline_id="MT-01")])
+    assert json.loads(dumps(crud.ObjectCRUD.get_object_rows(db, pipeline_id="MT-01"))) == expected
+
+
+def test_latest_rows_match_latest_diagnostics():
+    engine, db = make_session()
+    pairs = crud.DiagnosticCRUD.get_latest_diagnostics(db, pipeline_id="MT-02")
+    columns = crud.DiagnosticCRUD.get_latest_diagnostic_rows(
+        db, ["object_id", "object_type"], ["diag_id", "date", "ml_label"], pipeline_id="MT-02"
+    )
+    assert columns["object_id"] == [obj.object_id for obj, _ in pairs]
+    assert columns["object_type"] == [obj.object_type.value for obj, _ in pairs]
+    assert columns["latest_diag_id"] == [diag.diag_id for _, diag in pairs]
+    assert columns["latest_date"] == [diag.date.isoformat() for _, diag in pairs]
+    assert columns["latest_ml_label"] == [diag.ml_label.value for _, diag in pairs]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_numpy_values_with_and_without_orjson(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(fast_json, "orjson", None)
+    content = {
+        "count": np.int64(3), "score": np.float32(0.5), "flag": np.bool_(True),
+        "scores": np.array([1.5, 2.0]), "date": date(2024, 1, 31)
+    }
+    assert json.loads(fast_json.dumps(content)) == {
+        "count": 3, "score": 0.5, "flag": True, "scores": [1.5, 2.0], "date": "2024-01-31"
+    }
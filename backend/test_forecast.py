@@ -0,0 +1,91 @@
+# backend/test_forecast.py
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.db import crud
+from app.ml import forecast
+from app.services import import_service
+from conftest import diagnostic_columns, object_columns
+
+START = date(2016, 4, 1)
+TODAY = date(2024, 1, 1)
+
+
+def objects(ids):
+    return object_columns(ids, lambda i: "MT-01" if i % 2 else "MT-02")
+
+
+def metal_loss(rng, object_id, days):
+    # Потеря металла растет со скоростью, зависящей от объекта, плюс шум
+    return (1 + (object_id % 5) * 0.4 * days / 365.25 + rng.normal(0, 0.3, len(days))).round(3)
+
+
+def diagnostics(rng, ids, n_objects, methods=("MFL", "UTWM", "UZK")):
+    return diagnostic_columns(
+        rng, ids, n_objects, start=START, days=2500, methods=methods, param1=metal_loss, param2=1.0, param3=1.0
+    )
+
+
+def test_vectorized_fit_matches_polyfit(db):
+    rng = np.random.default_rng(7)
+    import_service.write_chunk(db, "objects", objects(range(1, 41)))
+    import_service.write_chunk(db, "diagnostics", diagnostics(rng, range(1, 601), 40))
+    db.commit()
+
+    measurements = forecast.load_measurements(db)
+    trends = forecast.fit_trends(measurements)
+    for i, object_id in enumerate(trends["object_id"].tolist()):
+        rows = measurements["object_id"] == object_id
+        t, y = measurements["t"][rows], measurements["value"][rows]
+        if len(np.unique(t)) < 2:
+            assert np.isnan(trends["slope"][i])
+            continue
+        slope, intercept = np.polyfit(t, y, 1)
+        assert trends["slope"][i] == pytest.approx(slope, rel=1e-6, abs=1e-9)
+        level = trends["mean_y"][i] + trends["slope"][i] * (t[0] - trends["mean_t"][i])
+        assert level == pytest.approx(intercept + slope * t[0], rel=1e-6)
+        assert trends["last_t"][i] == t.max() and trends["first_t"][i] == t.min()
+
+    # Срок до порога: (порог - уровень) / рост, при превышении - 0, без роста - бесконечность
+    now = float(forecast.to_years([TODAY])[0])
+    result = forecast.time_to_threshold(trends, 12.0, now)
+    growing = np.isfinite(result["years"]) & (result["years"] > 0)
+    assert growing.any()
+    assert np.allclose(
+        result["level"][growing] + trends["slope"][growing] * result["years"][growing], 12.0
+    )
+    assert (result["years"][result["level"] >= 12.0] == 0).all()
+
+
+def test_engine_updates_only_changed_objects(db):
+    rng = np.random.default_rng(11)
+    engine = forecast.ForecastEngine()
+    import_service.write_chunk(db, "objects", objects(range(1, 101)))
+    import_service.write_chunk(db, "diagnostics", diagnostics(rng, range(1, 1501), 100))
+    db.commit()
+    schedule = engine.schedule(10.0, horizon_years=3, limit=20, today=TODAY, db=db)
+    assert engine.stats["full_rebuilds"] == 1
+    years = [item["years_to_threshold"] for item in schedule["items"]]
+    assert years == sorted(years) and all(year <= 3 for year in years)
+    assert all(item["status"] in ("growing", "exceeded") for item in schedule["items"])
+
+    # Новые обследования нескольких объектов, удаление объекта
+    import_service.write_chunk(db, "diagnostics", diagnostics(rng, range(1501, 1521), 5))
+    crud.ObjectCRUD.delete_object(db, 7)
+    db.commit()
+    engine.forecast(1, today=TODAY, db=db)
+    assert engine.stats == {**engine.stats, "full_rebuilds": 1, "incremental_updates": 1}
+    assert engine.forecast(7, today=TODAY, db=db) is None
+
+    incremental = engine.trends
+    engine.mark_changed(None)
+    engine.refresh(db)
+    for name in forecast.TREND_FIELDS:
+        if incremental[name].dtype == object:
+            assert incremental[name].tolist() == engine.trends[name].tolist()
+        else:
+            np.testing.assert_allclose(incremental[name], engine.trends[name])
+    pipeline = engine.schedule(10.0, horizon_years=50, limit=1000, pipeline_id="MT-02", today=TODAY, db=db)
+    assert pipeline["items"] and all(item["pipeline_id"] == "MT-02" for item in pipeline["items"])
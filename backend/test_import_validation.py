@@ -0,0 +1,73 @@
+# backend/test_import_validation.py
+import io
+
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+from app.db.models import Object
+from app.services import import_service
+
+OBJECTS_CSV = """object_id,object_name,object_type,pipeline_id,lat,lon,year,material
+1,Кран 1,crane,MT-01,50.1,70.2,1990,Ст3
+2,,crane,MT-01,50.3,70.4,2001,X70
+3,Кран 3,crane,MT-01,север,70.4,2001.5,X70
+4,Кран 4,crane,MT-01,50.3,70.4,2001,X70
+5.5,Кран 5,crane,MT-02,50.5,70.6,1985,Ст3
+6,Кран 6,crane,MT-02,50.6,70.7,,Ст3
+"""
+
+
+def test_validate_chunk_reports_first_error_per_row():
+    df = pd.read_csv(io.StringIO(OBJECTS_CSV))
+    clean, errors = import_service.validate_chunk("objects", df)
+    assert clean["object_id"].tolist() == [1, 4]
+    assert clean["lat"].dtype == float
+    # Номер строки файла: заголовок - строка 1; у строки 4 только первая ошибка (lat, не year)
+    assert [(error["line"], error["column"], error["value"], error["error"]) for error in errors] == [
+        (6, "object_id", "5.5", "не целое число"),
+        (3, "object_name", None, "пустое значение"),
+        (4, "lat", "север", "не число"),
+        (7, "year", None, "пустое значение"),
+    ]
+
+    with pytest.raises(ValueError, match="lat, lon"):
+        import_service.validate_chunk("objects", df.drop(columns=["lat", "lon"]))
+
+
+def test_line_numbers_continue_across_chunks():
+    chunks = list(import_service.parse_chunks(io.BytesIO(OBJECTS_CSV.encode("utf-8")), chunk_size=2))
+    assert [len(columns["object_id"]) for _, columns, _ in chunks] == [1, 1, 0]
+    assert [[error["line"] for error in errors] for _, _, errors in chunks] == [[3], [4], [6, 7]]
+
+
+def test_invalid_rows_abort_or_are_skipped(db):
+    source = OBJECTS_CSV.encode("utf-8")
+    with pytest.raises(import_service.RowError) as error:
+        import_service.ingest_csv(db, io.BytesIO(source), chunk_size=2)
+    db.rollback()
+    assert str(error.value) == "Строка 3, столбец object_name: пустое значение (None)"
+    assert db.scalars(select(Object)).first() is None
+
+    stats = import_service.ingest_csv(db, io.BytesIO(source), chunk_size=2, skip_invalid=True)
+    db.commit()
+    assert (stats["rows_processed"], stats["rows_rejected"], stats["chunks"]) == (2, 4, 3)
+    assert [error["line"] for error in stats["errors"]] == [3, 4, 6, 7]
+    assert sorted(db.scalars(select(Object.object_id))) == [1, 4]
+
+
+def test_missing_pipeline_or_material_is_rejected():
+    # Раньше astype(str) записывал такие значения строкой "nan"
+    source = """object_id,object_name,object_type,pipeline_id,lat,lon,year,material
+1,Кран 1,crane,,50.1,70.2,1990,Ст3
+2,Кран 2,crane,MT-01,50.3,70.4,2001,
+3,Кран 3,crane,MT-01,50.3,70.4,2001, 
+4,Кран 4,crane,MT-01,50.3,70.4,2001,X70
+"""
+    (_, columns, errors), = import_service.parse_chunks(io.BytesIO(source.encode("utf-8")))
+    assert columns["object_id"] == [4]
+    assert [(error["line"], error["column"], error["error"]) for error in errors] == [
+        (2, "pipeline_id", "пустое значение"),
+        (3, "material", "пустое значение"),
+        (4, "material", "пустое значение"),
+    ]
@@ -0,0 +1,70 @@
+# backend/test_ingest_scoring.py
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.models import DiagnosticFlag
+from app.ml.registry import ModelRegistry
+from app.services import import_service, scoring_service
+from conftest import diagnostic_columns
+
+
+@pytest.fixture(autouse=True)
+def scorer(monkeypatch):
+    # Свой экземпляр: эталон детектора не переходит между тестами
+    monkeypatch.setattr(scoring_service, "scorer", scoring_service.IngestScorer())
+
+
+def diagnostics(rng, n, labels):
+    def normal(mean, std, digits):
+        return rng.normal(mean, std, n).round(digits)
+
+    return diagnostic_columns(
+        rng, range(1, n + 1), methods=("MFL", "UTWM"), labels=labels, date="2023-05-01",
+        temperature=normal(15, 3, 1), humidity=normal(60, 5, 1), illumination=normal(500, 50, 0),
+        param1=normal(3, 0.5, 3), param2=normal(2, 0.3, 3), param3=normal(1, 0.2, 3)
+    )
+
+
+def ingest(db, columns):
+    scores = import_service.start_scoring(db, "diagnostics", columns)
+    counts = import_service.write_chunk(db, "diagnostics", columns, scores)
+    db.commit()
+    return counts
+
+
+def test_flags_mismatches_and_outliers(db):
+    rng = np.random.default_rng(3)
+    columns = diagnostics(rng, 300, ["HIGH"] * 300)
+    columns["param2"][10] = 500.0
+    columns["humidity"][20] = None
+    counts = ingest(db, columns)
+
+    flags = {flag.diag_id: flag for flag in db.scalars(select(DiagnosticFlag))}
+    assert counts["scored"] == 300 and counts["flagged"] == len(flags)
+    assert counts["label_mismatch"] == sum(flag.label_mismatch for flag in flags.values())
+    assert flags[11].outlier and flags[11].anomaly_score > 100
+    assert not flags.get(21) or not flags[21].outlier
+    for flag in flags.values():
+        assert flag.label_mismatch == (flag.predicted_label.name != "HIGH")
+
+    # Повторная загрузка с метками модели и без выброса снимает отметки
+    columns["param2"][10] = 2.0
+    predicted = scoring_service.scorer.score(columns)["flags"]
+    labels = dict(zip(predicted["diag_id"], predicted["predicted_label"]))
+    columns["ml_label"] = [labels.get(diag_id, "HIGH") for diag_id in columns["diag_id"]]
+    counts = ingest(db, columns)
+    flags = {flag.diag_id: flag for flag in db.scalars(select(DiagnosticFlag))}
+    assert counts["label_mismatch"] == 0 and counts["flagged"] == counts["outliers"] == len(flags)
+    assert 11 not in flags and all(flag.outlier for flag in flags.values())
+
+
+def test_leaf_masks_match_descent():
+    registry = ModelRegistry(settings.ml_registry_dir)
+    forest = registry.load(registry.current_version())
+    X = np.random.default_rng(5).uniform(-5, 40, (3000, len(forest.mean)))
+    X[::7, 2] = np.nan
+    masks = forest.predict_proba(X)
+    assert forest._leaf_tables
+    assert np.array_equal(masks, forest.predict_proba(X, use_masks=False))
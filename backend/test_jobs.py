@@ -0,0 +1,65 @@
+# backend/test_jobs.py
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.job_service import CANCELLED, FAILED, RUNNING, JobManager
+
+
+@pytest.fixture
+def workers(session_factory, monkeypatch):
+    """Два менеджера на одной БД - как два воркера serve.py"""
+    monkeypatch.setattr(settings, "job_heartbeat_interval", 0.05)
+    managers = [JobManager(session_factory=session_factory), JobManager(session_factory=session_factory)]
+    yield managers
+    for manager in managers:
+        manager.shutdown()
+
+
+def wait_for(check, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return
+        time.sleep(0.02)
+    raise AssertionError("Условие не выполнено")
+
+
+def loop(job, release):
+    while not release.is_set():
+        job.update(0.5, "Работаю")
+        time.sleep(0.01)
+    return {"done": True}
+
+
+def test_status_and_cancel_from_another_worker(workers):
+    owner, other = workers
+    job = owner.submit("demo", loop, threading.Event())
+    wait_for(lambda: other.get(job.id).progress == 0.5)
+    seen = other.get(job.id)
+    assert seen.status == RUNNING and seen.message == "Работаю"
+    assert [item.id for item in other.list("demo")] == [job.id]
+    assert other.list("demo", local=True) == []
+
+    # Отмена из другого воркера доходит до исполнителя со следующей отметкой аренды
+    other.cancel(job.id)
+    wait_for(lambda: job.status == CANCELLED)
+    wait_for(lambda: other.get(job.id).status == CANCELLED)
+    assert other.get("missing") is None
+
+
+def test_expired_lease_reported_as_failed(workers, monkeypatch):
+    owner, other = workers
+    release = threading.Event()
+    job = owner.submit("demo", loop, release)
+    wait_for(lambda: other.get(job.id).status == RUNNING)
+    assert other.get(job.id).status == RUNNING
+
+    # Исполнитель перестал отмечаться (процесс остановлен)
+    monkeypatch.setattr(settings, "job_lease_seconds", 0.2)
+    owner._stopped.set()
+    wait_for(lambda: other.get(job.id).status == FAILED)
+    assert "не отвечает" in other.get(job.id).error
+    release.set()
@@ -0,0 +1,118 @@
+# backend/test_map_tiles.py
+import numpy as np
+
+from app.services import tile_service
+from app.services.spatial_index import SpatialIndex, mercator
+from app.utils import mvt
+
+
+def read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return result, pos
+
+
+def read_message(data):
+    """Поля protobuf: номер -> список значений (varint или bytes)"""
+    fields, pos = {}, 0
+    while pos < len(data):
+        key, pos = read_varint(data, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, pos = read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        else:
+            length, pos = read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        fields.setdefault(field, []).append(value)
+    return fields
+
+
+def unpack(data):
+    values, pos = [], 0
+    while pos < len(data):
+        value, pos = read_varint(data, pos)
+        values.append(value)
+    return values
+
+
+def decode_tile(data):
+    """Тайл -> {слой: [(свойства, части геометрии)]}"""
+    layers = {}
+    for raw_layer in read_message(data).get(3, []):
+        layer = read_message(raw_layer)
+        keys = [key.decode() for key in layer.get(3, [])]
+        values = []
+        for raw_value in layer.get(4, []):
+            value = read_message(raw_value)
+            if 1 in value:
+                values.append(value[1][0].decode())
+            else:
+                values.append(value[5][0])
+        features = []
+        for raw_feature in layer.get(2, []):
+            feature = read_message(raw_feature)
+            tags = unpack(feature.get(2, [b""])[0])
+            properties = {keys[tags[i]]: values[tags[i + 1]] for i in range(0, len(tags), 2)}
+            geometry, parts, x, y, i = unpack(feature[4][0]), [], 0, 0, 0
+            while i < len(geometry):
+                command, count = geometry[i] & 0x7, geometry[i] >> 3
+                i += 1
+                for _ in range(count):
+                    x += (geometry[i] >> 1) ^ -(geometry[i] & 1)
+                    y += (geometry[i + 1] >> 1) ^ -(geometry[i + 1] & 1)
+                    i += 2
+                    if command == mvt.MOVE_TO:
+                        parts.append([])
+                    parts[-1].append((x, y))
+            features.append((properties, parts))
+        layers[layer[1][0].decode()] = features
+    return layers
+
+
+def tile_of(lat, lon, z):
+    mx, my = mercator(np.array([lat]), np.array([lon]))
+    return int(mx[0] * 2 ** z), int(my[0] * 2 ** z)
+
+
+def test_objects_layer_keeps_every_object_once():
+    rng = np.random.default_rng(3)
+    n = 2000
+    lat, lon = rng.uniform(50.0, 51.0, n), rng.uniform(70.0, 71.0, n)
+    index = SpatialIndex.from_arrays(np.arange(1, n + 1), lat, lon, rng.integers(-1, 3, n))
+
+    z = 9
+    (x0, y0), (x1, y1) = tile_of(51.0, 70.0, z), tile_of(50.0, 71.0, z)
+    total = 0
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            layers = decode_tile(mvt.encode_tile([tile_service.objects_layer(index, z, x, y)]))
+            for properties, parts in layers.get("objects", []):
+                px, py = parts[0][0]
+                # Признаки из буфера соседнего тайла не считаем
+                if 0 <= px < mvt.EXTENT and 0 <= py < mvt.EXTENT:
+                    total += properties["count"]
+                    assert properties["color"] == tile_service.COLORS.get(properties.get("criticality"), "#4CAF50")
+    assert total == n
+
+
+def test_pipeline_line_is_clipped_to_tile_with_buffer():
+    pipeline = tile_service.PipelineGeometry("MT-01", "Магистраль 01", [[60.0, 50.0], [80.0, 50.0]])
+    z = 6
+    x, y = tile_of(50.0, 70.0, z)
+    layers = decode_tile(mvt.encode_tile([tile_service.pipelines_layer([pipeline], z, x, y)]))
+    (properties, parts), = layers["pipelines"]
+    assert properties == {"pipeline_id": "MT-01", "name": "Магистраль 01"}
+    (start, end), = parts
+    # Горизонтальная линия через весь тайл обрезается ровно по буферу
+    assert start[0] == -tile_service.BUFFER and end[0] == mvt.EXTENT + tile_service.BUFFER
+    assert start[1] == end[1]
+
+    far = tile_service.PipelineGeometry("MT-09", "Магистраль 09", [[10.0, 10.0], [11.0, 11.0]])
+    assert len(tile_service.pipelines_layer([far], z, x, y)) == 0
@@ -0,0 +1,60 @@
+# backend/test_metrics.py
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.core import metrics
+from app.db.database import build_engine
+
+
+def make_client():
+    engine = build_engine("sqlite://")
+    app = FastAPI()
+
+    @app.get("/n-plus-one/{n}")
+    def items(n: int):
+        # N+1: по запросу на каждый элемент
+        with engine.connect() as conn:
+            return [conn.execute(text("SELECT :i"), {"i": i}).scalar() for i in range(n)]
+
+    @app.get("/async")
+    async def not_db():
+        return {}
+
+    app.add_middleware(metrics.MetricsMiddleware)
+    return TestClient(app)
+
+
+def test_queries_and_latency_recorded_per_route():
+    client = make_client()
+    labels = ("GET", "/n-plus-one/{n}")
+
+    response = client.get("/n-plus-one/7")
+    assert 'desc="7 queries"' in response.headers["server-timing"]
+    client.get("/n-plus-one/3")
+    client.get("/async")
+    client.get("/missing")
+
+    assert metrics.request_queries.count(labels) == 2
+    assert metrics.request_duration.count((*labels, "200")) == 2
+    assert metrics.request_duration.count(("GET", metrics.UNMATCHED_ROUTE, "404")) >= 1
+
+    text_format = metrics.registry.render()
+    assert "# TYPE http_request_db_queries histogram" in text_format
+    # 7 и 3 SQL-выражения: в корзину le=5 попадает только второй запрос
+    assert 'http_request_db_queries_bucket{method="GET",route="/n-plus-one/{n}",le="5"} 1' in text_format
+    assert 'http_request_db_queries_sum{method="GET",route="/n-plus-one/{n}"} 10.0' in text_format
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/async",status="200",le="+Inf"}' in text_format
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("h", "тест", ("route",), buckets=(1, 5))
+    for value in (0.5, 1, 3, 9):
+        histogram.observe(value, ("/x",))
+    assert histogram.render()[2:] == [
+        'h_bucket{route="/x",le="1"} 2',
+        'h_bucket{route="/x",le="5"} 3',
+        'h_bucket{route="/x",le="+Inf"} 4',
+        'h_sum{route="/x"} 13.5',
+        'h_count{route="/x"} 4',
+    ]
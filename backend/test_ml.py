@@ -1,5 +1,8 @@
 # backend/test_ml.py
-from app.ml.model import DefectPredictor
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.endpoints import predictions
+from app.ml.model import DefectPredictor, FEATURES, FEATURE_DEFAULTS, LABELS
 import numpy as np
 
 def test_model():
@@ -29,5 +32,34 @@ def test_model():
     
     return result
 
+def test_batch_matches_single_predictions():
+    predictor = DefectPredictor()
+    rng = np.random.default_rng(2)
+    items = [
+        {name: float(value) for name, value in zip(FEATURES, row) if value >= 0}
+        for row in rng.uniform(-5, 40, (300, len(FEATURES)))
+    ]
+    labels, probabilities = predictor.predict_batch(predictor.features_matrix(items))
+    assert np.allclose(probabilities.sum(axis=1), 1.0)
+    assert (labels == np.asarray(LABELS)[probabilities.argmax(axis=1)]).all()
+    # Пропущенный признак берется из FEATURE_DEFAULTS в обоих путях
+    for item, label, row in zip(items, labels, probabilities):
+        single = predictor.predict(item)
+        assert single["prediction"] == label
+        assert [single["probabilities"][name] for name in LABELS] == row.tolist()
+
+    client = TestClient(make_app())
+    body = [{name: item.get(name, FEATURE_DEFAULTS[name]) for name in FEATURES} for item in items[:20]]
+    batch = client.post("/api/predict/batch", json={"items": body}).json()
+    assert batch["summary"]["total_items"] == 20
+    for item, result in zip(body, batch["results"]):
+        single = client.post("/api/predict/single", json=item).json()
+        assert (result["prediction"], result["probabilities"]) == (single["prediction"], single["probabilities"])
+
+def make_app():
+    app = FastAPI()
+    app.include_router(predictions.router, prefix="/api/predict")
+    return app
+
 if __name__ == "__main__":
-    test_model()
\ No newline at end of file
+    test_model()
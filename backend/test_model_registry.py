@@ -0,0 +1,70 @@
+# backend/test_model_registry.py
+import os
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from app.ml.registry import CURRENT_FILE, CompiledForest, ModelRegistry
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 20, (2000, 5))
+    y = ((X[:, 0] * 0.3 + X[:, 2] * 0.5 + rng.normal(0, 1.5, len(X))) // 4).clip(0, 2).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0).fit(scaler.transform(X), y)
+    return model, scaler
+
+
+def test_unknown_versions_rejected(tmp_path, fitted):
+    registry = ModelRegistry(str(tmp_path))
+    version = registry.publish(CompiledForest.from_sklearn(*fitted))
+    os.makedirs(tmp_path / ".tmp-staging")
+    for bad in ("..", ".", ".tmp-staging", "v9999", ""):
+        with pytest.raises(ValueError):
+            registry.activate(bad)
+    assert registry.current_version() == version
+
+    # Указатель, испорченный вручную, не выдается как текущая версия
+    (tmp_path / CURRENT_FILE).write_text("..", encoding="utf-8")
+    assert registry.current_version() is None
+
+
+@pytest.mark.parametrize("use_masks", [None, True, False])
+def test_compiled_forest_matches_sklearn(fitted, use_masks):
+    model, scaler = fitted
+    X = np.random.default_rng(1).uniform(-5, 25, (3000, 5))
+    forest = CompiledForest.from_sklearn(model, scaler)
+    assert forest.classes.tolist() == model.classes_.tolist()
+    # Порядок суммирования по деревьям другой - сравнение с допуском
+    np.testing.assert_allclose(
+        forest.predict_proba(X, use_masks=use_masks), model.predict_proba(scaler.transform(X)), atol=1e-12
+    )
+
+
+def test_publish_load_and_activate(tmp_path, fitted):
+    model, scaler = fitted
+    registry = ModelRegistry(str(tmp_path))
+    assert registry.versions() == [] and registry.current_version() is None
+
+    first = registry.publish(CompiledForest.from_sklearn(model, scaler), {"accuracy": 0.9})
+    second = registry.publish(CompiledForest.from_sklearn(model, scaler), activate=False)
+    assert registry.versions() == [first, second] == ["v0001", "v0002"]
+    assert registry.current_version() == first
+    meta = registry.read_meta(first)
+    assert (meta["version"], meta["accuracy"], meta["n_trees"]) == (first, 0.9, 20)
+
+    # Загруженная (в т.ч. отображенная в память) версия предсказывает как исходный лес
+    X = np.random.default_rng(2).uniform(0, 20, (200, 5))
+    for mmap in (False, True):
+        loaded = registry.load(second, mmap=mmap)
+        np.testing.assert_allclose(loaded.predict_proba(X), model.predict_proba(scaler.transform(X)), atol=1e-12)
+
+    registry.activate(second)
+    assert registry.current_version() == second
+    assert [(item["version"], item["current"]) for item in registry.describe()] == [(first, False), (second, True)]
+    registry.activate(first)
+    assert registry.current_version() == first
@@ -0,0 +1,123 @@
+# backend/test_query_plans.py
+import re
+from datetime import date, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from app.db import crud
+from app.db.database import build_engine
+from app.db.migrations import upgrade
+from app.services import risk_service
+from app.db.models import Object, Diagnostic, ObjectType, MethodType, QualityGrade, MLLabel
+
+# Полный проход по таблице без индекса: "SCAN diagnostics" (но не "SCAN ... USING INDEX")
+FULL_SCAN = re.compile(r"^SCAN (objects|diagnostics)$")
+
+
+def make_session():
+    engine = build_engine("sqlite://")
+    upgrade(engine)
+    objects = [
+        {
+            "object_id": i, "object_name": f"Объект {i}", "object_type": ObjectType.CRANE,
+            "pipeline_id": f"MT-{i % 5:02d}", "lat": 50.0, "lon": 70.0, "year": 1990, "material": "X70"
+        }
+        for i in range(1, 201)
+    ]
+    diagnostics = [
+        {
+            "diag_id": i, "object_id": i % 200 + 1, "method": list(MethodType)[i % 11],
+            "date": date(2020, 1, 1) + timedelta(days=i % 900), "defect_found": i % 3 == 0,
+            "quality_grade": QualityGrade.ACCEPTABLE, "ml_label": list(MLLabel)[i % 3]
+        }
+        for i in range(1, 2001)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Object.__table__.insert(), objects)
+        conn.execute(Diagnostic.__table__.insert(), diagnostics)
+    return engine, sessionmaker(bind=engine)()
+
+
+def query_plans(engine, func):
+    """Выполнить func и вернуть планы всех SELECT, которые она отправила в БД"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        func()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    plans = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+            plans.append([row[-1] for row in rows])
+    return plans
+
+
+def assert_no_full_scan(engine, func):
+    plans = query_plans(engine, func)
+    assert plans, "Запросы не перехвачены"
+    for plan in plans:
+        full_scans = [step for step in plan if FULL_SCAN.match(step)]
+        assert not full_scans, f"Полный проход по таблице: {plan}"
+
+
+def test_objects_by_pipeline_uses_index():
+    engine, db = make_session()
+    assert_no_full_scan(engine, lambda: crud.ObjectCRUD.get_objects(db, pipeline_id="MT-01"))
+
+
+def test_object_history_uses_index():
+    engine, db = make_session()
+    assert_no_full_scan(engine, lambda: crud.DiagnosticCRUD.get_diagnostics(db, object_id=7, limit=10))
+
+
+def test_diagnostics_by_date_uses_index():
+    engine, db = make_session()
+    assert_no_full_scan(engine, lambda: crud.DiagnosticCRUD.get_diagnostics(db, limit=100))
+    assert_no_full_scan(engine, lambda: crud.DiagnosticCRUD.get_diagnostics(
+        db, start_date=date(2021, 1, 1), end_date=date(2021, 3, 1)
+    ))
+
+
+def test_keyset_pages_seek_by_index():
+    engine, db = make_session()
+    plans = query_plans(engine, lambda: (
+        crud.DiagnosticCRUD.get_diagnostics(db, after=(date(2021, 5, 1), 500), limit=50),
+        crud.DiagnosticCRUD.get_diagnostics(db, object_id=7, after=(date(2021, 5, 1), 500), limit=50),
+        crud.ObjectCRUD.get_objects(db, after=50, limit=50),
+    ))
+    # Страница начинается поиском по индексу, а не проходом с начала
+    assert all(plan[0].startswith("SEARCH") for plan in plans), plans
+
+
+def test_map_latest_diagnostics_uses_index():
+    engine, db = make_session()
+    assert_no_full_scan(engine, lambda: crud.DiagnosticCRUD.get_latest_diagnostics(db))
+    assert_no_full_scan(engine, lambda: crud.DiagnosticCRUD.get_latest_diagnostics(db, pipeline_id="MT-02"))
+
+
+def test_risk_update_loads_changed_objects_by_index():
+    engine, db = make_session()
+    assert_no_full_scan(engine, lambda: risk_service.load_features(db, {3, 7, 150}))
+
+
+def test_upgrade_adds_indexes_to_existing_db():
+    engine, db = make_session()
+    db.close()
+    with engine.connect() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_diagnostics_object_date")
+        conn.exec_driver_sql("DROP INDEX ix_objects_pipeline_id")
+        conn.commit()
+
+    created = upgrade(engine)
+
+    assert set(created) == {"ix_diagnostics_object_date", "ix_objects_pipeline_id"}
+    assert upgrade(engine) == []
@@ -0,0 +1,109 @@
+# backend/test_response_cache.py
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import dashboard
+from app.core.response_cache import ResponseCache, ResponseCacheMiddleware
+from app.db.models import Object
+from app.services import data_events, import_service, risk_service, summary_service
+from conftest import object_columns
+
+
+def make_client():
+    calls = {"n": 0}
+    app = FastAPI()
+
+    @app.get("/api/dashboard/")
+    def summary(days: int = 30):
+        calls["n"] += 1
+        return {"days": days, "calls": calls["n"]}
+
+    @app.get("/api/objects/")
+    def objects():
+        calls["n"] += 1
+        return {"calls": calls["n"]}
+
+    cache = ResponseCache(max_entries=10, max_bytes=1 << 20, ttl=60)
+    app.add_middleware(ResponseCacheMiddleware, cache=cache)
+    return TestClient(app), cache, calls
+
+
+def test_cached_until_data_version_changes():
+    client, cache, calls = make_client()
+    first = client.get("/api/dashboard/?days=7&x=1")
+    assert first.headers["x-cache"] == "MISS"
+    # Порядок параметров не влияет на ключ
+    second = client.get("/api/dashboard/?x=1&days=7")
+    assert second.headers["x-cache"] == "HIT" and second.json() == first.json()
+    assert calls["n"] == 1
+
+    # Некэшируемые пути всегда пересчитываются
+    client.get("/api/objects/")
+    client.get("/api/objects/")
+    assert calls["n"] == 3
+
+    data_events.publish(data_events.DIAGNOSTICS)
+    third = client.get("/api/dashboard/?days=7&x=1")
+    assert third.headers["x-cache"] == "MISS" and third.json()["calls"] == 4
+    assert cache.stats()["hits"] == 1
+
+
+def test_etag_revalidation_returns_304():
+    client, cache, calls = make_client()
+    etag = client.get("/api/dashboard/").headers["etag"]
+    response = client.get("/api/dashboard/", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.content == b""
+    assert client.get("/api/dashboard/", headers={"If-None-Match": '"other"'}).status_code == 200
+    assert cache.stats()["not_modified"] == 1
+
+
+def test_changes_in_other_worker_invalidate_cache(tmp_path):
+    client, cache, calls = make_client()
+    path = str(tmp_path / "events.log")
+    data_events.share(path, poll_interval=60)
+    try:
+        other_worker = data_events.SharedLog(path, pid=-1)
+        client.get("/api/dashboard/")
+        data_events.publish(data_events.OBJECTS)
+        # Свои события из журнала не публикуются повторно
+        assert data_events.sync() == 0
+        client.get("/api/dashboard/")
+        assert client.get("/api/dashboard/").headers["x-cache"] == "HIT"
+
+        changed = []
+        data_events.subscribe_objects(changed.append)
+        other_worker.append([data_events.DIAGNOSTICS], {7})
+        assert client.get("/api/dashboard/").headers["x-cache"] == "MISS"
+        assert changed == [{7}]
+        # Другой воркер видит событие этого процесса
+        assert [record["topics"] for record in other_worker.read_new()] == [[data_events.OBJECTS]]
+        other_worker.close()
+    finally:
+        data_events.unshare()
+
+
+def test_manual_dashboard_rebuild_invalidates_cache(session_factory, monkeypatch):
+    monkeypatch.setattr(dashboard, "SessionLocal", session_factory)
+    monkeypatch.setattr(risk_service, "risk_engine", risk_service.RiskEngine())
+    db = session_factory()
+    summary_service.rebuild(db)
+    import_service.write_chunk(db, "objects", object_columns(range(1, 6)))
+    db.commit()
+
+    app = FastAPI()
+    app.include_router(dashboard.router, prefix="/api/dashboard")
+    app.add_middleware(ResponseCacheMiddleware, cache=ResponseCache(max_entries=10, max_bytes=1 << 20, ttl=300))
+    client = TestClient(app)
+    first = client.get("/api/dashboard/")
+    assert first.json()["summary"]["total_objects"] == 5
+
+    # Правка в обход CRUD: счетчики и кэш о ней не знают до ручной пересборки
+    db.execute(Object.__table__.delete().where(Object.object_id > 3))
+    db.commit()
+    db.close()
+    assert client.get("/api/dashboard/").headers["x-cache"] == "HIT"
+
+    assert client.post("/api/dashboard/rebuild").status_code == 200
+    rebuilt = client.get("/api/dashboard/")
+    assert rebuilt.headers["x-cache"] == "MISS" and rebuilt.headers["etag"] != first.headers["etag"]
+    assert rebuilt.json()["summary"]["total_objects"] == 3
@@ -0,0 +1,180 @@
+# backend/test_risk_engine.py
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import build_engine
+from app.db.migrations import upgrade
+from app.db.models import Object, Diagnostic, ObjectType, MethodType, QualityGrade, MLLabel
+from app.services import import_service, risk_service
+from conftest import diagnostic_columns, object_columns
+
+FLEET = 100_000
+PIPELINES = [f"MT-{i:02d}" for i in range(1, 9)]
+MATERIALS = ["Ст3", "Ст20", "09Г2С", "X70", "12Х18Н10Т"]
+
+
+@pytest.fixture(scope="module")
+def fleet():
+    """Синтетический парк: 100k объектов, у части нет диагностик"""
+    rng = random.Random(17)
+    engine = build_engine("sqlite://")
+    upgrade(engine)
+    objects = [
+        {
+            "object_id": i, "object_name": f"Объект {i}", "object_type": ObjectType.CRANE,
+            "pipeline_id": rng.choice(PIPELINES), "lat": 50.0, "lon": 70.0,
+            "year": rng.randint(1965, 2022), "material": rng.choice(MATERIALS)
+        }
+        for i in range(1, FLEET + 1)
+    ]
+    diagnostics = [
+        {
+            "diag_id": i, "object_id": rng.randint(1, FLEET), "method": rng.choice(list(MethodType)),
+            "date": date(2018, 1, 1) + timedelta(days=rng.randrange(2000)), "defect_found": rng.random() < 0.2,
+            "quality_grade": rng.choice(list(QualityGrade)), "ml_label": rng.choice(list(MLLabel))
+        }
+        for i in range(1, 2 * FLEET + 1)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Object.__table__.insert(), objects)
+        conn.execute(Diagnostic.__table__.insert(), diagnostics)
+    return engine
+
+
+def brute_force_top(db, limit, pipelines):
+    """Полная сортировка парка: топ-K для каждого трубопровода из pipelines (None - весь парк)"""
+    features = risk_service.load_features(db)
+    scores = risk_service.compute_scores(features)["score"]
+    ranked = sorted(zip(-scores, features["object_id"], features["pipeline_id"]))
+    return {
+        pipeline_id: [
+            (object_id, round(-float(negative), 1)) for negative, object_id, pipeline in ranked
+            if pipeline_id is None or pipeline == pipeline_id
+        ][:limit]
+        for pipeline_id in pipelines
+    }
+
+
+def ranked(top):
+    return [(row["object_id"], row["risk_score"]) for row in top]
+
+
+def test_top_k_matches_brute_force_per_pipeline(fleet):
+    db = sessionmaker(bind=fleet)()
+    engine = risk_service.RiskEngine()
+    assert len(engine.top(10, db=db)) == 10
+    assert len(engine.ranking) == FLEET
+
+    expected = brute_force_top(db, 25, (None, *PIPELINES))
+    for pipeline_id, top in expected.items():
+        assert ranked(engine.top(25, pipeline_id=pipeline_id, db=db)) == top
+    assert all(row["pipeline_id"] == "MT-02" for row in engine.top(50, pipeline_id="MT-02", db=db))
+    assert engine.top(5, pipeline_id="нет такого", db=db) == []
+
+
+def test_incremental_updates_match_full_rebuild(fleet):
+    Session = sessionmaker(bind=fleet)
+    db = Session()
+    engine = risk_service.RiskEngine()
+    engine.top(5, db=db)
+    low = [object_id for object_id, _ in engine.ranking.top(FLEET)[-3:]]
+
+    # Самые безопасные объекты получают критичные диагностики, один объект удаляется, один добавляется
+    for object_id in low:
+        db.add(Diagnostic(
+            object_id=object_id, method=MethodType.UZK, date=date(2030, 1, 1), defect_found=True,
+            quality_grade=QualityGrade.UNACCEPTABLE, ml_label=MLLabel.HIGH
+        ))
+    removed = engine.ranking.top(1)[0][0]
+    db.query(Diagnostic).filter(Diagnostic.object_id == removed).delete()
+    db.delete(db.get(Object, removed))
+    db.add(Object(
+        object_id=FLEET + 1, object_name="Новый", object_type=ObjectType.CRANE, pipeline_id="MT-01",
+        lat=50.0, lon=70.0, year=1960, material="Ст3"
+    ))
+    db.commit()
+
+    top = engine.top(FLEET, db=db)
+    assert engine.stats == {**engine.stats, "full_rebuilds": 1, "incremental_updates": 1}
+    assert removed not in {row["object_id"] for row in top}
+    assert all(engine.describe(object_id, db=db)["rank"] < FLEET // 2 for object_id in low)
+    assert engine.describe(FLEET + 1, db=db)["pipeline_id"] == "MT-01"
+
+    rebuilt = risk_service.RiskEngine()
+    assert ranked(top) == ranked(rebuilt.top(FLEET, db=Session()))
+
+
+def test_score_factors():
+    features = {
+        "n_diagnostics": [3, 3, 0], "n_defects": [3, 0, 0], "history_grade": [1.0, 0.0, None],
+        "latest_label": ["HIGH", "NORMAL", None], "latest_grade": [1.0, 0.0, None],
+        "latest_defect": [True, False, None], "year": [1960, date.today().year, None],
+        "material": ["Ст3", "X70", None],
+    }
+    scores = risk_service.compute_scores(features)
+    assert scores["score"][0] == pytest.approx(100.0)
+    assert scores["score"][1] == pytest.approx(100 * risk_service.WEIGHTS["material"] * 0.3)
+    # Нет диагностик - средние значения по последней диагностике, а не ноль
+    assert 0 < scores["score"][2] < 50
+    assert np.all(np.diff(scores["score"][:2]) < 0)
+    assert risk_service.risk_level(85) == "high" and risk_service.risk_level(10) == "normal"
+
+
+
+def test_reads_during_concurrent_updates(session_factory):
+    db = session_factory()
+    rng = np.random.default_rng(5)
+    grades = ["SATISFACTORY", "ACCEPTABLE", "UNACCEPTABLE"]
+    import_service.write_chunk(db, "objects", object_columns(range(1, 5001), lambda i: PIPELINES[i % 3]))
+    db.commit()
+    engine = risk_service.RiskEngine()
+    engine.top(5, db=db)
+
+    errors, stop = [], threading.Event()
+
+    def read():
+        session = session_factory()
+        try:
+            while not stop.is_set():
+                # Полный рейтинг: чтение идет дольше пересборки в соседнем потоке
+                scores = [row["risk_score"] for row in engine.top(5000, db=session)]
+                assert len(scores) == 5000 and scores == sorted(scores, reverse=True)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+
+    # Частое переключение потоков: чтение попадает внутрь пересборки
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    try:
+        for reader in readers:
+            reader.start()
+        # Коммиты публикуют изменения через data_events, между ними - полная пересборка
+        for round_ in range(20):
+            ids = range(round_ * 50 + 1, round_ * 50 + 51)
+            import_service.write_chunk(db, "diagnostics", diagnostic_columns(
+                rng, ids, 5000, defect_found=rng.random(50) < 0.3, quality_grade=rng.choice(grades, 50),
+                labels=rng.choice(["NORMAL", "MEDIUM", "HIGH"], 50)
+            ))
+            db.commit()
+            engine.mark_changed(None)
+            time.sleep(0.02)
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert [engine.describe(object_id, db=db)["rank"] for object_id, _ in engine.ranking.top(3)] == [1, 2, 3]
+    assert ranked(engine.top(5000, db=db)) == ranked(risk_service.RiskEngine().top(5000, db=db))
+    db.close()
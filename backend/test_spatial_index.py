@@ -0,0 +1,35 @@
+# backend/test_spatial_index.py
+import numpy as np
+
+from app.services.spatial_index import SpatialIndex, CRITICALITY
+
+
+def make_index(n=5000, seed=1):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(40.0, 55.0, n)
+    lon = rng.uniform(46.0, 88.0, n)
+    criticality = rng.integers(-1, 3, n)
+    return SpatialIndex.from_arrays(np.arange(1, n + 1), lat, lon, criticality), lat, lon, criticality
+
+
+def test_clusters_cover_exactly_the_objects_in_view():
+    index, lat, lon, criticality = make_index()
+    # Окно охватывает весь парк: на любом уровне кластеры делят все объекты без потерь
+    for zoom in (0, 4, 8, 12, 18):
+        result = index.query((46.0, 40.0, 88.0, 55.0), zoom)
+        clusters = result["clusters"]
+        assert sum(cluster["count"] for cluster in clusters) == len(lat)
+        for i, label in enumerate(CRITICALITY):
+            assert sum(cluster["counts"][label] for cluster in clusters) == int((criticality == i).sum())
+
+
+def test_viewport_returns_worst_criticality_and_single_objects():
+    index, lat, lon, criticality = make_index()
+    result = index.query((60.0, 45.0, 61.0, 46.0), 18)
+    inside = (lon >= 60.0) & (lon <= 61.0) & (lat >= 45.0) & (lat <= 46.0)
+    # На максимальном уровне ячейки мельче расстояний между точками - кластер = объект
+    assert sorted(cluster["object_id"] for cluster in result["clusters"]) == sorted((np.flatnonzero(inside) + 1).tolist())
+
+    overview = index.query((46.0, 40.0, 88.0, 55.0), 0)["clusters"]
+    assert len(overview) < 5
+    assert all(cluster["criticality"] == "high" for cluster in overview)
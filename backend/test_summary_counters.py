@@ -0,0 +1,49 @@
+# backend/test_summary_counters.py
+from datetime import date
+
+import numpy as np
+
+from app.db import crud
+from app.services import import_service, summary_service
+from conftest import diagnostic_columns, object_columns
+
+
+def counters(db):
+    """Ненулевые счетчики: инкрементальное обновление оставляет обнуленные ключи"""
+    return {
+        metric: {key: value for key, value in values.items() if value}
+        for metric, values in summary_service.read_summary(db).items()
+    }
+
+
+def diagnostics(rng, ids, n_objects):
+    return diagnostic_columns(
+        rng, ids, n_objects, start=date(2022, 10, 1), days=200, methods=("UZK", "MFL", "VIK"),
+        defect_found=rng.random(len(ids)) < 0.4,
+        quality_grade=rng.choice(["SATISFACTORY", "ACCEPTABLE", "UNACCEPTABLE"], len(ids)),
+        labels=rng.choice(["NORMAL", "HIGH", None], len(ids))
+    )
+
+
+def test_incremental_counters_match_rebuild(db):
+    rng = np.random.default_rng(4)
+    summary_service.rebuild(db)
+    import_service.write_chunk(db, "objects", object_columns(range(1, 21), lambda i: f"MT-0{i % 3 + 1}"))
+    import_service.write_chunk(db, "diagnostics", diagnostics(rng, range(1, 401), 20))
+    # Повторная загрузка тех же diag_id с другими значениями, повтор id внутри чанка
+    import_service.write_chunk(db, "diagnostics", diagnostics(rng, list(range(300, 451)) + [300, 301], 20))
+    db.commit()
+    assert counters(db)["diagnostics"][""] == 450
+
+    # Объект переходит на другой трубопровод (загрузкой и через CRUD), объект удаляется
+    import_service.write_chunk(db, "objects", object_columns([4, 5], "MT-09"))
+    crud.ObjectCRUD.update_object(db, 6, {"pipeline_id": "MT-09"})
+    crud.ObjectCRUD.delete_object(db, 7)
+    db.commit()
+    incremental = counters(db)
+    assert incremental["objects"][""] == 19
+    assert incremental["pipeline_objects"]["MT-09"] == 3
+
+    summary_service.rebuild(db)
+    db.commit()
+    assert incremental == counters(db)
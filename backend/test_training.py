@@ -0,0 +1,83 @@
+# backend/test_training.py
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.ml.model import DefectPredictor
+from app.services import import_service, training_service
+from app.services.job_service import CANCELLED, SUCCEEDED, Job, JobManager
+from conftest import diagnostic_columns, object_columns
+from test_jobs import wait_for
+
+
+@pytest.fixture
+def predictor(db, session_factory, tmp_path, monkeypatch):
+    rng = np.random.default_rng(3)
+    import_service.write_chunk(db, "objects", object_columns(range(1, 11)))
+    import_service.write_chunk(db, "diagnostics", diagnostic_columns(
+        rng, range(1, 401), 10, param1=rng.uniform(0, 20, 400),
+        param2=rng.uniform(0, 30, 400), param3=rng.uniform(0, 5, 400),
+        labels=rng.choice(["NORMAL", "MEDIUM", "HIGH", None], 400)
+    ))
+    db.commit()
+    monkeypatch.setattr(training_service, "SessionLocal", session_factory)
+    monkeypatch.setattr(settings, "ml_train_step", 10)
+    monkeypatch.setattr(settings, "ml_train_n_jobs", 1)
+    return DefectPredictor(registry_dir=str(tmp_path / "models"))
+
+
+def recording(job):
+    """Подменить job.update: сохранять каждый сообщенный прогресс"""
+    seen, update = [], job.update
+
+    def record(progress=None, message=None):
+        seen.append(progress)
+        update(progress, message)
+
+    job.update = record
+    return seen
+
+
+def test_train_reports_progress(predictor, db):
+    job = Job("train")
+    seen = recording(job)
+    result = training_service.train(job, predictor)
+    labelled = len(training_service.load_training_data(db)[1])
+
+    assert seen == sorted(seen) and seen[0] == 0.0 and seen[-1] == 1.0
+    # Выгрузка - до 20%, затем по порции из 10 деревьев
+    assert [progress for progress in seen if progress > 0.2] == pytest.approx([0.2 + 0.08 * i for i in range(1, 11)])
+    assert (result["status"], result["training_samples"], result["version"]) == ("success", labelled, "v0001")
+    assert predictor.registry.current_version() == "v0001"
+
+
+def test_cancelled_training_keeps_current_model(predictor, session_factory):
+    manager = JobManager(session_factory=session_factory)
+    seen = []
+
+    def cancel_midway(job, predictor):
+        update = job.update
+
+        def cancel_at_half(progress=None, message=None):
+            seen.append(progress)
+            if progress is not None and progress >= 0.5:
+                manager.cancel(job.id)
+            update(progress, message)
+
+        job.update = cancel_at_half
+        return training_service.train(job, predictor)
+
+    try:
+        done = manager.submit("train", training_service.train, predictor)
+        wait_for(lambda: done.status == SUCCEEDED, timeout=30)
+        assert predictor.version == "v0001"
+
+        job = manager.submit("train", cancel_midway, predictor)
+        wait_for(lambda: job.status == CANCELLED, timeout=30)
+        assert max(seen) < 0.6
+        # Прерванное обучение не публикует версию и не подменяет модель
+        assert predictor.registry.versions() == ["v0001"]
+        assert (predictor.version, predictor.registry.current_version()) == ("v0001", "v0001")
+        assert manager.get(job.id).status == CANCELLED
+    finally:
+        manager.shutdown()